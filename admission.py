@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+生成任务准入控制模块
+
+本模块负责限制同时运行的号码生成任务数量，避免多个大批量生成任务
+同时运行争抢CPU和磁盘。
+
+功能说明：
+- 并发槽位：同时运行的任务数不超过 max_concurrent_jobs
+- 加权排队：槽位已满时任务排队，任务成本为预先计算的结果条数
+- 用户公平：按用户计算虚拟完成时间（加权公平排队），
+  大量提交任务的用户不会挤占其他用户，小任务优先于同一时期提交的大任务
+- 拒绝策略：队列已满、单个用户排队过多或等待超时时拒绝，并给出建议的重试间隔
+
+说明：
+    多进程部署时每个工作进程各自拥有一份槽位和队列。
+
+作者：Phone Number Generator
+版本：1.0.0
+"""
+
+import math
+import time
+import threading
+from typing import Any, Callable, Dict, List
+
+
+class AdmissionRejected(Exception):
+    """任务未获准入"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    """排队中的任务"""
+
+    __slots__ = ('user', 'cost', 'start_tag', 'finish_tag', 'seq')
+
+    def __init__(self, user: str, cost: int, start_tag: float, seq: int):
+        self.user = user
+        self.cost = cost
+        self.start_tag = start_tag
+        self.finish_tag = start_tag + cost
+        self.seq = seq
+
+    def sort_key(self):
+        return (self.finish_tag, self.seq)
+
+
+class AdmissionController:
+    """
+    生成任务准入控制器
+
+    采用开始时间公平排队（SFQ）：每个用户维护上一个任务的虚拟完成时间，
+    新任务的虚拟开始时间取系统虚拟时间和该用户完成时间的较大者，
+    虚拟完成时间 = 开始时间 + 任务成本，槽位空闲时调度完成时间最小的任务。
+    参数每次调度时从回调读取，支持热重载。
+    """
+
+    def __init__(self, settings_getter: Callable[[], Dict[str, Any]]):
+        """
+        初始化准入控制器
+
+        参数：
+            settings_getter: 返回当前参数的回调，包含
+                max_concurrent_jobs, max_queued_jobs, max_queued_per_user, admission_timeout
+        """
+        self._settings_getter = settings_getter
+        self._cond = threading.Condition()
+        self._waiting: List[_Ticket] = []
+        self._running = 0
+        self._virtual_time = 0.0
+        self._user_finish: Dict[str, float] = {}
+        self._seq = 0
+        # 任务平均耗时（秒，指数滑动平均），用于估算重试间隔
+        self._avg_duration = 1.0
+
+    @property
+    def running(self) -> int:
+        """运行中的任务数"""
+        return self._running
+
+    @property
+    def queued(self) -> int:
+        """排队中的任务数"""
+        return len(self._waiting)
+
+    def _retry_after(self, slots: int) -> int:
+        """估算重试间隔（秒）：排在前面的任务按槽位数并行执行所需时间"""
+        rounds = (len(self._waiting) + self._running) / max(1, slots)
+        return max(1, math.ceil(rounds * self._avg_duration))
+
+    def admit(self, user: str, cost: int) -> 'AdmissionSlot':
+        """
+        申请运行槽位
+
+        槽位已满时排队等待，直到轮到该任务或超时。
+
+        参数：
+            user: 用户标识
+            cost: 任务成本（结果条数）
+
+        返回：
+            AdmissionSlot: 槽位，作为上下文管理器使用，退出时归还
+
+        异常：
+            AdmissionRejected: 队列已满、该用户排队任务过多或等待超时
+        """
+        settings = self._settings_getter()
+        slots = settings['max_concurrent_jobs']
+        deadline = time.monotonic() + settings['admission_timeout']
+
+        with self._cond:
+            if self._running < slots and not self._waiting:
+                self._grant(self._new_ticket(user, cost))
+                return AdmissionSlot(self)
+
+            if len(self._waiting) >= settings['max_queued_jobs']:
+                raise AdmissionRejected("生成任务队列已满，请稍后重试", self._retry_after(slots))
+            user_queued = sum(1 for ticket in self._waiting if ticket.user == user)
+            if user_queued >= settings['max_queued_per_user']:
+                raise AdmissionRejected("您已有任务在排队，请等待完成后再提交", self._retry_after(slots))
+
+            ticket = self._new_ticket(user, cost)
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    slots = self._settings_getter()['max_concurrent_jobs']
+                    if self._running < slots and min(self._waiting, key=_Ticket.sort_key) is ticket:
+                        self._waiting.remove(ticket)
+                        self._grant(ticket)
+                        return AdmissionSlot(self)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._waiting.remove(ticket)
+                        raise AdmissionRejected("服务器繁忙，排队超时，请稍后重试", self._retry_after(slots))
+                    self._cond.wait(remaining)
+            finally:
+                # 队首变化后唤醒其他等待者重新判断
+                self._cond.notify_all()
+
+    def _new_ticket(self, user: str, cost: int) -> _Ticket:
+        """创建任务并分配虚拟时间标签（调用方需持有锁）"""
+        start_tag = max(self._virtual_time, self._user_finish.get(user, 0.0))
+        self._seq += 1
+        ticket = _Ticket(user, max(1, cost), start_tag, self._seq)
+        self._user_finish[user] = ticket.finish_tag
+        return ticket
+
+    def _grant(self, ticket: _Ticket) -> None:
+        """任务开始运行（调用方需持有锁）"""
+        self._running += 1
+        self._virtual_time = max(self._virtual_time, ticket.start_tag)
+        if not self._waiting and self._running == 1:
+            # 系统空闲后清理已过期的用户标签
+            self._user_finish = {
+                user: finish for user, finish in self._user_finish.items()
+                if finish > self._virtual_time
+            }
+
+    def _release(self, duration: float) -> None:
+        """任务结束，归还槽位"""
+        with self._cond:
+            self._running = max(0, self._running - 1)
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+            self._cond.notify_all()
+
+
+class AdmissionSlot:
+    """
+    运行槽位
+
+    作为上下文管理器使用，退出时归还槽位并记录任务耗时。
+    """
+
+    __slots__ = ('_controller', '_start')
+
+    def __init__(self, controller: AdmissionController):
+        self._controller = controller
+        self._start = time.monotonic()
+
+    def __enter__(self) -> 'AdmissionSlot':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._controller._release(time.monotonic() - self._start)
@@ -11,35 +11,271 @@
 使用方法：
     python app.py              # 启动应用（默认端口5000）
     python app.py --port 8080  # 指定端口启动
+    python app.py --serve      # 使用生产环境服务器（多进程/多线程）启动
+延迟初始化：
+    config.yaml 中设置 app.lazy_init: true（或环境变量 LAZY_INIT=true）后，
+    导入模块时不创建数据库管理器、号码生成器、文件管理器和日志处理器，
+    在首次使用时才创建，适用于冷启动频繁的无服务器环境。
 作者：阿斗
 版本：1.0.0
 """
+from __future__ import annotations
+
 import os
+import re
+import io
 import sys
-import sqlite3
 import logging
-import uuid
 import time
 import json
+import math
+import random
+import hmac
+import hashlib
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import islice
 from datetime import datetime
 from pathlib import Path
 from functools import wraps
-from multiprocessing import Pool, cpu_count
-from typing import List, Dict, Any, Optional, Tuple
-from urllib.parse import unquote
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_file, Response
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterable, Iterator, NamedTuple, TYPE_CHECKING
+from urllib.parse import unquote, quote
+from flask import (Flask, render_template, request, jsonify, session, redirect, url_for, send_file, Response, g,
+                   current_app, stream_with_context)
 
 # 导入配置模块
 from config import config
+from metrics import Counter, Gauge, Histogram, registry as metrics_registry
+from admission import AdmissionController, AdmissionRejected
+from memory_budget import (MemoryBudget, MemoryBudgetExceeded, RssTracker,
+                           BYTES_PER_NUMBER, MIN_CHUNK_NUMBERS)
+
+# 只在个别接口或后台任务中使用的模块（快照、号码模式、排除名单、清单、性能分析等）
+# 在使用处导入，延迟初始化模式下导入本模块时不加载
+if TYPE_CHECKING:
+    import sqlite3
+    from assets import AssetPipeline
+    from exclusion import ExclusionList
+    from location_snapshot import LocationSnapshot
+    from manifest import FileManifest
+    from number_pattern import NumberPattern
+    from region_query import RegionQuery
 
 # ===========================================
 # Flask应用初始化
 # ===========================================
 
+class LazyInstance:
+    """
+    延迟实例化代理
+    首次访问属性时才调用工厂函数创建实例，之后的访问直接转发给该实例。
+    用于延迟初始化模式，避免在导入模块时创建全局单例。
+    """
+    
+    def __init__(self, factory: Callable[[], Any]):
+        """
+        初始化代理
+        参数：factory: 创建实例的工厂函数
+        """
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+    
+    def get(self) -> Any:
+        """
+        获取被代理的实例，首次调用时创建
+        返回：Any: 被代理的实例
+        """
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
+
+
+def is_lazy_init() -> bool:
+    """
+    检查是否启用延迟初始化模式
+    返回：bool: 启用返回True，否则返回False
+    """
+    return config.app.get('lazy_init', False)
+
+
+def create_singleton(factory: Callable[[], Any]) -> Any:
+    """
+    创建全局单例
+    延迟初始化模式下返回代理对象，首次使用时才创建实例；
+    否则立即创建实例。
+    参数：factory: 创建实例的工厂函数
+    返回：Any: 实例或延迟实例化代理
+    """
+    if is_lazy_init():
+        return LazyInstance(factory)
+    return factory()
+
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    调试日志采样过滤器
+    按配置的采样率保留DEBUG级别日志，INFO及以上级别全部保留。
+    采样率从配置实时读取，支持热重载。
+    """
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = config.logging.get('debug_sample_rate', 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+_logging_ready = False
+_logging_lock = threading.Lock()
+_log_queue = None
+_log_handlers: List[logging.Handler] = []
+_log_listener = None
+
+
+def _start_log_listener() -> None:
+    """
+    启动日志监听线程
+    监听线程从队列取出日志记录，交给文件处理器和控制台处理器写出。
+    """
+    global _log_listener
+    from logging.handlers import QueueListener
+    _log_listener = QueueListener(_log_queue, *_log_handlers, respect_handler_level=True)
+    _log_listener.start()
+
+
+def restart_log_listener() -> None:
+    """
+    重新启动日志监听线程
+    派生子进程后监听线程不会被复制，需要在子进程中调用。
+    """
+    if _log_queue is not None:
+        _start_log_listener()
+
+
+def stop_logging() -> None:
+    """
+    停止日志监听线程，写出队列中剩余的日志
+    """
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+
+def setup_logging() -> None:
+    """
+    配置日志
+    请求线程只把日志记录放入内存队列，由后台监听线程写入按天分割的日志文件和控制台，
+    请求路径不会阻塞在文件或终端I/O上。重复调用不会重复配置。
+    """
+    global _logging_ready, _log_queue, _log_handlers
+    if _logging_ready:
+        return
+    with _logging_lock:
+        if _logging_ready:
+            return
+        
+        import queue
+        import atexit
+        from logging.handlers import TimedRotatingFileHandler, QueueHandler
+        
+        log_file = config.get_log_file()
+        
+        # 按天分割日志，只保存2天
+        file_handler = TimedRotatingFileHandler(
+            filename=log_file,
+            when='midnight',  # 每天午夜分割
+            interval=1,       # 每1天分割一次
+            backupCount=2,    # 只保存2天的日志
+            encoding='utf-8'
+        )
+        
+        # 设置日志格式
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+        file_handler.setFormatter(formatter)
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(formatter)
+        _log_handlers = [file_handler, stream_handler]
+        
+        # 请求线程只入队，不做格式化和I/O
+        _log_queue = queue.SimpleQueue()
+        queue_handler = QueueHandler(_log_queue)
+        # 入队前只合并消息参数，时间和级别由监听线程中的处理器格式化
+        queue_handler.setFormatter(logging.Formatter('%(message)s'))
+        queue_handler.addFilter(DebugSamplingFilter())
+        
+        # 配置日志
+        logging.basicConfig(
+            level=getattr(logging, config.logging.get('level', 'INFO')),
+            handlers=[queue_handler]
+        )
+        _start_log_listener()
+        atexit.register(stop_logging)
+        _logging_ready = True
+
+
+def on_config_reload(cfg) -> None:
+    """
+    配置重新加载回调
+    同步日志级别并确保新的下载目录存在。
+    主机、端口、密钥等启动参数仍需重启应用才能生效。
+    参数：cfg: 重新加载后的配置实例
+    """
+    level = getattr(logging, str(cfg.logging.get('level', 'INFO')).upper(), logging.INFO)
+    logging.getLogger().setLevel(level)
+    os.makedirs(cfg.get_download_dir(), exist_ok=True)
+    logging.info("配置文件已重新加载")
+
+
+config.add_reload_listener(on_config_reload)
+
+
+def build_static_assets(flask_app: Flask) -> Optional[AssetPipeline]:
+    """
+    构建静态资源
+    压缩 static 目录下的CSS/JS，按内容哈希命名并预先生成压缩文件。
+    未启用或构建失败时返回None，页面直接引用 static 目录下的原文件。
+    参数：flask_app: Flask应用实例
+    返回：Optional[AssetPipeline]: 构建完成的资源管道
+    """
+    from assets import AssetPipeline
+    if not config.get('assets.enabled', True):
+        return None
+    pipeline = AssetPipeline(flask_app.static_folder, config.get_asset_dir())
+    try:
+        pipeline.build()
+    except OSError as e:
+        logging.warning(f"静态资源构建失败，使用原文件：{str(e)}")
+        return None
+    return pipeline
+
+
+def asset_url(filename: str) -> str:
+    """
+    获取静态资源地址（模板中使用）
+    已构建时返回带内容哈希的 /assets/ 地址，否则返回 /static/ 地址。
+    参数：filename: static 目录下的相对路径，如 'css/style.css'
+    返回：str: 资源URL
+    """
+    pipeline = current_app.extensions.get('asset_pipeline')
+    built_path = pipeline.resolve(filename) if pipeline else None
+    if built_path:
+        return url_for('asset_file', filename=built_path)
+    return url_for('static', filename=filename)
+
+
 def create_app() -> Flask:
     """
     创建并配置Flask应用
     这是应用工厂函数，负责创建Flask实例并加载所有配置。
+    延迟初始化模式下，下载目录和日志处理器在处理第一个请求时才创建。
     返回：Flask: 配置完成的Flask应用实例
     """
     # 创建Flask应用实例
@@ -54,42 +290,33 @@ def create_app() -> Flask:
     app.secret_key = config.app.get('secret_key', 'default-secret-key')
     
     # 配置上传文件夹和下载文件夹
-    download_dir = config.get_download_dir()
-    app.config['DOWNLOAD_FOLDER'] = download_dir
     app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 最大500MB
     
-    # 确保下载目录存在
-    os.makedirs(download_dir, exist_ok=True)
+    # 模板通过 asset_url() 引用静态资源
+    app.add_template_global(asset_url)
     
-    # 配置日志
-    log_file = config.get_log_file()
-    from logging.handlers import TimedRotatingFileHandler
+    def prepare_runtime() -> None:
+        """创建下载目录、配置日志、构建静态资源并启动配置文件监视"""
+        download_dir = config.get_download_dir()
+        app.config['DOWNLOAD_FOLDER'] = download_dir
+        # 确保下载目录存在
+        os.makedirs(download_dir, exist_ok=True)
+        setup_logging()
+        app.extensions['asset_pipeline'] = build_static_assets(app)
+        config.start_watcher()
     
-    # 按天分割日志，只保存2天
-    file_handler = TimedRotatingFileHandler(
-        filename=log_file,
-        when='midnight',  # 每天午夜分割
-        interval=1,       # 每1天分割一次
-        backupCount=2,    # 只保存2天的日志
-        encoding='utf-8'
-    )
-    
-    # 设置日志格式
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(formatter)
-    
-    # 配置日志
-    logging.basicConfig(
-        level=getattr(logging, config.logging.get('level', 'INFO')),
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            file_handler,
-            logging.StreamHandler()
-        ]
-    )
-    
-    logger = logging.getLogger(__name__)
-    logger.info("Flask应用初始化完成")
+    if is_lazy_init():
+        runtime_state = {'ready': False}
+        
+        @app.before_request
+        def prepare_runtime_once():
+            if not runtime_state['ready']:
+                prepare_runtime()
+                runtime_state['ready'] = True
+    else:
+        prepare_runtime()
+        logger = logging.getLogger(__name__)
+        logger.info("Flask应用初始化完成")
     
     return app
 
@@ -98,6 +325,185 @@ def create_app() -> Flask:
 app = create_app()
 
 
+# ===========================================
+# 运行指标
+# ===========================================
+
+# 请求耗时和请求数（按路由统计）
+REQUEST_SECONDS = Histogram('phone_http_request_duration_seconds', 'HTTP请求耗时（秒）')
+REQUESTS_TOTAL = Counter('phone_http_requests_total', 'HTTP请求总数')
+# 号码生成各阶段耗时：validate, db_query, generate, dedup_sort, exclude, sample, write
+STAGE_SECONDS = Histogram('phone_generate_stage_seconds', '号码生成各阶段耗时（秒）')
+# 数据库查询耗时
+DB_QUERY_SECONDS = Histogram('phone_db_query_duration_seconds', '数据库查询耗时（秒）')
+# 产出统计
+NUMBERS_TOTAL = Counter('phone_numbers_generated_total', '生成的号码总数')
+BYTES_TOTAL = Counter('phone_bytes_written_total', '写入文件的字节总数')
+FILES_TOTAL = Counter('phone_files_written_total', '写入的文件总数（含拆分文件）')
+# 反查的号码数（result: found 找到, missing 未找到, invalid 无法解析）
+LOOKUP_NUMBERS_TOTAL = Counter('phone_lookup_numbers_total', '反查的号码总数')
+# 被拒绝的生成任务数（按原因统计）
+JOBS_REJECTED_TOTAL = Counter('phone_jobs_rejected_total', '被拒绝的生成任务总数')
+# 后台清理回收的文件数和字节数（reason: expired 过期, quota 超出配额）
+RECLAIMED_FILES_TOTAL = Counter('phone_reclaimed_files_total', '后台清理删除的文件总数')
+RECLAIMED_BYTES_TOTAL = Counter('phone_reclaimed_bytes_total', '后台清理回收的字节总数')
+# 下载目录中已索引的生成文件总大小
+DOWNLOAD_BYTES = Gauge('phone_download_dir_bytes', '下载目录中生成文件的总大小（字节）',
+                       lambda: file_manager.index.total_bytes)
+
+# 后4位 0000-9999，按升序排列
+ALL_LAST_FOUR = [str(last_four).zfill(4) for last_four in range(10000)]
+
+# 号码文件每行字节数（11位号码 + 换行符）
+NUMBER_LINE_BYTES = 12
+# 每个分片最多的号码数量
+PART_MAX_NUMBERS = 500000
+# 区域码查询结果缓存条数（分页接口逐页请求时复用），排除号码缓存条数相同
+LOCATION_CACHE_SIZE = 32
+# 排除号码缓存中最多保存的被排除号码总数（每个约40字节）
+EXCLUSION_CACHE_POSITIONS = 1000000
+# 抽样算法：剩余总体超过剩余抽样数量的此倍数时使用D算法，否则使用A算法
+SAMPLE_ALPHA_INV = 13
+# 抽样算法标识，计入结果缓存键，更换算法后相同种子的旧结果不再复用
+SAMPLE_ALGORITHM = 'vitter-d'
+# 分组导出方式：hash 按号码哈希, round_robin 轮流, operator 按运营商, prefix 按号段
+SHARD_METHODS = ('hash', 'round_robin', 'operator', 'prefix')
+# 分组导出时每个写入线程最多缓存的号码块数
+SHARD_QUEUE_SIZE = 2
+# 号码哈希分组的乘数（64位黄金分割常数）
+SHARD_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+# 批量反查时每批处理的行数
+LOOKUP_BATCH_SIZE = 65536
+# 反查的号码：11位手机号，允许 +86/86 前缀
+LOOKUP_NUMBER_PATTERN = re.compile(rb'(?:\+?86)?(1\d{10})')
+
+
+@app.before_request
+def start_request_timer():
+    """记录请求开始时间"""
+    if metrics_registry.enabled:
+        g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response: Response) -> Response:
+    """记录请求耗时和状态码"""
+    start = g.get('request_start')
+    if start is not None:
+        endpoint = request.endpoint or 'unknown'
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+        REQUESTS_TOTAL.inc(endpoint=endpoint, status=str(response.status_code))
+    return response
+
+
+# ===========================================
+# 请求剖析
+# ===========================================
+
+def get_request_profile_dir() -> str:
+    """
+    获取剖析文件目录
+    返回：str: 下载目录下的剖析文件子目录
+    """
+    from profiling import get_profile_dir
+    return get_profile_dir(config.get_download_dir(), config.get('profiling.dir', 'profiles'))
+
+
+def is_profiling_authorized() -> bool:
+    """
+    检查当前用户是否有权使用剖析功能
+    只有已登录用户有权使用，登录功能未启用时所有访问者都无权使用；
+    配置了 profiling.allowed_users 时，只有列表中的用户有权使用，未配置时所有已登录用户有权使用。
+    返回：bool: 有权使用返回True，否则返回False
+    """
+    if not config.is_login_enabled() or not session.get('logged_in'):
+        return False
+    allowed_users = config.get('profiling.allowed_users', []) or []
+    return not allowed_users or session.get('username') in allowed_users
+
+
+def is_metrics_authorized() -> bool:
+    """
+    检查当前请求是否有权读取运行指标
+    满足任一条件即可：请求头带有 Authorization: Bearer <metrics.token>（配置了令牌时）、
+    来源地址属于 metrics.allowed_ips 中的地址或网段、登录功能启用且已登录。
+    都未配置且登录功能未启用时所有请求都无权读取。
+    返回：bool: 有权读取返回True，否则返回False
+    """
+    token = config.get('metrics.token', '') or ''
+    authorization = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(authorization.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+        return True
+    allowed_ips = config.get('metrics.allowed_ips', []) or []
+    if allowed_ips and request.remote_addr:
+        import ipaddress
+        try:
+            address = ipaddress.ip_address(request.remote_addr)
+        except ValueError:
+            address = None
+        if address is not None and any(address in ipaddress.ip_network(item, strict=False) for item in allowed_ips):
+            return True
+    return config.is_login_enabled() and bool(session.get('logged_in'))
+
+
+def should_profile_request() -> bool:
+    """
+    判断当前请求是否需要剖析
+    剖析功能启用时，profiling.always 为 true 或请求头带有 X-Profile: 1 的授权用户请求会被剖析。
+    静态文件和剖析管理接口不剖析。
+    返回：bool: 需要剖析返回True
+    """
+    if not config.get('profiling.enabled', False):
+        return False
+    if request.endpoint in (None, 'static', 'api_profiles', 'api_profile_download'):
+        return False
+    if config.get('profiling.always', False):
+        return True
+    return request.headers.get('X-Profile') == '1' and is_profiling_authorized()
+
+
+@app.before_request
+def start_request_profiler():
+    """按需开始剖析当前请求"""
+    from profiling import RequestProfiler
+    if should_profile_request():
+        profiler = RequestProfiler(request.endpoint)
+        if profiler.start():
+            g.request_profiler = profiler
+
+
+def finish_request_profiler() -> Optional[str]:
+    """
+    结束当前请求的剖析并写出文件
+    返回：Optional[str]: 剖析文件名（不含扩展名），未剖析时返回None
+    """
+    from profiling import prune_profiles
+    profiler = g.pop('request_profiler', None)
+    if profiler is None:
+        return None
+    profile_dir = get_request_profile_dir()
+    name = profiler.stop(profile_dir)
+    prune_profiles(profile_dir, config.get('profiling.max_profiles', 50))
+    logging.info("已保存请求剖析：%s", name)
+    return name
+
+
+@app.after_request
+def save_request_profile(response: Response) -> Response:
+    """保存剖析结果，并通过响应头返回剖析文件名"""
+    name = finish_request_profiler()
+    if name:
+        response.headers['X-Profile-Id'] = name
+    return response
+
+
+@app.teardown_request
+def discard_request_profile(error=None):
+    """请求异常结束时也要停止剖析"""
+    if 'request_profiler' in g:
+        finish_request_profiler()
+
+
 # ===========================================
 # 数据库操作模块
 # ===========================================
@@ -110,6 +516,7 @@ class DatabaseManager:
     - 数据库连接管理
     - 执行查询操作
     - 获取省份和城市列表
+    - 加载二进制快照，快照可用时优先从快照查询
     """
     
     def __init__(self):
@@ -117,13 +524,61 @@ class DatabaseManager:
         初始化数据库管理器
         """
         self.db_path = config.get_database_path()
+        self.snapshot_path = config.get_snapshot_path()
+        self._snapshot: Optional[LocationSnapshot] = None
+        self._snapshot_checked = False
+        self._snapshot_lock = threading.Lock()
+        # 省市目录缓存：(数据版本, 目录, 序列化后的JSON)
+        self._catalog: Optional[Tuple[str, Dict[str, Any], str]] = None
+    
+    def load_snapshot(self) -> Optional[LocationSnapshot]:
+        """
+        映射二进制快照文件
+        
+        重复调用会重新映射，用于数据重新导入之后。
+        快照不存在或无效时返回None，查询回退到SQLite。
+        返回：Optional[LocationSnapshot]: 快照对象
+        """
+        from location_snapshot import LocationSnapshot
+        with self._snapshot_lock:
+            snapshot = None
+            if os.path.exists(self.snapshot_path):
+                try:
+                    snapshot = LocationSnapshot(self.snapshot_path)
+                except (OSError, ValueError) as e:
+                    logging.warning(f"加载二进制快照失败，回退到数据库查询：{e}")
+            # 旧快照可能仍被其他线程的查询引用，交由垃圾回收解除映射
+            self._snapshot = snapshot
+            self._snapshot_checked = True
+            return snapshot
+    
+    def get_snapshot(self) -> Optional[LocationSnapshot]:
+        """
+        获取二进制快照，首次调用时加载
+        返回：Optional[LocationSnapshot]: 快照对象，不可用时返回None
+        """
+        if not self._snapshot_checked:
+            return self.load_snapshot()
+        return self._snapshot
+    
+    def data_version(self) -> str:
+        """
+        获取数据版本（数据库文件大小和修改时间），数据重新导入后变化
+        返回：str: 数据版本，数据库不存在时返回空字符串
+        """
+        try:
+            st = os.stat(self.db_path)
+        except OSError:
+            return ''
+        return f"{st.st_size}-{st.st_mtime_ns}"
     
     def get_connection(self) -> sqlite3.Connection:
         """
         获取数据库连接
         返回：sqlite3.Connection: 数据库连接对象
         """
-        print(f"数据库路径: {self.db_path}")
+        import sqlite3
+        logging.debug("数据库路径: %s", self.db_path)
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row  # 使用列名访问数据
         return conn
@@ -137,17 +592,18 @@ class DatabaseManager:
         
         返回： List[sqlite3.Row]: 查询结果列表
         """
-        conn = self.get_connection()
-        try:
-            cursor = conn.cursor()
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            results = cursor.fetchall()
-            return [dict(row) for row in results]
-        finally:
-            conn.close()
+        with DB_QUERY_SECONDS.time():
+            conn = self.get_connection()
+            try:
+                cursor = conn.cursor()
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                results = cursor.fetchall()
+                return [dict(row) for row in results]
+            finally:
+                conn.close()
     
     def query_phone_locations(self, prefix: str, province: str, city: str, 
                               operators: List[int] = None) -> List[Dict[str, Any]]:
@@ -160,6 +616,10 @@ class DatabaseManager:
             operators: 运营商列表
         返回：List[Dict]: 符合条件的归属地记录列表
         """
+        snapshot = self.get_snapshot()
+        if snapshot is not None:
+            return snapshot.query(prefix, province, city, operators)
+        
         # 构建查询条件
         conditions = ["prefix = ?", "province = ?", "city = ?"]
         params = [prefix, province, city]
@@ -176,12 +636,61 @@ class DatabaseManager:
         
         return self.execute_query(query, tuple(params))
     
+    def query_region_areas(self, region_query: RegionQuery) -> List[str]:
+        """
+        查询集合运算表达式命中的区域（前7位）
+        有快照时沿键列扫描一遍；否则整棵表达式合成一个 WHERE 子句，一次SQL查询。
+        参数：region_query: 编译后的集合运算表达式
+        返回：List[str]: 7位区域（号段 + 区域码），去重并升序排列
+        """
+        snapshot = self.get_snapshot()
+        if snapshot is not None:
+            return snapshot.select_areas(region_query.matches, region_query.prefixes)
+        
+        rows = self.execute_query(
+            f"SELECT DISTINCT prefix || suffix AS area FROM phone_location "
+            f"WHERE {region_query.where} ORDER BY area",
+            region_query.params
+        )
+        return [row['area'] for row in rows]
+    
+    def lookup_areas(self, areas: Iterable[int]) -> Dict[int, Tuple[str, str, int]]:
+        """
+        批量反查前7位号码的归属地
+        有快照时沿已排序的键列批量二分查找；否则按号段分组，每组一次 IN 查询。
+        参数：areas: 前7位号码（整数）
+        返回：Dict[int, Tuple[str, str, int]]: {前7位号码: (省份, 城市, 运营商)}，未找到的不包含
+        """
+        snapshot = self.get_snapshot()
+        if snapshot is not None:
+            return snapshot.lookup(areas)
+        
+        by_prefix: Dict[str, List[str]] = {}
+        for area in set(areas):
+            by_prefix.setdefault(str(area // 10000), []).append(str(area % 10000).zfill(4))
+        found: Dict[int, Tuple[str, str, int]] = {}
+        for prefix, suffixes in by_prefix.items():
+            # SQLite 默认最多999个参数
+            for start in range(0, len(suffixes), 900):
+                batch = suffixes[start:start + 900]
+                rows = self.execute_query(
+                    f"SELECT suffix, province, city, operator FROM phone_location "
+                    f"WHERE prefix = ? AND suffix IN ({','.join(['?'] * len(batch))})",
+                    (prefix, *batch)
+                )
+                for row in rows:
+                    found.setdefault(int(prefix + row['suffix']), (row['province'], row['city'], row['operator']))
+        return found
+    
     def get_provinces(self) -> List[str]:
         """
         获取所有省份列表
         返回： List[str]: 省份名称列表
         """
-        print(f"数据库路径: {self.db_path}")
+        snapshot = self.get_snapshot()
+        if snapshot is not None:
+            return snapshot.provinces()
+        logging.debug("数据库路径: %s", self.db_path)
         query = "SELECT DISTINCT province FROM phone_location ORDER BY province"
         results = self.execute_query(query)
 
@@ -195,47 +704,601 @@ class DatabaseManager:
         """
         # URL 解码省份参数
         province_decoded = unquote(province)
-        print(f"[DEBUG] 原始省份参数: '{province}'")
-        print(f"[DEBUG] 解码后省份: '{province_decoded}'")
-        logging.debug(f"数据库路径: {self.db_path}")
-        logging.debug(f"查询省份: {province_decoded}")
+        logging.debug("原始省份参数: '%s'，解码后省份: '%s'", province, province_decoded)
+        snapshot = self.get_snapshot()
+        if snapshot is not None:
+            return snapshot.cities(province_decoded)
         query = "SELECT DISTINCT city FROM phone_location WHERE province = ? ORDER BY city"
         results = self.execute_query(query, (province_decoded,))
         return [row['city'] for row in results]
+    
+    def get_prefix_index(self, province: str, city: str) -> List[Dict[str, Any]]:
+        """
+        获取城市的号段可用性
+        优先读取导入时生成的 prefix_index 表，表不存在时（旧版本导入的数据库）从明细数据统计。
+        参数：
+            province: 省份
+            city: 城市
+        返回：List[Dict]: 按号段升序排列，每项包含 prefix, suffix_count（区域码数量）,
+            operators（{运营商: 区域码数量}）
+        """
+        import sqlite3
+        params = (unquote(province), unquote(city))
+        try:
+            rows = self.execute_query(
+                "SELECT prefix, operator, suffix_count FROM prefix_index "
+                "WHERE province = ? AND city = ? ORDER BY prefix, operator", params)
+        except sqlite3.OperationalError:
+            rows = self.execute_query(
+                "SELECT prefix, operator, COUNT(DISTINCT suffix) AS suffix_count FROM phone_location "
+                "WHERE province = ? AND city = ? GROUP BY prefix, operator ORDER BY prefix, operator", params)
+        
+        result: List[Dict[str, Any]] = []
+        for row in rows:
+            if not result or result[-1]['prefix'] != row['prefix']:
+                result.append({'prefix': row['prefix'], 'suffix_count': 0, 'operators': {}})
+            result[-1]['suffix_count'] += row['suffix_count']
+            result[-1]['operators'][row['operator']] = row['suffix_count']
+        return result
+    
+    def get_region_prefixes(self) -> Dict[Tuple[str, str], List[str]]:
+        """
+        获取每个区域包含的号段
+        返回：Dict[Tuple[str, str], List[str]]: {(省份, 城市): 已排序的号段列表}
+        """
+        snapshot = self.get_snapshot()
+        if snapshot is not None:
+            return snapshot.region_prefixes()
+        query = "SELECT DISTINCT province, city, prefix FROM phone_location ORDER BY prefix"
+        result: Dict[Tuple[str, str], List[str]] = {}
+        for row in self.execute_query(query):
+            result.setdefault((row['province'], row['city']), []).append(row['prefix'])
+        return result
+    
+    def get_catalog(self) -> Tuple[str, Dict[str, Any], str]:
+        """
+        获取省市目录
+        目录包含全部省份、城市及每个城市可用的号段，按数据版本缓存，数据重新导入后重新生成。
+        返回：Tuple[str, Dict, str]: (数据版本, 目录, 序列化后的JSON)
+            目录格式：{"version": 数据版本, "provinces": {省份: {城市: [号段, ...]}}}
+        """
+        version = self.data_version()
+        cached = self._catalog
+        if cached is not None and cached[0] == version:
+            return cached
+        
+        provinces: Dict[str, Dict[str, List[str]]] = {}
+        for (province, city), prefixes in sorted(self.get_region_prefixes().items()):
+            provinces.setdefault(province, {})[city] = prefixes
+        catalog = {'version': version, 'provinces': provinces}
+        # 紧凑格式，并转义 < > & ' 以便直接嵌入 <script> 标签
+        text = json.dumps(catalog, ensure_ascii=False, separators=(',', ':'))
+        text = (text.replace('<', '\\u003c').replace('>', '\\u003e')
+                .replace('&', '\\u0026').replace("'", '\\u0027'))
+        self._catalog = (version, catalog, text)
+        logging.info(f"省市目录已生成：{len(provinces)} 个省份，数据版本 {version}")
+        return self._catalog
 
 
 # 创建数据库管理器实例
-db_manager = DatabaseManager()
+db_manager = create_singleton(DatabaseManager)
 
 
 # ===========================================
 # 号码生成模块
 # ===========================================
 
+class WrittenFile(NamedTuple):
+    """写入完成的号码文件"""
+    name: str
+    size: int
+    size_str: str
+    count: int
+    sha256: str
+    part: int = 0
+    shard: str = ''
+
+
+class _ShardWriter(threading.Thread):
+    """分组导出的写入线程：依次取出号码块，拼接后写入文件并计算SHA-256"""
+    
+    def __init__(self, path: str, shard: str):
+        import queue
+        super().__init__(name=f'shard-writer-{shard}', daemon=True)
+        self.path = path
+        self.shard = shard
+        self.queue: 'queue.Queue[Optional[List[str]]]' = queue.Queue(maxsize=SHARD_QUEUE_SIZE)
+        self.count = 0
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.error: Optional[BaseException] = None
+    
+    def run(self) -> None:
+        f = None
+        try:
+            f = open(self.path, 'wb')
+        except OSError as e:
+            self.error = e
+        # 出错后继续取出号码块（丢弃），避免主线程阻塞在已满的队列上
+        while True:
+            numbers = self.queue.get()
+            if numbers is None:
+                break
+            if self.error is not None:
+                continue
+            try:
+                data = ('\n'.join(numbers) + '\n').encode('utf-8')
+                f.write(data)
+                self.digest.update(data)
+                self.count += len(numbers)
+                self.size += len(data)
+            except OSError as e:
+                self.error = e
+        if f is not None:
+            f.close()
+
+
 class NumberGenerator:
     """
     号码生成器
-    负责根据条件生成手机号码，支持多进程并行生成。
+    负责根据条件生成手机号码，按分块流式写入文件。
     生成逻辑：
     1. 从数据库查询符合条件的号段信息
-    2. 组合完整的11位手机号码
-    3. 支持多进程并行生成提高效率
-    4. 分批次写入文件，避免内存溢出
+    2. 根据区域码数量预先计算结果数量
+    3. 按区域码升序逐块组合完整的11位手机号码，结果天然有序且不重复
+    4. 分块写入文件，分块大小由内存预算决定，避免内存溢出
     """
     
     def __init__(self):
         """
         初始化号码生成器
+        限制类配置不在此处复制，每次使用时从配置实时读取，支持热重载。
+        """
+        # 区域码查询结果缓存（LRU），键包含数据版本，数据重新导入后自动失效
+        self._location_cache: 'OrderedDict[Tuple, List[str]]' = OrderedDict()
+        self._location_cache_lock = threading.Lock()
+        # 排除号码和结果数量缓存（LRU），键包含区域码缓存键和排除名单版本，名单重新上传后自动失效
+        self._excluded_cache: 'OrderedDict[Tuple, Tuple[Dict[int, List[int]], int, int]]' = OrderedDict()
+        self._excluded_cache_positions = 0
+    
+    @property
+    def batch_size(self) -> int:
+        """每批次生成数量"""
+        return config.generator.get('batch_size', 500)
+    
+    @property
+    def max_count(self) -> int:
+        """单次最大生成数量"""
+        return config.generator.get('max_count', 10000000)
+    
+    @property
+    def file_size_limit(self) -> float:
+        """分批下载阈值（MB）"""
+        return config.generator.get('file_size_limit', 20)
+    
+    def query_location_suffixes(self, prefix: str, province: str, city: str,
+                                operators: List[int] = None) -> List[str]:
+        """
+        查询符合条件的区域码
+        参数：
+            prefix: 手机号前3位号段
+            province: 省份
+            city: 城市
+            operators: 运营商列表
+        返回：List[str]: 去重并升序排列的区域码列表
+        """
+        with STAGE_SECONDS.time(stage='db_query'):
+            locations = db_manager.query_phone_locations(prefix, province, city, operators)
+        with STAGE_SECONDS.time(stage='dedup_sort'):
+            return sorted({location['suffix'] for location in locations})
+    
+    @staticmethod
+    def _location_key(query: 'NumberQuery') -> Tuple:
+        """区域码查询结果的缓存键（数据版本和查询条件）"""
+        return (db_manager.data_version(), query.prefix, query.province, query.city,
+                tuple(sorted(query.operators)), query.pattern, query.exclude_digits, query.regions)
+    
+    def resolve_location_suffixes(self, query: 'NumberQuery') -> List[str]:
+        """
+        查询符合条件的区域码，并按号码模式过滤
+        结果按数据版本和查询条件缓存，分页接口逐页请求时不重复查询。
+        使用集合运算表达式时一次查询出全部区域，返回7位区域（号段 + 区域码），
+        与 query.number_prefix（空字符串）拼接为号码。
+        参数：query: 查询条件
+        返回：List[str]: 去重并升序排列的区域码列表（调用方不得修改）
+        """
+        key = self._location_key(query)
+        with self._location_cache_lock:
+            cached = self._location_cache.get(key)
+            if cached is not None:
+                self._location_cache.move_to_end(key)
+                return cached
+        
+        if query.region_query is not None:
+            with STAGE_SECONDS.time(stage='db_query'):
+                location_suffixes = db_manager.query_region_areas(query.region_query)
+            if query.number_pattern is not None:
+                location_suffixes = query.number_pattern.filter_areas(location_suffixes)
+        else:
+            location_suffixes = self.query_location_suffixes(
+                query.prefix, query.province, query.city, query.operators or None
+            )
+            if query.number_pattern is not None:
+                if not query.number_pattern.allows_prefix(query.prefix):
+                    location_suffixes = []
+                else:
+                    location_suffixes = query.number_pattern.filter_locations(location_suffixes)
+        
+        with self._location_cache_lock:
+            self._location_cache[key] = location_suffixes
+            while len(self._location_cache) > LOCATION_CACHE_SIZE:
+                self._location_cache.popitem(last=False)
+        return location_suffixes
+    
+    def excluded_positions(self, prefix: str, location_suffixes: List[str],
+                           exclusion: Optional[ExclusionList], suffix_4: str = None,
+                           suffix_3: str = None, pattern: NumberPattern = None) -> Dict[int, List[int]]:
+        """
+        查询排除名单中落在候选号码范围内的号码
+        名单按号码升序排列，每个区域码只二分查找一次，取出该区域被排除的后4位，
+        再换算为后4位列表中的序号；生成时按序号切片跳过，不逐个号码查询。
+        参数：
+            prefix: 号段（前3位）
+            location_suffixes: 区域码列表（已去重并升序排列）
+            exclusion: 排除名单，None表示不排除
+            suffix_4: 后4位（精确匹配）
+            suffix_3: 后3位（精确匹配）
+            pattern: 编译后的号码模式，给出时忽略 suffix_4 和 suffix_3
+        返回：Dict[int, List[int]]: 区域码序号 → 被排除的后4位序号（升序），只包含有排除号码的区域码
+        """
+        if exclusion is None or not len(exclusion):
+            return {}
+        tails = self._last_four_digits(suffix_4, suffix_3, pattern)
+        # 不加条件时后4位列表就是 0000-9999，序号即后4位本身
+        identity = tails is ALL_LAST_FOUR
+        excluded: Dict[int, List[int]] = {}
+        with STAGE_SECONDS.time(stage='exclude'):
+            for index, suffix in enumerate(location_suffixes):
+                found = exclusion.excluded_tails(int(prefix + suffix))
+                if not found:
+                    continue
+                if identity:
+                    positions = found
+                else:
+                    positions = []
+                    for tail in found:
+                        text = ALL_LAST_FOUR[tail]
+                        position = bisect_left(tails, text)
+                        if position < len(tails) and tails[position] == text:
+                            positions.append(position)
+                if positions:
+                    excluded[index] = positions
+        return excluded
+    
+    def resolve_excluded(self, query: 'NumberQuery', location_suffixes: List[str],
+                         exclusion: Optional[ExclusionList]) -> Tuple[Dict[int, List[int]], int]:
+        """
+        查询排除的号码并计算结果数量
+        结果按区域码缓存键、后3/4位和排除名单版本缓存，分页接口逐页请求和重复生成时
+        不重复逐个区域码查询名单。排除的号码总数超过 EXCLUSION_CACHE_POSITIONS 时不缓存。
+        参数：
+            query: 查询条件
+            location_suffixes: resolve_location_suffixes(query) 的结果
+            exclusion: 排除名单，None表示不排除
+        返回：Tuple[Dict[int, List[int]], int]: (excluded_positions() 的结果（调用方不得修改）, 结果数量)
         """
-        self.batch_size = config.generator.get('batch_size', 500)
-        self.max_count = config.generator.get('max_count', 10000000)
-        self.file_size_limit = config.generator.get('file_size_limit', 20)  # MB
+        suffix_4, suffix_3 = query.suffix_4 or None, query.suffix_3 or None
+        if exclusion is None:
+            return {}, self.count_numbers(location_suffixes, suffix_4, suffix_3, query.number_pattern)
+        
+        key = (self._location_key(query), suffix_4, suffix_3, exclusion.path, exclusion.version)
+        with self._location_cache_lock:
+            cached = self._excluded_cache.get(key)
+            if cached is not None:
+                self._excluded_cache.move_to_end(key)
+                return cached[0], cached[1]
+        
+        excluded = self.excluded_positions(
+            query.number_prefix, location_suffixes, exclusion, suffix_4, suffix_3, query.number_pattern
+        )
+        total = self.count_numbers(location_suffixes, suffix_4, suffix_3, query.number_pattern, excluded)
+        positions = sum(len(items) for items in excluded.values())
+        if positions <= EXCLUSION_CACHE_POSITIONS:
+            with self._location_cache_lock:
+                previous = self._excluded_cache.pop(key, None)
+                if previous is not None:
+                    self._excluded_cache_positions -= previous[2]
+                self._excluded_cache[key] = (excluded, total, positions)
+                self._excluded_cache_positions += positions
+                while len(self._excluded_cache) > LOCATION_CACHE_SIZE \
+                        or self._excluded_cache_positions > EXCLUSION_CACHE_POSITIONS:
+                    _, evicted = self._excluded_cache.popitem(last=False)
+                    self._excluded_cache_positions -= evicted[2]
+        return excluded, total
+    
+    @staticmethod
+    def _allowed_tails(tails: List[str], positions: List[int]) -> List[str]:
+        """按被排除的序号切片，返回剩余的后4位"""
+        allowed: List[str] = []
+        start = 0
+        for position in positions:
+            allowed.extend(tails[start:position])
+            start = position + 1
+        allowed.extend(tails[start:])
+        return allowed
+    
+    def count_numbers(self, location_suffixes: List[str], suffix_4: str = None,
+                      suffix_3: str = None, pattern: NumberPattern = None,
+                      excluded: Dict[int, List[int]] = None) -> int:
+        """
+        预先计算结果数量，不生成号码
+        参数：
+            location_suffixes: 区域码列表（已去重，已按号码模式过滤）
+            suffix_4: 后4位（精确匹配）
+            suffix_3: 后3位（精确匹配）
+            pattern: 编译后的号码模式，给出时忽略 suffix_4 和 suffix_3
+            excluded: 排除的号码（excluded_positions() 的结果）
+        返回：int: 号码数量
+        """
+        total = len(location_suffixes) * len(self._last_four_digits(suffix_4, suffix_3, pattern))
+        if excluded:
+            total -= sum(len(positions) for positions in excluded.values())
+        return total
+    
+    def iter_number_chunks(self, prefix: str, location_suffixes: List[str],
+                           suffix_4: str = None, suffix_3: str = None,
+                           chunk_size: int = MIN_CHUNK_NUMBERS,
+                           pattern: NumberPattern = None,
+                           excluded: Dict[int, List[int]] = None) -> Iterator[List[str]]:
+        """
+        按分块生成号码
+        区域码已升序排列，逐个区域码生成的号码整体有序。
+        一个区域码的号码不会跨块拆分，每块数量最多超出 chunk_size 一个区域码的号码数。
+        参数：
+            prefix: 号段（前3位）
+            location_suffixes: 区域码列表（已去重并升序排列）
+            suffix_4: 后4位（精确匹配）
+            suffix_3: 后3位（精确匹配）
+            chunk_size: 每块的目标号码数量
+            pattern: 编译后的号码模式，给出时忽略 suffix_4 和 suffix_3
+            excluded: 排除的号码（excluded_positions() 的结果）
+        返回：Iterator[List[str]]: 号码分块
+        """
+        tails = self._last_four_digits(suffix_4, suffix_3, pattern)
+        excluded = excluded or {}
+        chunk: List[str] = []
+        elapsed = 0.0
+        try:
+            for index, suffix in enumerate(location_suffixes):
+                start = time.perf_counter()
+                base = prefix + suffix
+                positions = excluded.get(index)
+                allowed = self._allowed_tails(tails, positions) if positions else tails
+                chunk.extend([base + tail for tail in allowed])
+                elapsed += time.perf_counter() - start
+                if len(chunk) >= chunk_size:
+                    NUMBERS_TOTAL.inc(len(chunk))
+                    yield chunk
+                    chunk = []
+            if chunk:
+                NUMBERS_TOTAL.inc(len(chunk))
+                yield chunk
+        finally:
+            STAGE_SECONDS.observe(elapsed, stage='generate')
+    
+    def sample_indices(self, population: int, sample_size: int, seed: int = None) -> Iterator[int]:
+        """
+        从 [0, population) 中不重复地随机抽取下标（Vitter D算法，顺序抽样）
+        按升序逐个给出抽中的下标，每次随机生成与下一个下标之间跳过的数量，
+        不保存已抽中的下标，也不需要排序；期望耗时与抽样数量成正比，内存占用为常数。
+        抽样数量超过总体的1/13时改用A算法（逐个判断跳过数量，耗时与总体大小成正比）。
+        参数：
+            population: 总体大小
+            sample_size: 抽样数量，不超过总体大小
+            seed: 随机种子，相同种子得到相同结果
+        返回：Iterator[int]: 升序排列的下标
+        """
+        rng = random.Random(seed)
+        
+        def uniform() -> float:
+            # (0, 1]，避免对0取对数
+            return 1.0 - rng.random()
+        
+        n, remaining = sample_size, population
+        current = -1
+        if n <= 0:
+            return
+        
+        # D算法：n 相对总体较小时，按跳过数量的分布用拒绝采样生成跳过数量
+        v_prime = math.exp(math.log(uniform()) / n)
+        qu1 = remaining - n + 1
+        threshold = SAMPLE_ALPHA_INV * n
+        while n > 1 and threshold < remaining:
+            n_min1_inv = 1.0 / (n - 1)
+            while True:
+                while True:
+                    x = remaining * (1.0 - v_prime)
+                    skip = int(x)
+                    if skip < qu1:
+                        break
+                    v_prime = math.exp(math.log(uniform()) / n)
+                u = uniform()
+                y1 = math.exp(math.log(u * remaining / qu1) * n_min1_inv)
+                v_prime = y1 * (1.0 - x / remaining) * (qu1 / (qu1 - skip))
+                if v_prime <= 1.0:
+                    break
+                y2 = 1.0
+                top = remaining - 1.0
+                if n - 1 > skip:
+                    bottom = float(remaining - n)
+                    limit = remaining - skip
+                else:
+                    bottom = remaining - skip - 1.0
+                    limit = qu1
+                for _ in range(remaining - 1, limit - 1, -1):
+                    y2 = y2 * top / bottom
+                    top -= 1.0
+                    bottom -= 1.0
+                if remaining / (remaining - x) >= y1 * math.exp(math.log(y2) * n_min1_inv):
+                    v_prime = math.exp(math.log(uniform()) * n_min1_inv)
+                    break
+                v_prime = math.exp(math.log(uniform()) / n)
+            current += skip + 1
+            yield current
+            remaining -= skip + 1
+            n -= 1
+            qu1 -= skip
+            threshold -= SAMPLE_ALPHA_INV
+        
+        if n > 1:
+            # A算法：抽样比例较高时逐个判断跳过数量
+            top = float(remaining - n)
+            total = float(remaining)
+            while n >= 2:
+                v = rng.random()
+                skip = 0
+                quot = top / total
+                while quot > v:
+                    skip += 1
+                    top -= 1.0
+                    total -= 1.0
+                    quot = quot * top / total
+                current += skip + 1
+                yield current
+                total -= 1.0
+                n -= 1
+            current += int(total * rng.random()) + 1
+            yield current
+        else:
+            current += int(remaining * v_prime) + 1
+            yield current
+    
+    def iter_sample_chunks(self, prefix: str, location_suffixes: List[str], sample_size: int,
+                           seed: int = None, suffix_4: str = None, suffix_3: str = None,
+                           chunk_size: int = MIN_CHUNK_NUMBERS,
+                           pattern: NumberPattern = None,
+                           excluded: Dict[int, List[int]] = None) -> Iterator[List[str]]:
+        """
+        随机抽样生成号码
+        候选号码不展开，按 区域码序号 × 后4位数量 + 后4位序号 编号，
+        抽中的下标按升序逐块生成并直接换算为号码，耗时只与抽样数量有关，内存只占用一块号码。
+        有排除号码时按各区域码剩余数量的累计值二分定位区域码，
+        再跳过该区域码中被排除的序号，抽样结果不含排除的号码。
+        参数：
+            prefix: 号段（前3位）
+            location_suffixes: 区域码列表（已去重并升序排列）
+            sample_size: 抽样数量，超过候选总数时返回全部号码
+            seed: 随机种子
+            suffix_4: 后4位（精确匹配）
+            suffix_3: 后3位（精确匹配）
+            chunk_size: 每块的号码数量
+            pattern: 编译后的号码模式，给出时忽略 suffix_4 和 suffix_3
+            excluded: 排除的号码（excluded_positions() 的结果）
+        返回：Iterator[List[str]]: 号码分块（整体升序）
+        """
+        tails = self._last_four_digits(suffix_4, suffix_3, pattern)
+        tail_count = len(tails)
+        population = self.count_numbers(location_suffixes, suffix_4, suffix_3, pattern, excluded)
+        
+        indices = self.sample_indices(population, min(sample_size, population), seed)
+        
+        if excluded:
+            # offsets[i]：区域码 i 之前剩余的号码总数
+            offsets = [0]
+            for index in range(len(location_suffixes)):
+                offsets.append(offsets[-1] + tail_count - len(excluded.get(index, ())))
+            
+            def to_number(index: int) -> str:
+                location_index = bisect_right(offsets, index) - 1
+                position = index - offsets[location_index]
+                for skipped in excluded.get(location_index, ()):
+                    if skipped > position:
+                        break
+                    position += 1
+                return prefix + location_suffixes[location_index] + tails[position]
+        else:
+            def to_number(index: int) -> str:
+                return prefix + location_suffixes[index // tail_count] + tails[index % tail_count]
+        
+        sample_elapsed = 0.0
+        elapsed = 0.0
+        try:
+            while True:
+                begin = time.perf_counter()
+                batch = list(islice(indices, chunk_size))
+                sample_elapsed += time.perf_counter() - begin
+                if not batch:
+                    break
+                begin = time.perf_counter()
+                chunk = [to_number(index) for index in batch]
+                elapsed += time.perf_counter() - begin
+                NUMBERS_TOTAL.inc(len(chunk))
+                yield chunk
+        finally:
+            STAGE_SECONDS.observe(sample_elapsed, stage='sample')
+            STAGE_SECONDS.observe(elapsed, stage='generate')
+    
+    def page_numbers(self, prefix: str, location_suffixes: List[str], after: str = None,
+                     limit: int = 1000, suffix_4: str = None, suffix_3: str = None,
+                     pattern: NumberPattern = None,
+                     excluded: Dict[int, List[int]] = None) -> Tuple[List[str], Optional[str]]:
+        """
+        按号码升序分页生成
+        游标为上一页最后一个号码，按区域码和后4位二分定位到 (区域码序号, 后4位序号)，
+        只生成本页的号码，任意页的耗时都只与 limit 有关。
+        参数：
+            prefix: 号段（前3位），区域码为7位区域时为空字符串
+            location_suffixes: 区域码列表（已去重并升序排列）
+            after: 游标（上一页最后一个号码），None表示第一页
+            limit: 每页数量
+            suffix_4: 后4位（精确匹配）
+            suffix_3: 后3位（精确匹配）
+            pattern: 编译后的号码模式，给出时忽略 suffix_4 和 suffix_3
+            excluded: 排除的号码（excluded_positions() 的结果）
+        返回：Tuple[List[str], Optional[str]]: (本页号码, 下一页游标)，没有下一页时游标为None
+        """
+        all_tails = self._last_four_digits(suffix_4, suffix_3, pattern)
+        excluded = excluded or {}
+        
+        def tails_at(index: int) -> List[str]:
+            positions = excluded.get(index)
+            return self._allowed_tails(all_tails, positions) if positions else all_tails
+        
+        location_index, tail_index = 0, 0
+        tails = tails_at(0)
+        if after:
+            location, tail = after[len(prefix):7], after[7:]
+            location_index = bisect_left(location_suffixes, location)
+            tails = tails_at(location_index)
+            if location_index < len(location_suffixes) and location_suffixes[location_index] == location:
+                tail_index = bisect_right(tails, tail)
+        
+        numbers: List[str] = []
+        while location_index < len(location_suffixes) and len(numbers) < limit:
+            if tail_index >= len(tails):
+                location_index += 1
+                tail_index = 0
+                tails = tails_at(location_index)
+                continue
+            base = prefix + location_suffixes[location_index]
+            end = min(len(tails), tail_index + limit - len(numbers))
+            numbers.extend([base + tail for tail in tails[tail_index:end]])
+            tail_index = end
+        
+        # 跳过已生成完的区域码和全部被排除的区域码，之后还有号码时才返回游标
+        while location_index < len(location_suffixes) and tail_index >= len(tails):
+            location_index += 1
+            tail_index = 0
+            tails = tails_at(location_index)
+        next_cursor = numbers[-1] if numbers and location_index < len(location_suffixes) else None
+        return numbers, next_cursor
     
     def generate_numbers(self, prefix: str, suffix: str = None, 
                          suffix_3: str = None, province: str = None,
                          city: str = None, operators: List[int] = None) -> List[str]:
         """
         生成符合条件的手机号码列表
+        一次性返回全部号码，大批量生成请使用 iter_number_chunks() 流式处理。
         参数：
             prefix: 手机号前3位号段
             suffix: 手机号最后4位（精确匹配）
@@ -243,28 +1306,37 @@ class NumberGenerator:
             province: 省份
             city: 城市
             operators: 运营商列表
-        返回：List[str]: 生成的手机号码列表
+        返回：List[str]: 生成的手机号码列表（已去重并排序）
         """
-        # 查询符合条件的号段信息
-        locations = db_manager.query_phone_locations(prefix, province, city, operators)
-        
-        if not locations:
-            return []
-        
-        # 生成所有号码
-        all_numbers = []
-        for location in locations:
-            numbers = self._generate_numbers_for_location(
-                prefix, location['suffix'], suffix, suffix_3
-            )
-            all_numbers.extend(numbers)
-        
-        # 去重并排序
-        all_numbers = list(set(all_numbers))
-        all_numbers.sort()
-        
+        location_suffixes = self.query_location_suffixes(prefix, province, city, operators)
+        all_numbers: List[str] = []
+        for chunk in self.iter_number_chunks(prefix, location_suffixes, suffix, suffix_3,
+                                             chunk_size=self.max_count):
+            all_numbers.extend(chunk)
         return all_numbers
     
+    def _last_four_digits(self, suffix_4: str = None, suffix_3: str = None,
+                          pattern: NumberPattern = None) -> List[str]:
+        """
+        获取每个区域码需要组合的后4位列表
+        参数：
+            suffix_4: 后4位（精确匹配）
+            suffix_3: 后3位（精确匹配）
+            pattern: 编译后的号码模式（已包含后3/4位条件），给出时直接使用其后4位列表
+        返回：List[str]: 升序排列的后4位列表
+        """
+        if pattern is not None:
+            # 后4位位图在编译时已筛好
+            return pattern.tails
+        if suffix_4:
+            # 精确匹配后4位
+            return [suffix_4]
+        if suffix_3:
+            # 精确匹配后3位，后4位的第一位可以是0-9
+            return [first_digit + suffix_3 for first_digit in '0123456789']
+        # 生成所有可能的号码（0000-9999）
+        return ALL_LAST_FOUR
+    
     def _generate_numbers_for_location(self, prefix: str, suffix: str, 
                                         suffix_4: str = None, 
                                         suffix_3: str = None) -> List[str]:
@@ -278,27 +1350,208 @@ class NumberGenerator:
         
         返回：List[str]: 生成的手机号码列表
         """
-        numbers = []
+        base = prefix + suffix
+        return [base + tail for tail in self._last_four_digits(suffix_4, suffix_3)]
+    
+    def write_number_chunks(self, chunks: Iterable[List[str]], filename: str,
+                            on_chunk: Callable[[int], None] = None) -> WrittenFile:
+        """
+        将号码分块流式写入单个文件，同时计算号码数量和SHA-256
+        参数：
+            chunks: 号码分块迭代器
+            filename: 文件名
+            on_chunk: 每写入一块后调用的回调，参数为已写入的号码数量
+        返回：WrittenFile: 文件名、大小、大小显示、号码数量、SHA-256
+        """
+        return self.write_number_parts(chunks, filename, on_chunk=on_chunk)[0]
+    
+    def write_number_parts(self, chunks: Iterable[List[str]], filename: str,
+                           numbers_per_part: int = 0,
+                           on_chunk: Callable[[int], None] = None,
+                           on_part: Callable[[WrittenFile], None] = None) -> List[WrittenFile]:
+        """
+        将号码分块流式写入文件，需要分批时直接写为多个分片
+        numbers_per_part 为0时写入单个文件（分片序号0）；
+        否则每满 numbers_per_part 个号码写完一个分片，依次为 part_1_{文件名}、part_2_{文件名}……
+        参数：
+            chunks: 号码分块迭代器
+            filename: 文件名
+            numbers_per_part: 每个分片的号码数量，0表示不分片
+            on_chunk: 每写入一块后调用的回调，参数为已写入的号码数量
+            on_part: 每写完一个文件后调用的回调（给出时文件属于任务，任务完成前不会被清理）
+        返回：List[WrittenFile]: 按分片序号排列的文件
+        """
+        directory = config.get_download_dir()
+        written: List[WrittenFile] = []
+        current = {'file': None}
+        elapsed = 0.0
+        total = 0
         
-        if suffix_4:
-            # 精确匹配后4位
-            full_number = prefix + suffix + suffix_4
-            numbers.append(full_number)
-        elif suffix_3:
-            # 精确匹配后3位
-            # 后4位的第一位可以是0-9
-            for first_digit in '0123456789':
-                full_number = prefix + suffix + first_digit + suffix_3
-                numbers.append(full_number)
+        def open_part() -> None:
+            part = len(written) + 1 if numbers_per_part else 0
+            name = f"part_{part}_{filename}" if part else filename
+            current.update(file=open(os.path.join(directory, name), 'wb'), name=name, part=part,
+                           count=0, size=0, digest=hashlib.sha256())
+        
+        def close_part() -> None:
+            current['file'].close()
+            item = WrittenFile(current['name'], current['size'], self._format_file_size(current['size']),
+                               current['count'], current['digest'].hexdigest(), current['part'])
+            current['file'] = None
+            file_manager.register_file(item.name, item.size, pending=on_part is not None)
+            BYTES_TOTAL.inc(item.size)
+            FILES_TOTAL.inc()
+            written.append(item)
+            if on_part is not None:
+                on_part(item)
+        
+        try:
+            for chunk in chunks:
+                start = time.perf_counter()
+                pos = 0
+                while pos < len(chunk):
+                    if current['file'] is None:
+                        open_part()
+                    take = len(chunk) - pos
+                    if numbers_per_part:
+                        take = min(take, numbers_per_part - current['count'])
+                    lines = chunk if take == len(chunk) else chunk[pos:pos + take]
+                    data = ('\n'.join(lines) + '\n').encode('utf-8')
+                    current['file'].write(data)
+                    current['digest'].update(data)
+                    current['count'] += take
+                    current['size'] += len(data)
+                    pos += take
+                    if numbers_per_part and current['count'] >= numbers_per_part:
+                        close_part()
+                elapsed += time.perf_counter() - start
+                total += len(chunk)
+                if on_chunk is not None:
+                    on_chunk(total)
+            if current['file'] is not None or not written:
+                if current['file'] is None:
+                    open_part()
+                close_part()
+        finally:
+            if current['file'] is not None:
+                current['file'].close()
+            STAGE_SECONDS.observe(elapsed, stage='write')
+        
+        return written
+    
+    def shard_partitioner(self, shard_by: str, shards: int, prefix: str,
+                          location_suffixes: List[str]) -> Tuple[List[str], Callable[[List[str]], List[List[str]]]]:
+        """
+        创建分组函数
+        hash 和 round_robin 分为 shards 组，组名为 01、02……；
+        operator 和 prefix 按结果中出现的运营商编码或号段分组，组名为运营商编码或号段。
+        号码块已升序排列，operator 和 prefix 按区域或号段二分切片，不逐个号码判断。
+        参数：
+            shard_by: 分组方式（SHARD_METHODS 之一）
+            shards: 分组数量（hash 和 round_robin 使用）
+            prefix: 号段（前3位），区域码为7位区域时为空字符串
+            location_suffixes: 区域码列表（已去重并升序排列）
+        返回：Tuple[List[str], Callable]: (各组名称, 分组函数)，分组函数的参数为一块号码，
+            返回与组名对应的各组号码（组内保持原有顺序）
+        """
+        if shard_by in ('hash', 'round_robin'):
+            width = len(str(shards))
+            keys = [str(index).zfill(width) for index in range(1, shards + 1)]
+            if shard_by == 'round_robin':
+                offset = [0]
+                
+                def partition(chunk: List[str]) -> List[List[str]]:
+                    start = offset[0]
+                    offset[0] = (start + len(chunk)) % shards
+                    return [chunk[(index - start) % shards::shards] for index in range(shards)]
+            else:
+                def partition(chunk: List[str]) -> List[List[str]]:
+                    parts: List[List[str]] = [[] for _ in range(shards)]
+                    for number in chunk:
+                        parts[(int(number) * SHARD_HASH_MULTIPLIER >> 32) % shards].append(number)
+                    return parts
+            return keys, partition
+        
+        # 按号段或运营商分组：先确定每个7位区域所属的组
+        areas = [prefix + suffix for suffix in location_suffixes]
+        if shard_by == 'prefix':
+            area_keys = {area: area[:3] for area in areas}
         else:
-            # 生成所有可能的号码
-            # 中间4位（suffix）+ 最后4位（0000-9999）
-            for last_four in range(10000):
-                last_four_str = str(last_four).zfill(4)
-                full_number = prefix + suffix + last_four_str
-                numbers.append(full_number)
+            found = db_manager.lookup_areas(int(area) for area in areas)
+            area_keys = {area: str(found[int(area)][2]) if int(area) in found else '0' for area in areas}
+        keys = sorted(set(area_keys.values()))
+        index_of = {key: index for index, key in enumerate(keys)}
+        width = 3 if shard_by == 'prefix' else 7
+        
+        def partition(chunk: List[str]) -> List[List[str]]:
+            parts: List[List[str]] = [[] for _ in keys]
+            pos = 0
+            while pos < len(chunk):
+                head = chunk[pos][:width]
+                # ':' 排在数字之后，切出以 head 开头的全部号码
+                end = bisect_left(chunk, head + ':', pos)
+                key = head if shard_by == 'prefix' else area_keys[head]
+                parts[index_of[key]].extend(chunk[pos:end])
+                pos = end
+            return parts
         
-        return numbers
+        return keys, partition
+    
+    def write_number_shards(self, chunks: Iterable[List[str]], filename: str, shard_keys: List[str],
+                            partition: Callable[[List[str]], List[List[str]]],
+                            on_chunk: Callable[[int], None] = None,
+                            on_part: Callable[[WrittenFile], None] = None) -> List[WrittenFile]:
+        """
+        将号码分组流式写入多个文件，每组由独立的写入线程负责
+        主线程把每块号码分到各组后交给对应的写入线程，写入线程负责拼接、写文件和计算SHA-256，
+        各组文件同时写入。文件名为 shard_{组名}_{文件名}，分片序号按组顺序从1开始。
+        参数：
+            chunks: 号码分块迭代器（升序）
+            filename: 文件名
+            shard_keys: 各组名称
+            partition: 分组函数（shard_partitioner() 的结果）
+            on_chunk: 每分完一块后调用的回调，参数为已处理的号码数量
+            on_part: 每组文件写完后调用的回调（全部写完后按组顺序调用；给出时文件属于任务，任务完成前不会被清理）
+        返回：List[WrittenFile]: 按组顺序排列的文件
+        """
+        directory = config.get_download_dir()
+        writers = [_ShardWriter(os.path.join(directory, f"shard_{key}_{filename}"), key) for key in shard_keys]
+        for writer in writers:
+            writer.start()
+        elapsed = 0.0
+        total = 0
+        try:
+            for chunk in chunks:
+                start = time.perf_counter()
+                for writer, numbers in zip(writers, partition(chunk)):
+                    if numbers:
+                        writer.queue.put(numbers)
+                elapsed += time.perf_counter() - start
+                total += len(chunk)
+                if on_chunk is not None:
+                    on_chunk(total)
+        finally:
+            for writer in writers:
+                writer.queue.put(None)
+            for writer in writers:
+                writer.join()
+            STAGE_SECONDS.observe(elapsed, stage='write')
+        
+        for writer in writers:
+            if writer.error is not None:
+                raise writer.error
+        
+        written: List[WrittenFile] = []
+        for part, writer in enumerate(writers, 1):
+            item = WrittenFile(os.path.basename(writer.path), writer.size, self._format_file_size(writer.size),
+                               writer.count, writer.digest.hexdigest(), part, writer.shard)
+            file_manager.register_file(item.name, item.size, pending=on_part is not None)
+            BYTES_TOTAL.inc(item.size)
+            FILES_TOTAL.inc()
+            written.append(item)
+            if on_part is not None:
+                on_part(item)
+        return written
     
     def generate_to_file(self, numbers: List[str], filename: str) -> Tuple[str, int, str]:
         """
@@ -308,17 +1561,8 @@ class NumberGenerator:
             filename: 文件名
         返回：Tuple[str, int, str]: (文件名, 文件大小字节, 文件大小显示)
         """
-        filepath = os.path.join(config.get_download_dir(), filename)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            for number in numbers:
-                f.write(number + '\n')
-        
-        # 获取文件大小
-        file_size = os.path.getsize(filepath)
-        file_size_str = self._format_file_size(file_size)
-        
-        return filename, file_size, file_size_str
+        written = self.write_number_chunks([numbers] if numbers else [], filename)
+        return written.name, written.size, written.size_str
     
     def _format_file_size(self, size: int) -> str:
         """
@@ -334,7 +1578,20 @@ class NumberGenerator:
 
 
 # 创建号码生成器实例
-number_generator = NumberGenerator()
+number_generator = create_singleton(NumberGenerator)
+
+# 号码生成内存预算（进程级），上限从配置实时读取
+generation_budget = MemoryBudget(
+    lambda: int(config.generator.get('global_memory_mb', 512) * 1024 * 1024)
+)
+
+# 号码生成准入控制（进程级），参数从配置实时读取
+generation_admission = AdmissionController(lambda: {
+    'max_concurrent_jobs': config.generator.get('max_concurrent_jobs', 2),
+    'max_queued_jobs': config.generator.get('max_queued_jobs', 16),
+    'max_queued_per_user': config.generator.get('max_queued_per_user', 2),
+    'admission_timeout': config.generator.get('admission_timeout', 60),
+})
 
 
 # ===========================================
@@ -345,53 +1602,202 @@ class FileManager:
     """
     文件管理器
     负责管理生成的文件，包括分批处理和清理过期文件。
+    生成的文件记录在内存索引中，由后台清理线程定期删除过期文件，
+    并在总大小超过配额时按最近最少使用顺序淘汰，不需要扫描目录。
+    每次清理前按清单同步索引，多进程部署时配额按所有工作进程生成的文件计算。
+    每次生成任务的文件、大小、号码数量、校验和及请求参数记录在清单中，
+    下载和结果缓存通过清单查找文件。
     """
     def __init__(self):
         """
         初始化文件管理器
+        下载目录和过期时间每次使用时从配置实时读取，支持热重载。
+        启动时打开清单并扫描一次下载目录建立索引，然后启动后台清理线程。
+        """
+        from file_index import GeneratedFileIndex, FileReaper
+        logging.debug("下载目录: %s，过期时间: %s 小时", self.download_dir, self.expire_hours)
+        self.index = GeneratedFileIndex()
+        self.manifest: Optional[FileManifest] = None
+        self._indexed_dir = self.download_dir
+        self._open_directory()
+        self.reaper = FileReaper(
+            self.index,
+            lambda: self._indexed_dir,
+            lambda: self.expire_hours,
+            lambda: int(config.download.get('quota_mb', 0) * 1024 * 1024),
+            on_reclaim=self._on_reclaim,
+            on_remove=lambda name: self.manifest.remove_file(name),
+            refresh=lambda: self.index.sync(self.manifest.list_files())
+        )
+        self.start_reaper()
+        config.add_reload_listener(self._on_config_reload)
+    
+    def _open_directory(self) -> None:
+        """打开下载目录的清单并建立文件索引，清单中已不存在的文件同时移出清单"""
+        from manifest import FileManifest, MANIFEST_FILENAME
+        os.makedirs(self._indexed_dir, exist_ok=True)
+        if self.manifest is not None:
+            self.manifest.close()
+        self.manifest = FileManifest(os.path.join(self._indexed_dir, MANIFEST_FILENAME))
+        known = {row['name']: (row['created'], row['accessed']) for row in self.manifest.list_files()}
+        self.index.clear()
+        self.index.scan(self._indexed_dir, known)
+        for name in known:
+            if name not in self.index:
+                self.manifest.remove_file(name)
+    
+    @property
+    def download_dir(self) -> str:
+        """下载目录"""
+        return config.get_download_dir()
+    
+    @property
+    def expire_hours(self) -> float:
+        """文件过期时间（小时）"""
+        return config.download.get('expire_hours', 24)
+    
+    def start_reaper(self) -> bool:
+        """
+        （重新）启动后台清理线程
+        工作进程派生后和清理间隔变化时调用。
+        返回：bool: 是否启动了线程
+        """
+        self.reaper.stop()
+        return self.reaper.start(config.download.get('reap_interval', 300))
+    
+    def _on_config_reload(self, cfg) -> None:
+        """配置重新加载后，下载目录变化时重新打开清单并重建索引，并按新的间隔重启清理线程"""
+        if self.download_dir != self._indexed_dir:
+            self._indexed_dir = self.download_dir
+            self._open_directory()
+        self.start_reaper()
+    
+    def _on_reclaim(self, reason: str, files: int, reclaimed: int) -> None:
+        """记录清理回收的文件数和字节数"""
+        RECLAIMED_FILES_TOTAL.inc(files, reason=reason)
+        RECLAIMED_BYTES_TOTAL.inc(reclaimed, reason=reason)
+    
+    def register_file(self, filename: str, size: int, pending: bool = False) -> None:
+        """
+        记录新生成的文件
+        参数：
+            filename: 文件名
+            size: 文件大小（字节）
+            pending: 文件属于尚未完成的任务，任务完成（finish_job()）前不会被清理
+        """
+        self.index.add(filename, size, pending)
+    
+    def finish_job(self, job_id: str, names: List[str], cache_key: Optional[str] = None) -> None:
+        """
+        标记任务完成（失败时也需调用，cache_key 为None），任务的文件此后可以正常清理
+        参数：
+            job_id: 任务ID
+            names: 任务已写入的文件名
+            cache_key: 结果缓存键，不参与缓存时为None
+        """
+        self.manifest.complete_job(job_id, cache_key)
+        self.index.release(names)
+    
+    def touch_file(self, filename: str) -> bool:
         """
-        self.download_dir = config.get_download_dir()
-        self.expire_hours = config.download.get('expire_hours', 24)
-        print(f"[DEBUG] 下载目录: {self.download_dir}")
-        print(f"[DEBUG] 过期时间: {self.expire_hours} 小时")
+        记录文件被下载，用于LRU淘汰
+        参数：filename: 文件名
+        返回：bool: 文件在索引中返回True
+        """
+        self.manifest.touch_file(filename)
+        return self.index.touch(filename)
+    
+    def get_download_path(self, filename: str) -> Optional[str]:
+        """
+        通过清单查找可下载的文件
+        参数：filename: 文件名
+        返回：Optional[str]: 文件完整路径，不在清单中时返回None
+        """
+        entry = self.manifest.get_file(filename)
+        if entry is None:
+            return None
+        return os.path.join(self._indexed_dir, entry['name'])
+    
+    def remove_missing_file(self, filename: str) -> None:
+        """
+        文件已被外部删除时，将其移出索引和清单
+        参数：filename: 文件名
+        """
+        self.index.remove(filename)
+        self.manifest.remove_file(filename)
+    
+    def public_file_info(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        转换为接口返回的文件信息
+        参数：entry: 清单中的文件记录
+        返回：Dict: 文件名、大小显示、号码数量、下载地址
+        """
+        info = {
+            'name': entry['name'],
+            'size': number_generator._format_file_size(entry['size']),
+            'count': entry['count'],
+            'url': f"/download/{entry['name']}"
+        }
+        if entry.get('shard'):
+            info['shard'] = entry['shard']
+        return info
+    
+    def record_file(self, job_id: str, written: WrittenFile) -> Dict[str, Any]:
+        """
+        将任务写完的一个文件记录到清单，记录后即可下载
+        参数：
+            job_id: 任务ID（需已通过 manifest.create_job() 创建）
+            written: 写入完成的文件
+        返回：Dict: 接口返回的文件信息
+        """
+        entry = {
+            'name': written.name,
+            'part': written.part,
+            'size': written.size,
+            'count': written.count,
+            'sha256': written.sha256,
+            'shard': written.shard
+        }
+        self.manifest.add_file(job_id, entry)
+        return self.public_file_info(entry)
+    
+    def find_cached_result(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        查找可复用的生成结果
+        文件仍然存在时返回，并记录一次访问。
+        参数：cache_key: 结果缓存键
+        返回：Optional[Dict]: 任务记录（含 files），不可用时返回None
+        """
+        job = self.manifest.find_cached_job(cache_key)
+        if job is None:
+            return None
+        for entry in job['files']:
+            if not os.path.isfile(os.path.join(self._indexed_dir, entry['name'])):
+                self.remove_missing_file(entry['name'])
+                return None
+        for entry in job['files']:
+            self.touch_file(entry['name'])
+        return job
     
     def cleanup_expired_files(self) -> int:
         """
-        清理过期文件
-        删除超过过期时间的临时文件。
+        立即执行一次清理
+        删除超过过期时间的文件，以及超出配额时最近最少使用的文件。
         返回：int: 删除的文件数量
         """
-        if not os.path.exists(self.download_dir):
-            return 0
-        
-        current_time = time.time()
-        expire_seconds = self.expire_hours * 3600
-        deleted_count = 0
-        
-        for filename in os.listdir(self.download_dir):
-            filepath = os.path.join(self.download_dir, filename)
-            if os.path.isfile(filepath):
-                file_age = current_time - os.path.getmtime(filepath)
-                if file_age > expire_seconds:
-                    try:
-                        os.remove(filepath)
-                        deleted_count += 1
-                    except Exception:
-                        pass
-        
-        return deleted_count
+        return self.reaper.run_once()['files']
     
-    def split_file_for_download(self, filename: str, max_size_mb: int = 20) -> List[Dict[str, str]]:
+    def split_file_for_download(self, filename: str, max_size_mb: float = 20) -> List[Dict[str, Any]]:
         """
         拆分大文件为多个小文件
         参数：
             filename: 原始文件名
             max_size_mb: 每个小文件的最大大小（MB）
-        返回： List[Dict]: 拆分后的文件信息列表
+        返回： List[Dict]: 拆分后的文件信息列表，包含 name, size, url,
+            以及记录清单用的 part（分片序号，0表示未拆分）, bytes, count, sha256
         """
         filepath = os.path.join(self.download_dir, filename)
-        print(f"[DEBUG] 原始文件名: {filename}")
-        print(f"[DEBUG] 完整文件路径: {filepath}")
+        logging.debug("拆分文件: %s，完整路径: %s", filename, filepath)
         if not os.path.exists(filepath):
             return []
         
@@ -403,7 +1809,8 @@ class FileManager:
             return [{
                 'name': filename,
                 'size': file_size_str,
-                'url': f"/download/{filename}"
+                'url': f"/download/{filename}",
+                'part': 0
             }]
         
         # 拆分文件
@@ -411,18 +1818,18 @@ class FileManager:
         part_files = []
         part_number = 1
         
-        with open(filepath, 'r', encoding='utf-8') as f:
+        with open(filepath, 'rb') as f:
             while True:
                 lines = []
                 current_size = 0
                 
                 # 读取一批数据
-                for _ in range(500000):  # 约50万条
+                for _ in range(PART_MAX_NUMBERS):  # 约50万条
                     line = f.readline()
                     if not line:
                         break
                     lines.append(line)
-                    current_size += len(line.encode('utf-8'))
+                    current_size += len(line)
                     
                     if current_size >= max_size:
                         break
@@ -433,18 +1840,25 @@ class FileManager:
                 # 写入分片文件
                 part_filename = f"part_{part_number}_{filename}"
                 part_filepath = os.path.join(self.download_dir, part_filename)
+                data = b''.join(lines)
                 
-                with open(part_filepath, 'w', encoding='utf-8') as part_file:
-                    part_file.writelines(lines)
+                with open(part_filepath, 'wb') as part_file:
+                    part_file.write(data)
                 
-                # 获取文件大小
-                part_size = os.path.getsize(part_filepath)
+                part_size = len(data)
                 part_size_str = number_generator._format_file_size(part_size)
+                self.register_file(part_filename, part_size)
+                BYTES_TOTAL.inc(part_size)
+                FILES_TOTAL.inc()
                 
                 part_files.append({
                     'name': part_filename,
                     'size': part_size_str,
-                    'url': f"/download/{part_filename}"
+                    'url': f"/download/{part_filename}",
+                    'part': part_number,
+                    'bytes': part_size,
+                    'count': len(lines),
+                    'sha256': hashlib.sha256(data).hexdigest()
                 })
                 
                 part_number += 1
@@ -452,8 +1866,100 @@ class FileManager:
         return part_files
 
 
+class _ArchiveStream:
+    """
+    只追加的写入缓冲，供 zipfile 以流式模式写入
+    不支持 tell/seek，zipfile 会在每个条目后写入数据描述符，不需要回写文件头。
+    """
+    
+    def __init__(self):
+        self._chunks: List[bytes] = []
+    
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self) -> None:
+        pass
+    
+    def drain(self) -> bytes:
+        """取出已写入的数据"""
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def shard_manifest(job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    生成分组导出的清单
+    参数：job: 清单中的任务记录（含 params 和 files）
+    返回：Optional[Dict]: 分组方式、号码总数和各组的文件名、号码数量、SHA-256，不是分组导出时返回None
+    """
+    shard_by = job['params'].get('shard_by')
+    if not shard_by:
+        return None
+    return {
+        'shard_by': shard_by,
+        'count': job['count'],
+        'shards': [{
+            'shard': entry['shard'],
+            'name': entry['name'],
+            'count': entry['count'],
+            'sha256': entry['sha256']
+        } for entry in job['files']]
+    }
+
+
+def iter_job_archive(job: Dict[str, Any], directory: str, compression: str = 'stored',
+                     block_size: int = 1024 * 1024) -> Iterator[bytes]:
+    """
+    流式生成任务的ZIP压缩包
+    逐个读取任务文件写入压缩包，每写入一块就输出，内存占用与文件大小无关。
+    压缩包末尾附带 SHA256SUMS 校验文件，分组导出的任务另附 SHARDS.json（各组的文件和号码数量）。
+    参数：
+        job: 清单中的任务记录（含 files）
+        directory: 下载目录
+        compression: 压缩方式，stored（不压缩）或 deflated
+        block_size: 每次读取的字节数
+    返回：Iterator[bytes]: 压缩包数据块
+    """
+    import zipfile
+    method = zipfile.ZIP_DEFLATED if compression == 'deflated' else zipfile.ZIP_STORED
+    stream = _ArchiveStream()
+    with zipfile.ZipFile(stream, 'w', compression=method, compresslevel=6 if method == zipfile.ZIP_DEFLATED else None) as archive:
+        for entry in job['files']:
+            info = zipfile.ZipInfo(entry['name'], date_time=time.localtime(entry['created'])[:6])
+            info.compress_type = method
+            with open(os.path.join(directory, entry['name']), 'rb') as src, \
+                    archive.open(info, 'w', force_zip64=entry['size'] >= zipfile.ZIP64_LIMIT) as dst:
+                while True:
+                    block = src.read(block_size)
+                    if not block:
+                        break
+                    dst.write(block)
+                    data = stream.drain()
+                    if data:
+                        yield data
+            yield stream.drain()
+        checksums = ''.join(f"{entry['sha256']}  {entry['name']}\n" for entry in job['files'])
+        archive.writestr('SHA256SUMS', checksums.encode('utf-8'))
+        shards = shard_manifest(job)
+        if shards is not None:
+            archive.writestr('SHARDS.json', json.dumps(shards, ensure_ascii=False, indent=2).encode('utf-8'))
+    yield stream.drain()
+
+
 # 创建文件管理器实例
-file_manager = FileManager()
+file_manager = create_singleton(FileManager)
+
+def create_exclusion_store():
+    """创建排除名单存储"""
+    from exclusion import ExclusionStore
+    return ExclusionStore(config.get_exclusion_dir())
+
+
+# 创建排除名单存储实例
+exclusion_store = create_singleton(create_exclusion_store)
 
 
 # ===========================================
@@ -486,22 +1992,38 @@ def validate_input(data: Dict[str, Any]) -> Tuple[bool, str]:
     参数：data: 用户提交的数据字典
     返回：Tuple[bool, str]: (验证是否通过, 错误信息)
     """
-    # 验证必填字段
-    prefix = str(data.get('prefix', '')).strip()
-    if not prefix:
-        return False, "请输入手机号前3位号段"
-    
-    if len(prefix) != 3 or not prefix.isdigit():
-        return False, "号段必须为3位数字"
-    
-    # 验证省份和城市（必填）
-    province = str(data.get('province', '')).strip()
-    if not province:
-        return False, "请选择省份"
-    
-    city = str(data.get('city', '')).strip()
-    if not city:
-        return False, "请选择城市"
+    from number_pattern import PatternError, compile_pattern
+    from region_query import RegionQueryError
+    from exclusion import is_valid_name as is_valid_exclusion_name
+    regions = data.get('regions')
+    if regions is not None and regions != '':
+        # 集合运算表达式：号段、省份、城市选填，填写时与表达式取交集
+        prefix = str(data.get('prefix') or '').strip()
+        if prefix and (len(prefix) != 3 or not prefix.isdigit()):
+            return False, "号段必须为3位数字"
+        if str(data.get('city') or '').strip() and not str(data.get('province') or '').strip():
+            return False, "请选择省份"
+        try:
+            build_region_query(data)
+        except RegionQueryError as e:
+            return False, str(e)
+    else:
+        # 验证必填字段
+        prefix = str(data.get('prefix', '')).strip()
+        if not prefix:
+            return False, "请输入手机号前3位号段"
+        
+        if len(prefix) != 3 or not prefix.isdigit():
+            return False, "号段必须为3位数字"
+        
+        # 验证省份和城市（必填）
+        province = str(data.get('province', '')).strip()
+        if not province:
+            return False, "请选择省份"
+        
+        city = str(data.get('city', '')).strip()
+        if not city:
+            return False, "请选择城市"
     
     # 验证后3/4位（互斥）
     suffix_4 = data.get('suffix_4')
@@ -519,6 +2041,45 @@ def validate_input(data: Dict[str, Any]) -> Tuple[bool, str]:
     if suffix_3:
         if len(suffix_3) != 3 or not suffix_3.isdigit():
             return False, "后3位必须为3位数字"
+    # 验证号码模式和排除数字
+    pattern = data.get('pattern')
+    exclude_digits = data.get('exclude_digits')
+    if pattern is not None and not isinstance(pattern, str):
+        return False, "号码模式必须为字符串"
+    if exclude_digits is not None and not isinstance(exclude_digits, str):
+        return False, "排除数字必须为字符串"
+    if (pattern and pattern.strip()) or (exclude_digits and exclude_digits.strip()):
+        try:
+            compile_pattern(pattern.strip() if pattern else None,
+                            exclude_digits.strip() if exclude_digits else None)
+        except PatternError as e:
+            return False, str(e)
+    # 验证随机抽样参数
+    sample = data.get('sample')
+    if sample is not None and sample != '':
+        if isinstance(sample, bool) or not str(sample).strip().isdigit() or int(str(sample).strip()) <= 0:
+            return False, "抽样数量必须为正整数"
+    seed = data.get('seed')
+    if seed is not None and seed != '':
+        if isinstance(seed, bool) or not str(seed).strip().isdigit() or len(str(seed).strip()) > 15:
+            return False, "随机种子必须为不超过15位的非负整数"
+    # 验证排除名单
+    exclude_list = data.get('exclude_list')
+    if exclude_list is not None and exclude_list != '':
+        if not isinstance(exclude_list, str) or not is_valid_exclusion_name(exclude_list.strip()):
+            return False, "排除名单名称只能包含字母、数字、下划线和连字符"
+        if not exclusion_store.exists(exclude_list.strip()):
+            return False, f"排除名单不存在：{exclude_list.strip()}"
+    # 验证分组导出参数
+    shard_by = data.get('shard_by')
+    if shard_by is not None and shard_by != '':
+        if shard_by not in SHARD_METHODS:
+            return False, f"无效的分组方式：{shard_by}"
+        if shard_by in ('hash', 'round_robin'):
+            shards = str(data.get('shards') if data.get('shards') is not None else '').strip()
+            max_shards = config.generator.get('max_shards', 64)
+            if isinstance(data.get('shards'), bool) or not shards.isdigit() or not 2 <= int(shards) <= max_shards:
+                return False, f"分组数量必须在2到{max_shards}之间"
     # 验证运营商
     operators = data.get('operators', [])
     if operators:
@@ -529,6 +2090,100 @@ def validate_input(data: Dict[str, Any]) -> Tuple[bool, str]:
     return True, ""
 
 
+def build_region_query(data: Dict[str, Any]) -> Optional[RegionQuery]:
+    """
+    编译请求中的集合运算表达式（regions）
+    同时填写的号段、省份、城市和运营商作为一个条件，与表达式取交集。
+    参数：data: 请求参数，regions 为表达式对象或JSON文本
+    返回：Optional[RegionQuery]: 编译后的表达式，未填写 regions 时返回None
+    异常：RegionQueryError: 表达式无效
+    """
+    from region_query import RegionQueryError, compile_region_query
+    regions = data.get('regions')
+    if regions is None or regions == '':
+        return None
+    if isinstance(regions, str):
+        try:
+            regions = json.loads(regions)
+        except ValueError:
+            raise RegionQueryError("集合运算表达式不是有效的JSON")
+    
+    condition: Dict[str, Any] = {}
+    for key in ('province', 'city'):
+        value = str(data.get(key) or '').strip()
+        if value:
+            condition[key] = unquote(value)
+    prefix = str(data.get('prefix') or '').strip()
+    if prefix:
+        condition['prefixes'] = [prefix]
+    if data.get('operators'):
+        condition['operators'] = list(data['operators'])
+    return compile_region_query({'intersect': [regions, condition]} if condition else regions)
+
+
+class NumberQuery(NamedTuple):
+    """解析后的号码查询条件"""
+    prefix: str
+    suffix_4: str
+    suffix_3: str
+    pattern: str
+    exclude_digits: str
+    exclude_list: str
+    province: str
+    city: str
+    operators: List[int]
+    number_pattern: Optional[NumberPattern]
+    region_query: Optional[RegionQuery] = None
+    
+    @property
+    def regions(self) -> str:
+        """规范化的集合运算表达式文本，未使用时为空字符串"""
+        return self.region_query.text if self.region_query is not None else ''
+    
+    @property
+    def number_prefix(self) -> str:
+        """拼接号码时区域码之前的部分：集合运算查询的区域已包含号段，为空字符串"""
+        return '' if self.region_query is not None else self.prefix
+
+
+def parse_number_query(data: Dict[str, Any]) -> NumberQuery:
+    """
+    提取号码查询条件（调用前需通过 validate_input 验证）
+    号码模式和排除数字会编译为位图，并与后3/4位条件取交集；集合运算表达式编译为一次查询。
+    参数：data: 请求参数
+    返回：NumberQuery: 查询条件
+    """
+    from number_pattern import compile_pattern
+    prefix = str(data.get('prefix') or '').strip()
+    # 修复：先检查是否为 None，再转换为字符串
+    suffix_4_raw = data.get('suffix_4')
+    suffix_3_raw = data.get('suffix_3')
+    suffix_4 = str(suffix_4_raw).strip() if suffix_4_raw and str(suffix_4_raw).strip() else ''
+    suffix_3 = str(suffix_3_raw).strip() if suffix_3_raw and str(suffix_3_raw).strip() else ''
+    pattern = str(data.get('pattern') or '').strip()
+    exclude_digits = ''.join(sorted(set(str(data.get('exclude_digits') or '').strip())))
+    
+    # 号码模式编译为位图（相同条件只编译一次），与后3/4位条件取交集
+    number_pattern = None
+    if pattern or exclude_digits:
+        number_pattern = compile_pattern(pattern or None, exclude_digits or None,
+                                         suffix_4 or None, suffix_3 or None)
+    
+    return NumberQuery(
+        prefix=prefix,
+        suffix_4=suffix_4,
+        suffix_3=suffix_3,
+        pattern=pattern,
+        exclude_digits=exclude_digits,
+        exclude_list=str(data.get('exclude_list') or '').strip(),
+        province=str(data.get('province') or '').strip(),
+        city=str(data.get('city') or '').strip(),
+        operators=data.get('operators') or [],
+        number_pattern=number_pattern,
+        region_query=build_region_query(data)
+    )
+
+
 def generate_filename(prefix: str, province: str, city: str, 
                       suffix: str, extension: str = 'txt') -> str:
     """
@@ -557,6 +2212,44 @@ def generate_filename(prefix: str, province: str, city: str,
     return filename
 
 
+def params_from_args(args) -> Dict[str, Any]:
+    """
+    将查询字符串转换为与 /api/generate 请求体相同的参数
+    operators 为逗号分隔的编码，无效时原样保留，由 validate_input 报错。
+    参数：args: 查询字符串（request.args）
+    返回：Dict: 请求参数
+    """
+    try:
+        operators = [int(op) for op in args.get('operators', '').split(',') if op.strip()]
+    except ValueError:
+        operators = [args.get('operators')]
+    return {
+        'prefix': args.get('prefix', ''),
+        'suffix_4': args.get('suffix_4') or None,
+        'suffix_3': args.get('suffix_3') or None,
+        'pattern': args.get('pattern') or None,
+        'exclude_digits': args.get('exclude_digits') or None,
+        'exclude_list': args.get('exclude_list') or None,
+        'regions': args.get('regions') or None,
+        'sample': args.get('sample') or None,
+        'seed': args.get('seed') or None,
+        'shard_by': args.get('shard_by') or None,
+        'shards': args.get('shards') or None,
+        'province': args.get('province', ''),
+        'city': args.get('city', ''),
+        'operators': operators
+    }
+
+
+def get_job_user() -> str:
+    """
+    获取当前请求的用户标识（用于生成任务公平排队）
+    已登录时使用用户名，未启用登录时使用客户端IP。
+    返回：str: 用户标识
+    """
+    return session.get('username') or request.remote_addr or 'anonymous'
+
+
 # ===========================================
 # 路由定义
 # ===========================================
@@ -569,9 +2262,10 @@ def index_page():
     渲染查询表单页面。
     如果登录功能启用且用户未登录，则重定向到登录页。
     """
-    # 获取省份列表
-    provinces = db_manager.get_provinces()
-    return render_template('index.html', provinces=provinces)
+    # 省市目录嵌入页面，选择省份和城市时不再请求接口
+    _, catalog, catalog_json = db_manager.get_catalog()
+    return render_template('index.html', provinces=list(catalog['provinces']),
+                           catalog_json=catalog_json)
 
 
 @app.route('/login')
@@ -665,6 +2359,299 @@ def api_cities(province: str):
     })
 
 
+@app.route('/api/prefixes/<province>/<city>')
+@login_required
+def api_prefixes(province: str, city: str):
+    """
+    获取城市号段可用性API
+    返回指定城市可用的号段、每个号段的区域码数量、预计号码数量及各运营商的区域码数量，
+    前端据此只提供有数据的号段。
+    参数：
+        province: 省份名称
+        city: 城市名称
+    返回：JSON: 号段列表
+    """
+    prefixes = db_manager.get_prefix_index(province, city)
+    return jsonify({
+        'code': 200,
+        'data': [{
+            'prefix': item['prefix'],
+            'locations': item['suffix_count'],
+            'numbers': item['suffix_count'] * len(ALL_LAST_FOUR),
+            'operators': {str(op): count for op, count in item['operators'].items()}
+        } for item in prefixes]
+    })
+
+
+@app.route('/api/catalog')
+@login_required
+def api_catalog():
+    """
+    获取省市目录API
+    返回全部省份、城市及每个城市可用的号段，ETag为数据版本，数据未变化时返回304。
+    返回：JSON: 省市目录
+    """
+    version, _, catalog_json = db_manager.get_catalog()
+    response = Response(f'{{"code":200,"data":{catalog_json}}}', mimetype='application/json')
+    response.set_etag(version)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+class GenerateError(Exception):
+    """
+    生成任务失败
+    携带返回给客户端的状态码和附加响应头（如 Retry-After）。
+    """
+    
+    def __init__(self, code: int, message: str, headers: Dict[str, str] = None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.headers = headers or {}
+
+
+def run_generate_job(data: Dict[str, Any], user: str,
+                     emit: Callable[[str, Dict[str, Any]], None] = None,
+                     cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """
+    执行一次号码生成任务
+    流程：校验参数 → 预先计算数量 → 查找缓存结果 → 申请运行槽位和内存预算 → 分块生成并写入文件。
+    需要分批时直接按分片写入，每写完一个分片就记录到清单并通知，分片立即可下载。
+    分组导出时按分组写入，各组由独立的写入线程同时写入，全部写完后记录到清单，不再按大小拆分。
+    不访问请求上下文，可在后台线程中运行。
+    参数：
+        data: 请求参数（prefix, suffix_4, suffix_3, pattern, exclude_digits, exclude_list, regions, province,
+            city, operators, sample, seed, shard_by, shards）
+        user: 用户标识（用于公平排队）
+        emit: 进度回调，参数为 (事件名, 数据)，事件包括
+            started（任务开始）、progress（已处理区域码和已写入号码数）、part（文件写完）
+        cancel: 取消标志，设置后在开始写入前或写完当前一块后停止（已写入的文件不作为缓存结果）
+    返回：Dict: 生成结果（job_id, count, files, archive_url 等）
+    异常：GenerateError: 参数无效、无结果、超出限制、服务器繁忙或任务已取消
+    """
+    import uuid
+    emit = emit or (lambda event, payload: None)
+    
+    def check_cancel() -> None:
+        if cancel is not None and cancel.is_set():
+            # 499：客户端已关闭请求（沿用Nginx的约定）
+            raise GenerateError(499, '客户端已断开，任务已取消')
+    
+    # 验证输入
+    with STAGE_SECONDS.time(stage='validate'):
+        valid, error_msg = validate_input(data)
+    if not valid:
+        raise GenerateError(400, error_msg)
+    
+    # 提取参数
+    query = parse_number_query(data)
+    prefix, suffix_4, suffix_3 = query.prefix, query.suffix_4, query.suffix_3
+    province, city, operators = query.province, query.city, query.operators
+    number_pattern = query.number_pattern
+    # 集合运算查询的区域码已包含号段
+    number_prefix = query.number_prefix
+    sample_raw = str(data.get('sample') if data.get('sample') is not None else '').strip()
+    sample_size = int(sample_raw) if sample_raw else 0
+    seed_raw = str(data.get('seed') if data.get('seed') is not None else '').strip()
+    # 未指定种子时随机生成一个并随结果返回，便于复现（不超过15位，前端可精确显示）
+    seed = int(seed_raw) if seed_raw else (random.SystemRandom().randrange(10 ** 15) if sample_size else None)
+    shard_by = data.get('shard_by') or ''
+    shards = int(str(data.get('shards')).strip()) if shard_by in ('hash', 'round_robin') else 0
+    
+    # 查询区域码并预先计算结果数量，超出限制时不生成
+    location_suffixes = number_generator.resolve_location_suffixes(query)
+    exclusion = None
+    if query.exclude_list:
+        exclusion = exclusion_store.get(query.exclude_list)
+        if exclusion is None:
+            raise GenerateError(400, f'排除名单不存在：{query.exclude_list}')
+    excluded, population = number_generator.resolve_excluded(query, location_suffixes, exclusion)
+    
+    if population == 0:
+        raise GenerateError(404, '未找到符合条件的号码')
+    
+    # 抽样模式只生成抽中的号码，数量限制按抽样数量计算
+    total_count = min(sample_size, population) if sample_size else population
+    
+    # 检查是否超过最大生成数量
+    if total_count > number_generator.max_count:
+        raise GenerateError(400, f'查询结果超过限制（最多{number_generator.max_count}条），请缩小查询范围')
+    
+    # 请求参数相同且数据未变化时复用已生成的文件
+    job_params = {
+        'prefix': prefix,
+        'suffix_4': suffix_4,
+        'suffix_3': suffix_3,
+        'pattern': query.pattern,
+        'exclude_digits': query.exclude_digits,
+        'exclude_list': query.exclude_list,
+        'regions': query.regions,
+        'province': province,
+        'city': city,
+        'operators': sorted(int(op) for op in operators) if operators else [],
+        'sample': sample_size,
+        'seed': seed,
+        'shard_by': shard_by,
+        'shards': shards
+    }
+    cache_key = None
+    # 未指定种子的抽样每次结果不同，不查找缓存
+    if config.download.get('result_cache', True) and not (sample_size and not seed_raw):
+        cache_key = hashlib.sha256(json.dumps({
+            'params': job_params,
+            'data_version': db_manager.data_version(),
+            'exclusion_version': exclusion.version if exclusion is not None else None,
+            'file_size_limit': number_generator.file_size_limit,
+            'sampler': SAMPLE_ALGORITHM if sample_size else None
+        }, sort_keys=True).encode('utf-8')).hexdigest()
+        cached_job = file_manager.find_cached_result(cache_key)
+        if cached_job is not None:
+            logging.info("复用生成结果：任务 %s，%d 条", cached_job['job_id'], cached_job['count'])
+            return {
+                'job_id': cached_job['job_id'],
+                'count': cached_job['count'],
+                'files': [file_manager.public_file_info(entry) for entry in cached_job['files']],
+                'archive_url': f"/download/job/{cached_job['job_id']}.zip",
+                'population': population,
+                'seed': seed,
+                'shards': shard_manifest(cached_job),
+                'cached': True
+            }
+    
+    # 申请运行槽位，槽位已满时按成本和用户公平排队
+    try:
+        admission_slot = generation_admission.admit(user, total_count)
+    except AdmissionRejected as e:
+        JOBS_REJECTED_TOTAL.inc(reason='saturated')
+        raise GenerateError(429, str(e), {'Retry-After': str(e.retry_after)})
+    
+    with admission_slot:
+        # 申请内存预算，额度决定分块大小
+        # 抽样模式下抽中的下标逐块生成，不另外占用内存
+        request_budget = int(config.generator.get('request_memory_mb', 64) * 1024 * 1024)
+        desired = min(request_budget, total_count * BYTES_PER_NUMBER)
+        try:
+            granted = generation_budget.acquire(
+                desired=desired,
+                minimum=MIN_CHUNK_NUMBERS * BYTES_PER_NUMBER,
+                timeout=config.generator.get('memory_queue_timeout', 30)
+            )
+        except MemoryBudgetExceeded as e:
+            JOBS_REJECTED_TOTAL.inc(reason='memory')
+            retry_after = str(max(1, int(config.generator.get('memory_queue_timeout', 30))))
+            raise GenerateError(503, f'服务器繁忙：{str(e)}', {'Retry-After': retry_after})
+        
+        try:
+            # 一个区域码的号码不跨块拆分，分块目标数量扣除一个区域码的余量
+            chunk_size = max(MIN_CHUNK_NUMBERS, granted // BYTES_PER_NUMBER - MIN_CHUNK_NUMBERS)
+            shard_keys: List[str] = []
+            if shard_by:
+                # 各写入线程的队列中最多还有 SHARD_QUEUE_SIZE 块号码，分块相应缩小以保持在预算内
+                chunk_size = max(MIN_CHUNK_NUMBERS, chunk_size // (SHARD_QUEUE_SIZE + 1))
+                shard_keys, partition = number_generator.shard_partitioner(
+                    shard_by, shards, number_prefix, location_suffixes
+                )
+            tracker = RssTracker()
+            
+            # 确定后缀
+            suffix = 'PATTERN' if number_pattern is not None else (suffix_4 or suffix_3 or 'ALL')
+            if sample_size:
+                suffix = f"{suffix}_SAMPLE{total_count}"
+            
+            # 生成文件名，同一秒内的同名任务追加任务ID，避免覆盖清单中已有的文件
+            job_id = uuid.uuid4().hex
+            # 集合运算查询的文件名使用表达式摘要代替省份和城市
+            if query.region_query is not None:
+                name_parts = (prefix or 'ALL', 'REGIONS',
+                              hashlib.sha256(query.regions.encode('utf-8')).hexdigest()[:8])
+            else:
+                name_parts = (prefix, province, city)
+            filename = generate_filename(*name_parts, suffix)
+            if filename in file_manager.index or file_manager.manifest.get_file(filename) \
+                    or file_manager.manifest.get_file(f"part_1_{filename}") \
+                    or (shard_keys and file_manager.manifest.get_file(f"shard_{shard_keys[0]}_{filename}")):
+                filename = generate_filename(*name_parts, f"{suffix}_{job_id[:8]}")
+            logging.debug("生成的文件名: %s", filename)
+            
+            # 文件大小可以预先算出（每行固定字节数），超过分批阈值时直接按分片写入
+            numbers_per_part = 0
+            limit_bytes = number_generator.file_size_limit * 1024 * 1024
+            if total_count * NUMBER_LINE_BYTES > limit_bytes:
+                numbers_per_part = min(PART_MAX_NUMBERS, max(1, -(-int(limit_bytes) // NUMBER_LINE_BYTES)))
+            parts_total = -(-total_count // numbers_per_part) if numbers_per_part else 1
+            if shard_keys:
+                numbers_per_part = 0
+                parts_total = len(shard_keys)
+            
+            check_cancel()
+            file_manager.manifest.create_job(job_id, job_params, total_count)
+            emit('started', {
+                'job_id': job_id,
+                'count': total_count,
+                'locations_total': len(location_suffixes),
+                'parts_total': parts_total
+            })
+            
+            def on_chunk(numbers_written: int) -> None:
+                check_cancel()
+                tracker.sample()
+                emit('progress', {
+                    'locations_done': numbers_written * len(location_suffixes) // total_count,
+                    'numbers_written': numbers_written
+                })
+            
+            files: List[Dict[str, Any]] = []
+            
+            def on_part(written: WrittenFile) -> None:
+                info = file_manager.record_file(job_id, written)
+                files.append(info)
+                emit('part', dict(info, part=written.part, parts_total=parts_total))
+            
+            # 分块生成并写入文件，写完前任务的文件不会被清理
+            result_key = None
+            try:
+                if sample_size:
+                    chunks = number_generator.iter_sample_chunks(
+                        number_prefix, location_suffixes, total_count, seed, suffix_4 or None, suffix_3 or None,
+                        chunk_size, pattern=number_pattern, excluded=excluded
+                    )
+                else:
+                    chunks = number_generator.iter_number_chunks(
+                        number_prefix, location_suffixes, suffix_4 or None, suffix_3 or None, chunk_size,
+                        pattern=number_pattern, excluded=excluded
+                    )
+                if shard_keys:
+                    number_generator.write_number_shards(
+                        chunks, filename, shard_keys, partition, on_chunk=on_chunk, on_part=on_part
+                    )
+                else:
+                    number_generator.write_number_parts(
+                        chunks, filename, numbers_per_part, on_chunk=on_chunk, on_part=on_part
+                    )
+                result_key = cache_key
+            finally:
+                # 失败的任务不作为缓存结果，已写入的文件按普通文件清理
+                file_manager.finish_job(job_id, [info['name'] for info in files], result_key)
+            tracker.sample()
+        finally:
+            generation_budget.release(granted)
+    
+    logging.info("生成完成：%s，%d 条，%d 个文件，分块 %d 条，进程RSS峰值 %.1f MB",
+                 filename, total_count, len(files), chunk_size, tracker.peak_mb)
+    
+    return {
+        'job_id': job_id,
+        'count': total_count,
+        'files': files,
+        'archive_url': f"/download/job/{job_id}.zip",
+        'population': population,
+        'seed': seed,
+        'shards': shard_manifest(file_manager.manifest.get_job(job_id)),
+        'peak_rss_mb': tracker.peak_mb
+    }
+
+
 @app.route('/api/generate', methods=['POST'])
 @login_required
 def api_generate():
@@ -672,96 +2659,37 @@ def api_generate():
     生成号码API
     根据用户输入的条件生成手机号码，并返回下载链接。
     请求参数：
-        prefix: 手机号前3位号段（必填）
+        prefix: 手机号前3位号段（必填，填写 regions 时选填）
         suffix_4: 手机号最后4位（选填）
         suffix_3: 手机号最后3位（选填）
-        province: 省份（必填）
-        city: 城市（必填）
+        pattern: 号码模式（选填），如 **88、AABB、1380000**88
+        exclude_digits: 排除的数字（选填），如 4
+        exclude_list: 排除名单名称（选填），名单中的号码不会出现在结果中
+        regions: 地区/运营商/号段的集合运算表达式（选填），见 region_query 模块
+        sample: 随机抽样数量（选填），给出时从符合条件的号码中不重复地随机抽取
+        seed: 随机种子（选填），相同种子和条件得到相同的抽样结果
+        shard_by: 分组导出方式（选填）：hash、round_robin、operator 或 prefix
+        shards: 分组数量（shard_by 为 hash 或 round_robin 时必填）
+        province: 省份（必填，填写 regions 时选填）
+        city: 城市（必填，填写 regions 时选填）
         operators: 运营商列表（选填）
     返回：
         JSON: 生成结果和下载链接
     """
     try:
-        # 获取请求数据
-        data = request.get_json()
-        
-        # 验证输入
-        valid, error_msg = validate_input(data)
-        if not valid:
-            return jsonify({
-                'code': 400,
-                'message': error_msg
-            }), 400
-        
-        # 提取参数
-        prefix = str(data.get('prefix', '')).strip()
-        # 修复：先检查是否为 None，再转换为字符串
-        suffix_4_raw = data.get('suffix_4')
-        suffix_3_raw = data.get('suffix_3')
-        suffix_4 = str(suffix_4_raw).strip() if suffix_4_raw and str(suffix_4_raw).strip() else ''
-        suffix_3 = str(suffix_3_raw).strip() if suffix_3_raw and str(suffix_3_raw).strip() else ''
-        province = str(data.get('province', '')).strip()
-        city = str(data.get('city', '')).strip()
-        operators = data.get('operators', [])
-        
-        # 生成号码
-        numbers = number_generator.generate_numbers(
-            prefix=prefix,
-            suffix=suffix_4 or None,
-            suffix_3=suffix_3 or None,
-            province=province,
-            city=city,
-            operators=operators if operators else None
-        )
-        
-        if not numbers:
-            return jsonify({
-                'code': 404,
-                'message': '未找到符合条件的号码'
-            }), 404
-        
-        # 检查是否超过最大生成数量
-        if len(numbers) > number_generator.max_count:
-            return jsonify({
-                'code': 400,
-                'message': f'查询结果超过限制（最多{number_generator.max_count}条），请缩小查询范围'
-            }), 400
-        
-        # 确定后缀
-        suffix = suffix_4 or suffix_3 or 'ALL'
-        
-        # 生成文件名
-        filename = generate_filename(prefix, province, city, suffix)
-        print(f"[DEBUG] 生成的文件名: {filename}")
-        
-        # 写入文件
-        actual_filename, file_size, file_size_str = number_generator.generate_to_file(numbers, filename)
-        print(f"[DEBUG] 实际写入文件名: {actual_filename}")
-        # 检查是否需要分批
-        file_path = os.path.join(config.get_download_dir(), actual_filename)
-        print(f"[DEBUG] 生成文件完整路径: {file_path}")
-
-        file_size_bytes = os.path.getsize(file_path)
-        
-        if file_size_bytes > number_generator.file_size_limit * 1024 * 1024:
-            # 需要分批
-            files = file_manager.split_file_for_download(actual_filename)
-        else:
-            files = [{
-                'name': actual_filename,
-                'size': file_size_str,
-                'url': f"/download/{actual_filename}"
-            }]
-        
+        result = run_generate_job(request.get_json(), get_job_user())
         return jsonify({
             'code': 200,
             'message': '生成成功',
-            'data': {
-                'count': len(numbers),
-                'files': files
-            }
+            'data': result
         })
-        
+    except GenerateError as e:
+        response = jsonify({
+            'code': e.code,
+            'message': e.message
+        })
+        response.headers.update(e.headers)
+        return response, e.code
     except Exception as e:
         logging.error(f"生成号码时发生错误：{str(e)}")
         return jsonify({
@@ -770,6 +2698,309 @@ def api_generate():
         }), 500
 
 
+def format_sse(event: str, payload: Dict[str, Any]) -> str:
+    """
+    格式化一条Server-Sent Events消息
+    参数：
+        event: 事件名
+        payload: 事件数据
+    返回：str: SSE消息文本
+    """
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.route('/api/generate/stream')
+@login_required
+def api_generate_stream():
+    """
+    生成号码API（进度推送）
+    参数与 /api/generate 相同，通过查询字符串传递，operators 为逗号分隔的编码。
+    以Server-Sent Events返回生成进度，生成在后台线程中执行：
+        started: 任务开始（job_id, count, locations_total, parts_total）
+        progress: 已处理区域码数和已写入号码数
+        part: 一个文件写完，可立即下载
+        done: 全部完成，数据同 /api/generate 的 data
+        error: 生成失败（code, message, retry_after）
+    客户端断开后响应被关闭，生成在写完当前一块后停止，已写入的文件不作为缓存结果；
+    断开只能在发送事件或保持连接的注释行时发现，最迟约15秒后停止。
+    返回：text/event-stream 响应
+    """
+    import queue
+    data = params_from_args(request.args)
+    user = get_job_user()
+    events: 'queue.Queue[Optional[Tuple[str, Dict[str, Any]]]]' = queue.Queue()
+    cancel = threading.Event()
+    
+    def worker() -> None:
+        try:
+            result = run_generate_job(data, user, lambda event, payload: events.put((event, payload)), cancel)
+            events.put(('done', result))
+        except GenerateError as e:
+            if cancel.is_set():
+                logging.info("客户端已断开，生成任务已停止")
+            events.put(('error', {
+                'code': e.code,
+                'message': e.message,
+                'retry_after': e.headers.get('Retry-After')
+            }))
+        except Exception as e:
+            logging.error(f"生成号码时发生错误：{str(e)}")
+            events.put(('error', {'code': 500, 'message': f'生成失败：{str(e)}'}))
+        finally:
+            events.put(None)
+    
+    def stream() -> Iterator[str]:
+        # 建议客户端断线后不自动重连（重连会重新提交任务）
+        yield 'retry: 86400000\n\n'
+        while True:
+            try:
+                item = events.get(timeout=15)
+            except queue.Empty:
+                # 排队或大文件写入期间发送注释行保持连接
+                yield ': keepalive\n\n'
+                continue
+            if item is None:
+                break
+            yield format_sse(*item)
+    
+    threading.Thread(target=worker, name='generate-stream', daemon=True).start()
+    response = Response(stream(), mimetype='text/event-stream')
+    # 响应结束或客户端断开时服务器关闭响应，通知后台线程停止生成
+    response.call_on_close(cancel.set)
+    response.headers['Cache-Control'] = 'no-cache'
+    # 禁止Nginx缓冲，事件立即送达
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@app.route('/api/numbers')
+@login_required
+def api_numbers():
+    """
+    分页获取号码API
+    查询条件与 /api/generate 相同（通过查询字符串传递，不支持随机抽样和分组导出），不生成文件。
+    号码按升序排列，按游标逐页获取，每页只生成所需的号码。
+    请求参数：
+        cursor: 游标（上一页返回的 next_cursor），不传表示第一页
+        limit: 每页数量，默认1000，最大为 generator.page_max_limit
+    返回：
+        JSON: 本页号码、结果总数和下一页游标（没有下一页时为null）
+    """
+    data = params_from_args(request.args)
+    valid, error_msg = validate_input(data)
+    if not valid:
+        return jsonify({'code': 400, 'message': error_msg}), 400
+    if data['sample']:
+        return jsonify({'code': 400, 'message': '分页接口不支持随机抽样'}), 400
+    if data['shard_by']:
+        return jsonify({'code': 400, 'message': '分页接口不支持分组导出'}), 400
+    
+    max_limit = config.generator.get('page_max_limit', 10000)
+    limit_raw = request.args.get('limit', '').strip()
+    if limit_raw and not limit_raw.isdigit():
+        return jsonify({'code': 400, 'message': '每页数量必须为正整数'}), 400
+    limit = int(limit_raw) if limit_raw else min(1000, max_limit)
+    if not 1 <= limit <= max_limit:
+        return jsonify({'code': 400, 'message': f'每页数量必须在1到{max_limit}之间'}), 400
+    
+    query = parse_number_query(data)
+    cursor = request.args.get('cursor', '').strip() or None
+    if cursor is not None and not (len(cursor) == 11 and cursor.isdigit() and cursor.startswith(query.prefix)):
+        return jsonify({'code': 400, 'message': '无效的游标'}), 400
+    
+    location_suffixes = number_generator.resolve_location_suffixes(query)
+    exclusion = exclusion_store.get(query.exclude_list) if query.exclude_list else None
+    excluded, total = number_generator.resolve_excluded(query, location_suffixes, exclusion)
+    numbers, next_cursor = number_generator.page_numbers(
+        query.number_prefix, location_suffixes, cursor, limit,
+        query.suffix_4 or None, query.suffix_3 or None, query.number_pattern, excluded
+    )
+    return jsonify({
+        'code': 200,
+        'data': {
+            'numbers': numbers,
+            'count': total,
+            'next_cursor': next_cursor
+        }
+    })
+
+
+
+def _csv_row(values: Iterable[Any]) -> bytes:
+    """按CSV规则转义一行，返回UTF-8编码（含换行符）"""
+    import csv
+    out = io.StringIO()
+    csv.writer(out, lineterminator='\n').writerow(values)
+    return out.getvalue().encode('utf-8')
+
+
+def _lookup_batch_csv(fields: List[bytes]) -> bytes:
+    """反查一批号码，返回CSV（每个输入一行）"""
+    numbers: List[Optional[bytes]] = []
+    for field in fields:
+        # 绝大多数输入是11位号码，只有其他写法（如带 +86）才用正则解析
+        if len(field) == 11 and field.isdigit() and field[0] == 0x31:
+            numbers.append(field)
+        else:
+            match = LOOKUP_NUMBER_PATTERN.fullmatch(field)
+            numbers.append(match.group(1) if match else None)
+    areas = [int(number[:7]) if number is not None else -1 for number in numbers]
+    found = db_manager.lookup_areas(set(areas) - {-1})
+    
+    # 每个区域的归属地列只转义一次
+    missing = b',,,\n'
+    columns = {area: b',' + _csv_row(location) for area, location in found.items()}
+    rows = []
+    hits = invalid = 0
+    for field, number, area in zip(fields, numbers, areas):
+        if number is None:
+            invalid += 1
+            rows.append(_csv_row((field.decode('utf-8', 'replace'), '', '', '')))
+            continue
+        column = columns.get(area)
+        if column is None:
+            rows.append(number + missing)
+        else:
+            hits += 1
+            rows.append(number + column)
+    LOOKUP_NUMBERS_TOTAL.inc(hits, result='found')
+    LOOKUP_NUMBERS_TOTAL.inc(len(fields) - hits - invalid, result='missing')
+    LOOKUP_NUMBERS_TOTAL.inc(invalid, result='invalid')
+    return b''.join(rows)
+
+
+def iter_lookup_csv(blocks: Iterable[bytes], batch_size: int = LOOKUP_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    批量反查号码归属地，按输入顺序输出CSV
+    输入按块读取后按行切分，每批 batch_size 行整批去重排序后一次反查，
+    结果逐批输出，内存占用与总行数无关。
+    无法解析或未找到归属地的号码也输出一行（归属地为空），输出行与输入的非空行一一对应。
+    参数：
+        blocks: 输入数据块（bytes），每行一个号码，CSV取第一列
+        batch_size: 每批行数
+    返回：Iterator[bytes]: CSV数据块，第一块为表头
+    """
+    yield b'number,province,city,operator\n'
+    batch: List[bytes] = []
+    rest = b''
+    for block in blocks:
+        lines = (rest + block).split(b'\n')
+        rest = lines.pop()
+        batch.extend([field for field in (line.split(b',', 1)[0].strip() for line in lines) if field])
+        while len(batch) >= batch_size:
+            yield _lookup_batch_csv(batch[:batch_size])
+            batch = batch[batch_size:]
+    field = rest.split(b',', 1)[0].strip()
+    if field:
+        batch.append(field)
+    if batch:
+        yield _lookup_batch_csv(batch)
+
+
+@app.route('/api/lookup')
+@login_required
+def api_lookup():
+    """
+    号码归属地反查API
+    请求参数：number: 11位手机号（允许 +86 前缀）
+    返回：JSON: 号码、省份、城市和运营商
+    """
+    match = LOOKUP_NUMBER_PATTERN.fullmatch(request.args.get('number', '').strip().encode('utf-8'))
+    if not match:
+        return jsonify({'code': 400, 'message': '号码必须为11位手机号'}), 400
+    number = match.group(1).decode('ascii')
+    location = db_manager.lookup_areas([int(number[:7])]).get(int(number[:7]))
+    if location is None:
+        LOOKUP_NUMBERS_TOTAL.inc(result='missing')
+        return jsonify({'code': 404, 'message': f'未找到号码归属地：{number}'}), 404
+    LOOKUP_NUMBERS_TOTAL.inc(result='found')
+    province, city, operator = location
+    return jsonify({
+        'code': 200,
+        'data': {
+            'number': number,
+            'province': province,
+            'city': city,
+            'operator': operator
+        }
+    })
+
+
+@app.route('/api/lookup', methods=['POST'])
+@login_required
+def api_lookup_bulk():
+    """
+    批量号码归属地反查API
+    请求体为纯文本（每行一个号码，CSV取第一列），或 multipart 表单的 file 字段。
+    边读取边反查边输出，结果为CSV（number, province, city, operator），顺序与输入一致。
+    返回：CSV流
+    """
+    upload = request.files.get('file')
+    if upload is not None:
+        # 请求结束时会关闭上传的文件，而结果在响应阶段才边读边输出，取出文件流自行关闭
+        stream, upload.stream = upload.stream, io.BytesIO()
+    else:
+        stream = request.stream
+    
+    def blocks() -> Iterator[bytes]:
+        try:
+            yield from iter(lambda: stream.read(1024 * 1024), b'')
+        finally:
+            if upload is not None:
+                stream.close()
+    
+    return Response(
+        stream_with_context(iter_lookup_csv(blocks())),
+        mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename="lookup.csv"'}
+    )
+
+
+@app.route('/api/exclusions')
+@login_required
+def api_exclusions():
+    """
+    获取排除名单列表API
+    返回：JSON: 名单列表（name, count, size, updated）
+    """
+    return jsonify({'code': 200, 'data': exclusion_store.list()})
+
+
+@app.route('/api/exclusions/<name>', methods=['PUT', 'POST'])
+@login_required
+def api_exclusion_upload(name: str):
+    """
+    上传（替换）排除名单API
+    请求体为纯文本（每行一个号码，CSV取第一列），或 multipart 表单的 file 字段。
+    上传内容按行流式读取，分批排序后归并写入，不整体载入内存。
+    返回：JSON: 名单名称、去重后的号码数量和跳过的无效行数
+    """
+    from exclusion import is_valid_name as is_valid_exclusion_name
+    if not is_valid_exclusion_name(name):
+        return jsonify({'code': 400, 'message': '排除名单名称只能包含字母、数字、下划线和连字符'}), 400
+    upload = request.files.get('file')
+    stream = upload.stream if upload is not None else request.stream
+    try:
+        result = exclusion_store.save(name, iter(lambda: stream.readline(65536), b''))
+    except OSError as e:
+        logging.error(f"保存排除名单失败：{name}，{str(e)}")
+        return jsonify({'code': 500, 'message': f'保存排除名单失败：{str(e)}'}), 500
+    logging.info("保存排除名单：%s，%d 个号码，跳过 %d 行", name, result['count'], result['invalid'])
+    return jsonify({'code': 200, 'message': f"已保存 {result['count']} 个号码", 'data': result})
+
+
+@app.route('/api/exclusions/<name>', methods=['DELETE'])
+@login_required
+def api_exclusion_delete(name: str):
+    """
+    删除排除名单API
+    返回：JSON: 删除结果
+    """
+    if not exclusion_store.delete(name):
+        return jsonify({'code': 404, 'message': f'排除名单不存在：{name}'}), 404
+    return jsonify({'code': 200, 'message': f'已删除排除名单：{name}'})
+
+
 @app.route('/download/<filename>')
 @login_required
 def download_file(filename: str):
@@ -783,26 +3014,211 @@ def download_file(filename: str):
 
     # URL 解码文件名
     filename_decoded = unquote(filename)
-    print(f"[DEBUG] 原始文件名: {filename}")
-    print(f"[DEBUG] 解码后文件名: {filename_decoded}")
+    logging.debug("原始文件名: %s，解码后文件名: %s", filename, filename_decoded)
 
-    filepath = os.path.join(config.get_download_dir(), filename_decoded)
-    print(f"[DEBUG] 完整文件路径: {filepath}")
-    print(f"[DEBUG] 文件是否存在: {os.path.exists(filepath)}")
+    # 通过清单查找文件，不在清单中的文件不可下载
+    filepath = file_manager.get_download_path(filename_decoded)
+    logging.debug("完整文件路径: %s", filepath)
 
-    if not os.path.exists(filepath):
+    if filepath is None:
         return jsonify({
             'code': 404,
             'message': '文件不存在或已过期'
         }), 404
 
     # 生成下载响应
-    return send_file(
-        filepath,
-        as_attachment=True,
-        download_name=filename_decoded,
-        mimetype='text/plain'
+    try:
+        response = send_file(
+            filepath,
+            as_attachment=True,
+            download_name=filename_decoded,
+            mimetype='text/plain'
+        )
+    except FileNotFoundError:
+        # 文件已被外部删除
+        file_manager.remove_missing_file(filename_decoded)
+        return jsonify({
+            'code': 404,
+            'message': '文件不存在或已过期'
+        }), 404
+
+    # 记录访问时间，配额不足时最久未下载的文件先被淘汰
+    file_manager.touch_file(filename_decoded)
+    return response
+
+
+@app.route('/download/job/<job_id>.zip')
+@login_required
+def download_job_archive(job_id: str):
+    """
+    打包下载API
+    将任务的全部文件（拆分时为各分片）边读取边打包为一个ZIP返回，不在磁盘上生成压缩包。
+    压缩方式默认读取 download.archive_compression，可用 ?compression=stored|deflated 覆盖。
+    参数：job_id: 任务ID
+    返回：ZIP流式下载响应
+    """
+    job = file_manager.manifest.get_job(job_id)
+    if job is None:
+        return jsonify({
+            'code': 404,
+            'message': '任务不存在或文件已过期'
+        }), 404
+    
+    directory = config.get_download_dir()
+    for entry in job['files']:
+        if not os.path.isfile(os.path.join(directory, entry['name'])):
+            file_manager.remove_missing_file(entry['name'])
+            return jsonify({
+                'code': 404,
+                'message': '部分文件已过期，请重新生成'
+            }), 404
+        file_manager.touch_file(entry['name'])
+    
+    compression = request.args.get('compression') or config.download.get('archive_compression', 'stored')
+    if compression not in ('stored', 'deflated'):
+        return jsonify({
+            'code': 400,
+            'message': '压缩方式只能为 stored 或 deflated'
+        }), 400
+    
+    # 压缩包以第一个文件名（去掉分片前缀）命名
+    base_name = os.path.splitext(job['files'][0]['name'])[0]
+    if job['files'][0]['part'] > 0:
+        base_name = base_name.split('_', 2)[2]
+    response = Response(iter_job_archive(job, directory, compression), mimetype='application/zip')
+    response.headers['Content-Disposition'] = (
+        f"attachment; filename=\"{job_id}.zip\"; filename*=UTF-8''{quote(base_name + '.zip')}"
     )
+    return response
+
+
+@app.route('/api/jobs/<job_id>')
+@login_required
+def api_job(job_id: str):
+    """
+    生成任务详情API
+    返回任务的请求参数和全部可下载文件（拆分时为各分片），供重新下载或打包。
+    参数：job_id: 任务ID
+    返回：JSON: 任务详情
+    """
+    job = file_manager.manifest.get_job(job_id)
+    if job is None:
+        return jsonify({
+            'code': 404,
+            'message': '任务不存在或文件已过期'
+        }), 404
+    files = []
+    for entry in job['files']:
+        info = file_manager.public_file_info(entry)
+        info['sha256'] = entry['sha256']
+        files.append(info)
+    return jsonify({
+        'code': 200,
+        'data': {
+            'job_id': job['job_id'],
+            'params': job['params'],
+            'count': job['count'],
+            'created': datetime.fromtimestamp(job['created']).strftime('%Y-%m-%d %H:%M:%S'),
+            'files': files,
+            'shards': shard_manifest(job),
+            'archive_url': f"/download/job/{job['job_id']}.zip"
+        }
+    })
+
+
+@app.route('/assets/<path:filename>')
+def asset_file(filename: str):
+    """
+    静态资源API
+    提供构建后的带指纹资源，按 Accept-Encoding 选择预先压缩的 .br/.gz 文件。
+    文件名随内容变化，响应可被浏览器永久缓存。
+    参数：filename: 带指纹的相对路径，如 css/style.3f9a1c2b.css
+    返回：资源文件响应
+    """
+    pipeline = app.extensions.get('asset_pipeline')
+    chosen = pipeline.choose_file(filename, request.headers.get('Accept-Encoding', '')) if pipeline else None
+    if chosen is None:
+        return jsonify({
+            'code': 404,
+            'message': '资源不存在'
+        }), 404
+    path, encoding = chosen
+    mimetype = 'text/css' if filename.endswith('.css') else 'application/javascript'
+    response = send_file(path, mimetype=mimetype, conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """
+    运行指标API
+    以Prometheus文本格式返回请求耗时、生成阶段耗时、数据库查询耗时和产出统计。
+    指标未启用时返回404，无权读取时返回403（见 is_metrics_authorized()）。
+    返回：Prometheus文本格式的指标
+    """
+    if not metrics_registry.enabled:
+        return jsonify({
+            'code': 404,
+            'message': '运行指标未启用'
+        }), 404
+    if not is_metrics_authorized():
+        return jsonify({
+            'code': 403,
+            'message': '无权读取运行指标'
+        }), 403
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/api/admin/profiles')
+@login_required
+def api_profiles():
+    """
+    剖析文件列表API
+    列出已采集的请求剖析文件（.prof 和 .collapsed）。
+    返回：JSON: 剖析文件列表
+    """
+    from profiling import list_profiles
+    if not is_profiling_authorized():
+        return jsonify({
+            'code': 403,
+            'message': '无权查看剖析文件'
+        }), 403
+    profiles = list_profiles(get_request_profile_dir())
+    for item in profiles:
+        item['url'] = url_for('api_profile_download', name=item['name'])
+    return jsonify({
+        'code': 200,
+        'data': profiles
+    })
+
+
+@app.route('/api/admin/profiles/<name>')
+@login_required
+def api_profile_download(name: str):
+    """
+    下载剖析文件API
+    参数：name: 剖析文件名
+    返回：文件下载响应
+    """
+    from profiling import PROFILE_EXTENSIONS
+    if not is_profiling_authorized():
+        return jsonify({
+            'code': 403,
+            'message': '无权查看剖析文件'
+        }), 403
+    profile_dir = get_request_profile_dir()
+    filepath = os.path.join(profile_dir, os.path.basename(name))
+    if not name.endswith(PROFILE_EXTENSIONS) or not os.path.isfile(filepath):
+        return jsonify({
+            'code': 404,
+            'message': '剖析文件不存在'
+        }), 404
+    return send_file(filepath, as_attachment=True, download_name=os.path.basename(name),
+                     mimetype='application/octet-stream')
 
 
 @app.route('/api/cleanup', methods=['POST'])
@@ -810,15 +3226,19 @@ def download_file(filename: str):
 def api_cleanup():
     """
     清理过期文件API
-    手动触发清理过期文件。
+    立即执行一次清理（后台清理线程也会按 download.reap_interval 定期执行）。
     返回：
         JSON: 清理结果
     """
     try:
-        deleted_count = file_manager.cleanup_expired_files()
+        result = file_manager.reaper.run_once()
         return jsonify({
             'code': 200,
-            'message': f'已清理 {deleted_count} 个过期文件'
+            'message': f"已清理 {result['files']} 个过期文件",
+            'data': {
+                'files': result['files'],
+                'bytes': result['bytes']
+            }
         })
     except Exception as e:
         return jsonify({
@@ -873,8 +3293,16 @@ def init_database():
     """
     初始化数据库
     在应用启动时检查并初始化数据库。
+    如果二进制快照存在且与CSV文件一致，直接映射快照，跳过导入检查。
     """
     try:
+        snapshot = db_manager.load_snapshot()
+        if (snapshot is not None
+                and snapshot.is_fresh_for(config.get_csv_path())
+                and os.path.exists(config.get_database_path())):
+            logging.info(f"已加载二进制快照：{snapshot.path}（{snapshot.record_count} 条记录）")
+            return
+        
         from final_import import DataImporter
         importer = DataImporter()
         
@@ -890,22 +3318,58 @@ def init_database():
         # 这样可以确保表结构正确创建
         logging.info("开始初始化数据库...")
         importer.import_data()
+        db_manager.load_snapshot()
         
     except Exception as e:
         logging.error(f"初始化数据库失败：{str(e)}")
 
 
-def main():
+def after_worker_fork() -> None:
+    """
+    工作进程派生后的初始化
+    后台线程不会被复制到子进程中，需要在每个工作进程中重新启动日志监听、配置文件监视和文件清理。
+    文件清单的SQLite连接在派生时已自动丢弃（见 manifest 模块），首次访问时重新连接。
+    """
+    restart_log_listener()
+    config.start_watcher()
+    file_manager.start_reaper()
+
+
+def parse_args(argv: List[str] = None):
+    """
+    解析命令行参数
+    参数：argv: 命令行参数列表，默认读取sys.argv
+    返回：argparse.Namespace: 解析结果
+    """
+    import argparse
+    parser = argparse.ArgumentParser(description='手机号码生成查询系统')
+    parser.add_argument('--host', help='绑定地址，默认读取 app.host')
+    parser.add_argument('--port', type=int, help='监听端口，默认读取 app.port')
+    parser.add_argument('--serve', action='store_true',
+                        help='使用生产环境服务器（多进程/多线程）启动')
+    parser.add_argument('--backend', choices=['auto', 'gunicorn', 'waitress', 'werkzeug'],
+                        help='生产服务器后端，默认读取 server.backend')
+    parser.add_argument('--workers', type=int, help='工作进程数，默认读取 server.workers')
+    parser.add_argument('--threads', type=int, help='每个工作进程的线程数，默认读取 server.threads')
+    parser.add_argument('--timeout', type=int, help='请求超时（秒），默认读取 server.timeout')
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None):
     """
     主函数
     启动Flask应用。
+    参数：argv: 命令行参数列表，默认读取sys.argv
     """
+    args = parse_args(argv)
+    setup_logging()
+    
     # 初始化数据库
     init_database()
     
     # 获取配置
-    host = config.app.get('host', '0.0.0.0')
-    port = config.app.get('port', 5000)
+    host = args.host or config.app.get('host', '0.0.0.0')
+    port = args.port or config.app.get('port', 5000)
     debug = config.app.get('debug', False)
     
     print("=" * 60)
@@ -915,12 +3379,26 @@ def main():
     print(f"  地址: {host}")
     print(f"  端口: {port}")
     print(f"  调试模式: {'开启' if debug else '关闭'}")
+    print(f"  服务器: {'生产环境服务器' if args.serve else 'Flask开发服务器'}")
     print(f"\n登录功能: {'启用' if config.is_login_enabled() else '禁用'}")
     print(f"数据库: {config.get_database_path()}")
     print(f"下载目录: {config.get_download_dir()}")
     print("\n" + "-" * 60)
     print("启动服务中...")
     
+    if args.serve:
+        from server import get_server_options, serve
+        options = get_server_options({
+            'host': host,
+            'port': port,
+            'backend': args.backend,
+            'workers': args.workers,
+            'threads': args.threads,
+            'timeout': args.timeout,
+        })
+        serve(app, options, post_fork=after_worker_fork)
+        return
+    
     # 启动应用
     app.run(host=host, port=port, debug=debug)
 
@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""
+静态资源构建模块
+
+本模块在应用启动时处理 static 目录下的CSS和JS文件：
+1. 压缩（去除注释和多余空白）
+2. 按内容哈希生成带指纹的文件名，如 css/style.3f9a1c2b.css
+3. 预先生成 .gz（以及安装了 brotli 时的 .br）压缩文件
+
+带指纹的文件内容不会变化，可以长期缓存（Cache-Control: immutable），
+修改源文件后重新启动应用即生成新的文件名，页面引用随之更新。
+
+可选依赖：
+- rjsmin / rcssmin：安装后使用其压缩JS/CSS，否则使用内置的保守压缩
+- brotli：安装后额外生成 .br 文件
+
+作者：Phone Number Generator
+版本：1.0.0
+"""
+
+import os
+import re
+import gzip
+import hashlib
+import logging
+from typing import Dict, List, Optional, Tuple
+
+
+# 需要构建的资源类型
+ASSET_EXTENSIONS = ('.css', '.js')
+
+# 预压缩编码，按优先顺序排列：(Accept-Encoding 名称, 文件后缀)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# 标识符字符（之间的空白不能删除）
+_WORD_CHARS = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$\\')
+
+# 这些字符之后的 / 是正则表达式的开始，而不是除号
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = ('return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'void', 'delete', 'throw')
+
+
+def minify_css(source: str) -> str:
+    """
+    压缩CSS
+
+    安装了 rcssmin 时使用 rcssmin，否则去除注释并合并空白，字符串内容保持不变。
+
+    参数：
+        source: CSS源码
+
+    返回：
+        str: 压缩后的CSS
+    """
+    try:
+        import rcssmin
+        return rcssmin.cssmin(source)
+    except ImportError:
+        pass
+
+    out: List[str] = []
+    i = 0
+    n = len(source)
+    pending_space = False
+    while i < n:
+        ch = source[i]
+        if ch == '/' and source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+            pending_space = True
+            continue
+        if ch in '"\'':
+            end = i + 1
+            while end < n and source[end] != ch:
+                end += 2 if source[end] == '\\' else 1
+            if pending_space and out and out[-1] not in '{};:,>':
+                out.append(' ')
+            pending_space = False
+            out.append(source[i:end + 1])
+            i = end + 1
+            continue
+        if ch.isspace():
+            pending_space = True
+            i += 1
+            continue
+        if ch in '{};,>':
+            # 这些符号两侧的空白都可以删除
+            if ch == '}' and out and out[-1] == ';':
+                out.pop()
+            out.append(ch)
+            pending_space = False
+            i += 1
+            continue
+        if pending_space and out and out[-1] not in '{};:,>':
+            out.append(' ')
+        pending_space = False
+        out.append(ch)
+        i += 1
+    return ''.join(out).strip()
+
+
+def minify_js(source: str) -> str:
+    """
+    压缩JS
+
+    安装了 rjsmin 时使用 rjsmin，否则使用内置的保守压缩：
+    去除注释，合并空白；原本包含换行的空白保留一个换行，避免影响自动分号插入；
+    字符串、模板字符串和正则表达式内容保持不变。
+
+    参数：
+        source: JS源码
+
+    返回：
+        str: 压缩后的JS
+    """
+    try:
+        import rjsmin
+        return rjsmin.jsmin(source)
+    except ImportError:
+        pass
+
+    out: List[str] = []
+    i = 0
+    n = len(source)
+    # 待输出的空白：None 无，' ' 空格，'\n' 换行
+    pending: Optional[str] = None
+
+    def last_char() -> str:
+        return out[-1][-1] if out else ''
+
+    def regex_allowed() -> bool:
+        prev = last_char()
+        if not prev:
+            return True
+        if prev in _REGEX_PRECEDERS:
+            return True
+        if prev in _WORD_CHARS:
+            tail = ''.join(out[-3:])
+            word = re.search(r'[A-Za-z_$][\w$]*$', tail)
+            return bool(word) and word.group(0) in _REGEX_KEYWORDS
+        return False
+
+    def flush_space(next_char: str) -> None:
+        nonlocal pending
+        if pending is None or not out:
+            pending = None
+            return
+        if pending == '\n':
+            out.append('\n')
+        elif last_char() in _WORD_CHARS and next_char in _WORD_CHARS:
+            out.append(' ')
+        elif last_char() in '+-' and next_char == last_char():
+            # 避免 a + +b 变成 a++b
+            out.append(' ')
+        pending = None
+
+    while i < n:
+        ch = source[i]
+        if ch == '/' and source.startswith('//', i):
+            end = source.find('\n', i)
+            i = n if end < 0 else end
+            continue
+        if ch == '/' and source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            comment = source[i:n if end < 0 else end]
+            i = n if end < 0 else end + 2
+            if '\n' in comment:
+                pending = '\n'
+            elif pending is None:
+                pending = ' '
+            continue
+        if ch.isspace():
+            if ch == '\n':
+                pending = '\n'
+            elif pending is None:
+                pending = ' '
+            i += 1
+            continue
+        if ch in '"\'`' or (ch == '/' and regex_allowed()):
+            start = i
+            i = _skip_literal(source, i)
+            flush_space(ch)
+            out.append(source[start:i])
+            continue
+        flush_space(ch)
+        out.append(ch)
+        i += 1
+    return ''.join(out).strip() + '\n'
+
+
+def _skip_literal(source: str, start: int) -> int:
+    """跳过字符串、模板字符串或正则表达式，返回结束位置（不含）"""
+    quote = source[start]
+    n = len(source)
+    i = start + 1
+    in_class = False
+    depth = 0
+    while i < n:
+        ch = source[i]
+        if ch == '\\':
+            i += 2
+            continue
+        if quote == '`':
+            if ch == '$' and source.startswith('${', i):
+                depth += 1
+                i += 2
+                continue
+            if ch == '}' and depth:
+                depth -= 1
+            elif ch == '`' and not depth:
+                return i + 1
+        elif quote == '/':
+            if ch == '[':
+                in_class = True
+            elif ch == ']':
+                in_class = False
+            elif ch == '/' and not in_class:
+                i += 1
+                while i < n and (source[i].isalpha()):
+                    i += 1
+                return i
+            elif ch == '\n':
+                return i
+        elif ch == quote:
+            return i + 1
+        i += 1
+    return n
+
+
+class AssetPipeline:
+    """
+    静态资源构建器
+
+    构建结果写入输出目录，文件名带内容哈希；
+    manifest 记录源文件路径到带指纹文件路径的映射。
+    """
+
+    def __init__(self, static_dir: str, output_dir: str):
+        """
+        初始化构建器
+
+        参数：
+            static_dir: 静态资源源目录
+            output_dir: 构建输出目录
+        """
+        self.static_dir = static_dir
+        self.output_dir = output_dir
+        # 源文件相对路径 → 带指纹的相对路径，如 'css/style.css' → 'css/style.3f9a1c2b.css'
+        self.manifest: Dict[str, str] = {}
+        # 带指纹的相对路径 → 可用的编码列表
+        self.encodings: Dict[str, Tuple[str, ...]] = {}
+
+    def build(self) -> Dict[str, str]:
+        """
+        构建全部资源
+
+        返回：
+            Dict[str, str]: 源文件路径到带指纹文件路径的映射
+        """
+        manifest: Dict[str, str] = {}
+        encodings: Dict[str, Tuple[str, ...]] = {}
+        for root, _, files in os.walk(self.static_dir):
+            for name in sorted(files):
+                if not name.endswith(ASSET_EXTENSIONS):
+                    continue
+                source_path = os.path.join(root, name)
+                rel_path = os.path.relpath(source_path, self.static_dir).replace(os.sep, '/')
+                built_path, available = self._build_file(source_path, rel_path)
+                manifest[rel_path] = built_path
+                encodings[built_path] = available
+        self.manifest = manifest
+        self.encodings = encodings
+        logging.info(f"静态资源构建完成：{len(manifest)} 个文件，输出目录 {self.output_dir}")
+        return manifest
+
+    def _build_file(self, source_path: str, rel_path: str) -> Tuple[str, Tuple[str, ...]]:
+        """构建单个文件，返回 (带指纹的相对路径, 可用编码)"""
+        with open(source_path, 'r', encoding='utf-8') as f:
+            source = f.read()
+        minified = minify_css(source) if rel_path.endswith('.css') else minify_js(source)
+        data = minified.encode('utf-8')
+
+        digest = hashlib.sha256(data).hexdigest()[:8]
+        stem, ext = os.path.splitext(rel_path)
+        built_path = f"{stem}.{digest}{ext}"
+        target = os.path.join(self.output_dir, *built_path.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        available = []
+        # 内容不变时文件名不变，已存在则跳过写入
+        if not os.path.exists(target):
+            _write_atomic(target, data)
+        for encoding, suffix in ENCODINGS:
+            if os.path.exists(target + suffix):
+                available.append(encoding)
+                continue
+            compressed = _compress(data, encoding)
+            if compressed is not None:
+                _write_atomic(target + suffix, compressed)
+                available.append(encoding)
+        return built_path, tuple(available)
+
+    def resolve(self, rel_path: str) -> Optional[str]:
+        """
+        获取源文件对应的带指纹路径
+
+        参数：
+            rel_path: 源文件相对路径，如 'css/style.css'
+
+        返回：
+            Optional[str]: 带指纹的相对路径，未构建时返回None
+        """
+        return self.manifest.get(rel_path)
+
+    def choose_file(self, built_path: str, accept_encoding: str) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        根据客户端支持的编码选择要发送的文件
+
+        参数：
+            built_path: 带指纹的相对路径
+            accept_encoding: 请求头 Accept-Encoding
+
+        返回：
+            Optional[Tuple[str, Optional[str]]]: (文件绝对路径, Content-Encoding)，
+            不是构建产物时返回None
+        """
+        available = self.encodings.get(built_path)
+        if available is None:
+            return None
+        path = os.path.join(self.output_dir, *built_path.split('/'))
+        accepted = {item.split(';')[0].strip().lower() for item in accept_encoding.split(',')}
+        for encoding, suffix in ENCODINGS:
+            if encoding in available and encoding in accepted:
+                return path + suffix, encoding
+        return path, None
+
+
+def _compress(data: bytes, encoding: str) -> Optional[bytes]:
+    """按编码压缩数据，不支持的编码返回None"""
+    if encoding == 'gzip':
+        # mtime 固定为0，相同内容得到相同的压缩结果
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == 'br':
+        try:
+            import brotli
+        except ImportError:
+            return None
+        return brotli.compress(data, quality=11)
+    return None
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """先写临时文件再重命名，多个工作进程同时构建时不会读到写了一半的文件"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
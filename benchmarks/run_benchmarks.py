@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+"""
+性能基准测试
+
+本脚本在临时目录中构建指定规模的合成phone_location数据集，
+对号码生成、文件写入、文件拆分、数据导入和Flask接口等热点路径计时，
+记录吞吐量、延迟分位数和峰值内存，并输出为JSON基线文件。
+与已有基线比较时，吞吐量下降或延迟上升超过容差即视为性能回退。
+
+测试项目：
+- import_time: 导入app模块的耗时（默认模式和延迟初始化模式）
+- import_data: DataImporter.import_data 导入CSV
+- generate_numbers: NumberGenerator.generate_numbers 生成号码
+- generate_to_file: NumberGenerator.generate_to_file 写入文件
+- split_file: FileManager.split_file_for_download 拆分文件
+- api_provinces / api_cities / api_generate: Flask接口（测试客户端）
+
+使用方法：
+    python benchmarks/run_benchmarks.py                              # 默认规模
+    python benchmarks/run_benchmarks.py --rows 50000 --repeat 5      # 指定规模
+    python benchmarks/run_benchmarks.py --output baseline.json       # 保存基线
+    python benchmarks/run_benchmarks.py --compare baseline.json      # 与基线比较
+    python benchmarks/run_benchmarks.py --import-budget-ms 400       # 检查导入耗时
+
+作者：Phone Number Generator
+版本：1.0.0
+"""
+
+import os
+import io
+import sys
+import csv
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+
+# 项目根目录
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 合成数据集使用的号段和区域
+PREFIXES = ['130', '131', '132', '133', '135', '136', '138', '139', '150', '159', '186', '189']
+REGIONS = [
+    ('广东', '深圳'), ('广东', '广州'), ('广东', '东莞'), ('广东', '佛山'),
+    ('湖北', '武汉'), ('湖北', '宜昌'), ('北京', '北京'), ('上海', '上海'),
+    ('浙江', '杭州'), ('浙江', '宁波'), ('四川', '成都'), ('江苏', '南京'),
+]
+
+
+def build_dataset(csv_path: str, rows: int, seed: int = 20250101) -> None:
+    """
+    构建合成数据集
+
+    参数：
+        csv_path: 输出CSV路径
+        rows: 记录数量（不超过号段数 × 10000）
+        seed: 随机种子，保证每次生成的数据一致
+    """
+    rng = random.Random(seed)
+    rows = min(rows, len(PREFIXES) * 10000)
+    keys = rng.sample(range(len(PREFIXES) * 10000), rows)
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['号段', '区域码', '省份', '城市', '运营商类型'])
+        for key in keys:
+            province, city = REGIONS[rng.randrange(len(REGIONS))]
+            writer.writerow([PREFIXES[key // 10000], str(key % 10000).zfill(4),
+                             province, city, rng.randint(1, 5)])
+
+
+def write_config(work_dir: str) -> None:
+    """
+    在工作目录中写入基准测试用的config.yaml
+
+    数据库、CSV和快照使用工作目录中的绝对路径，不影响项目data目录。
+    """
+    data_dir = os.path.join(work_dir, 'data')
+    lines = [
+        'app:',
+        '  lazy_init: false',
+        '  config_reload_interval: 0',
+        'database:',
+        f'  path: "{os.path.join(data_dir, "phone_location.db")}"',
+        f'  csv_path: "{os.path.join(data_dir, "phone_location.csv")}"',
+        f'  snapshot_path: "{os.path.join(data_dir, "phone_location.snap")}"',
+        # 每次生成都要实际执行，不复用缓存结果
+        'download:',
+        '  result_cache: false',
+        'logging:',
+        '  level: "WARNING"',
+        '  vercel_tmp: false',
+        f'  file: "{os.path.join(work_dir, "logs", "app.log")}"',
+    ]
+    with open(os.path.join(work_dir, 'config.yaml'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    获取当前进程的峰值常驻内存（MB）
+
+    Linux上读取 /proc/self/status 的 VmHWM，其他平台使用 resource 模块。
+    """
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 单位为字节，Linux 单位为KB
+        return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+    except ImportError:
+        return None
+
+
+def reset_peak_rss() -> None:
+    """重置峰值内存统计（仅Linux支持，失败时忽略）"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """计算分位数（最近秩法）"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def measure(name: str, func: Callable[[], int], repeat: int, unit: str) -> Dict[str, Any]:
+    """
+    多次执行并统计
+
+    参数：
+        name: 测试名称
+        func: 被测函数，返回本次处理的数据量（条数或字节数）
+        repeat: 执行次数
+        unit: 数据量单位
+
+    返回：
+        Dict[str, Any]: 统计结果
+    """
+    reset_peak_rss()
+    latencies = []
+    total_items = 0
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            items = func()
+            latencies.append(time.perf_counter() - start)
+        total_items += items
+    total_seconds = sum(latencies)
+    result = {
+        'repeat': repeat,
+        'unit': unit,
+        'items': total_items // repeat,
+        'throughput': total_items / total_seconds if total_seconds > 0 else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p90_ms': percentile(latencies, 90) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    print(f"  {name:<18} {result['throughput']:>14,.0f} {unit}/s   "
+          f"p50 {result['p50_ms']:>9.2f} ms   p90 {result['p90_ms']:>9.2f} ms   "
+          f"峰值内存 {result['peak_rss_mb'] or 0:.1f} MB")
+    return result
+
+
+def measure_import_time(work_dir: str, lazy: bool, repeat: int) -> Dict[str, Any]:
+    """
+    测量导入app模块的耗时
+
+    在子进程中执行 python -X importtime -c "import app"，
+    读取app模块的累计导入耗时。
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = PROJECT_ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    env['LAZY_INIT'] = 'true' if lazy else 'false'
+    samples = []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import app'],
+            cwd=work_dir, env=env, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"导入app失败：{proc.stderr[-500:]}")
+        for line in proc.stderr.splitlines():
+            parts = line.split('|')
+            if len(parts) == 3 and parts[2].strip() == 'app':
+                samples.append(int(parts[1]) / 1e6)
+    name = 'import_time_lazy' if lazy else 'import_time'
+    result = {
+        'repeat': repeat,
+        'unit': 'import',
+        'items': 1,
+        'throughput': len(samples) / sum(samples),
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p90_ms': percentile(samples, 90) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+        'peak_rss_mb': None,
+    }
+    print(f"  {name:<18} p50 {result['p50_ms']:>9.2f} ms   p90 {result['p90_ms']:>9.2f} ms")
+    return result
+
+
+def run_benchmarks(rows: int, repeat: int, work_dir: str) -> Dict[str, Any]:
+    """
+    执行全部基准测试
+
+    参数：
+        rows: 合成数据集记录数
+        repeat: 每项测试的执行次数
+        work_dir: 临时工作目录
+
+    返回：
+        Dict[str, Any]: 测试报告
+    """
+    data_dir = os.path.join(work_dir, 'data')
+    download_dir = os.path.join(work_dir, 'downloads')
+    os.makedirs(data_dir)
+    os.makedirs(download_dir)
+    csv_path = os.path.join(data_dir, 'phone_location.csv')
+
+    print(f"构建合成数据集：{rows} 条记录")
+    build_dataset(csv_path, rows)
+    write_config(work_dir)
+
+    # app 和 config 在导入时读取当前目录的 config.yaml
+    os.chdir(work_dir)
+    os.environ['DOWNLOAD_DIR'] = download_dir
+    sys.path.insert(0, PROJECT_ROOT)
+
+    results: Dict[str, Any] = {}
+    print("\n测试结果：")
+    results['import_time'] = measure_import_time(work_dir, lazy=False, repeat=repeat)
+    results['import_time_lazy'] = measure_import_time(work_dir, lazy=True, repeat=repeat)
+
+    from final_import import DataImporter
+
+    def import_data() -> int:
+        importer = DataImporter(csv_path, os.path.join(data_dir, 'phone_location.db'),
+                                os.path.join(data_dir, 'phone_location.snap'))
+        importer.import_data(force=True)
+        return rows
+
+    results['import_data'] = measure('import_data', import_data, repeat, 'rows')
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as app_module
+        app_module.db_manager.load_snapshot()
+    generator = app_module.number_generator
+
+    # 选取记录最多的号段+区域作为生成目标，结果最大，最能反映热点路径
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader)
+        counts: Dict[tuple, int] = {}
+        for prefix, _, province, city, _ in reader:
+            counts[(prefix, province, city)] = counts.get((prefix, province, city), 0) + 1
+    prefix, province, city = max(counts, key=counts.get)
+
+    state: Dict[str, Any] = {}
+
+    def generate_numbers() -> int:
+        state['numbers'] = generator.generate_numbers(prefix=prefix, province=province, city=city)
+        return len(state['numbers'])
+
+    results['generate_numbers'] = measure('generate_numbers', generate_numbers, repeat, 'numbers')
+
+    def generate_to_file() -> int:
+        _, size, _ = generator.generate_to_file(state['numbers'], 'bench_numbers.txt')
+        state['file_size'] = size
+        return size
+
+    results['generate_to_file'] = measure('generate_to_file', generate_to_file, repeat, 'bytes')
+
+    # 拆分阈值取文件大小的1/4，保证拆分为多个文件
+    split_mb = max(state['file_size'] / 4 / (1024 * 1024), 0.01)
+
+    def split_file() -> int:
+        app_module.file_manager.split_file_for_download('bench_numbers.txt', split_mb)
+        return state['file_size']
+
+    results['split_file'] = measure('split_file', split_file, repeat, 'bytes')
+
+    client = app_module.app.test_client()
+    api_repeat = max(repeat * 10, 20)
+
+    def api_provinces() -> int:
+        client.get('/api/provinces')
+        return 1
+
+    def api_cities() -> int:
+        client.get(f'/api/cities/{province}')
+        return 1
+
+    def api_generate() -> int:
+        response = client.post('/api/generate', json={
+            'prefix': prefix, 'province': province, 'city': city
+        })
+        return response.get_json()['data']['count']
+
+    results['api_provinces'] = measure('api_provinces', api_provinces, api_repeat, 'requests')
+    results['api_cities'] = measure('api_cities', api_cities, api_repeat, 'requests')
+    results['api_generate'] = measure('api_generate', api_generate, repeat, 'numbers')
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'rows': rows,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare_reports(current: Dict[str, Any], baseline: Dict[str, Any],
+                    tolerance: float) -> List[str]:
+    """
+    与基线比较
+
+    参数：
+        current: 本次测试报告
+        baseline: 基线报告
+        tolerance: 容差比例，如0.2表示允许20%的波动
+
+    返回：
+        List[str]: 性能回退描述列表，为空表示没有回退
+    """
+    regressions = []
+    for name, base in baseline.get('results', {}).items():
+        cur = current['results'].get(name)
+        if cur is None:
+            continue
+        if base['throughput'] and cur['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(
+                f"{name}: 吞吐量 {cur['throughput']:,.0f} < 基线 {base['throughput']:,.0f} {base['unit']}/s"
+            )
+        if base['p90_ms'] and cur['p90_ms'] > base['p90_ms'] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p90延迟 {cur['p90_ms']:.2f} ms > 基线 {base['p90_ms']:.2f} ms"
+            )
+    return regressions
+
+
+def main() -> int:
+    """
+    主函数
+
+    解析命令行参数，执行基准测试，保存或比较结果。
+    """
+    parser = argparse.ArgumentParser(description='手机号码生成查询系统性能基准测试')
+    parser.add_argument('--rows', type=int, default=20000, help='合成数据集记录数（默认20000）')
+    parser.add_argument('--repeat', type=int, default=3, help='每项测试执行次数（默认3）')
+    parser.add_argument('--output', help='保存测试报告的JSON文件路径')
+    parser.add_argument('--compare', help='用于比较的基线JSON文件路径')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='比较容差（默认0.2，即20%%）')
+    parser.add_argument('--import-budget-ms', type=float,
+                        help='延迟初始化模式下导入app的p50耗时上限（毫秒）')
+    parser.add_argument('--keep', action='store_true', help='保留临时工作目录')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    compare = os.path.abspath(args.compare) if args.compare else None
+
+    work_dir = tempfile.mkdtemp(prefix='phone_bench_')
+    cwd = os.getcwd()
+    try:
+        report = run_benchmarks(args.rows, args.repeat, work_dir)
+    finally:
+        os.chdir(cwd)
+        if args.keep:
+            print(f"\n工作目录已保留：{work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n测试报告已保存：{output}")
+
+    failed = False
+    if args.import_budget_ms is not None:
+        lazy_ms = report['results']['import_time_lazy']['p50_ms']
+        if lazy_ms > args.import_budget_ms:
+            print(f"\n✗ 导入耗时超出预算：{lazy_ms:.2f} ms > {args.import_budget_ms:.2f} ms")
+            failed = True
+        else:
+            print(f"\n✓ 导入耗时在预算内：{lazy_ms:.2f} ms <= {args.import_budget_ms:.2f} ms")
+
+    if compare:
+        with open(compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, args.tolerance)
+        if regressions:
+            print("\n✗ 检测到性能回退：")
+            for line in regressions:
+                print(f"  {line}")
+            failed = True
+        else:
+            print("\n✓ 未检测到性能回退")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
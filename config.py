@@ -10,17 +10,67 @@
 - 提供配置项的默认值
 - 支持环境变量覆盖配置
 - 配置验证和类型转换
+- 监视配置文件变化，运行期间自动重新加载
 
 作者：Phone Number Generator
 版本：1.0.0
 """
 
 import os
+import threading
 import yaml
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
 from pathlib import Path
 
 
+class ResolvedPaths(NamedTuple):
+    """
+    派生路径集合
+
+    由 Config 根据配置和运行平台一次性解析，解析后不可修改。
+
+    属性：
+        database_path: 数据库文件绝对路径
+        csv_path: CSV文件绝对路径
+        snapshot_path: 二进制快照文件绝对路径
+        download_dir: 下载目录绝对路径
+        log_file: 日志文件绝对路径
+        asset_dir: 静态资源构建输出目录绝对路径
+        exclusion_dir: 排除名单目录绝对路径
+    """
+    database_path: str
+    csv_path: str
+    snapshot_path: str
+    download_dir: str
+    log_file: str
+    asset_dir: str
+    exclusion_dir: str
+
+
+@lru_cache(maxsize=None)
+def _platform_system() -> str:
+    """
+    获取操作系统名称（小写）
+
+    运行期间操作系统不会变化，只在首次调用时导入platform模块并查询。
+    """
+    import platform
+    return platform.system().lower()
+
+
+def _is_ip_network(value: Any) -> bool:
+    """检查是否为有效的IP地址或网段（如 127.0.0.1、10.0.0.0/8）"""
+    import ipaddress
+    if not isinstance(value, str):
+        return False
+    try:
+        ipaddress.ip_network(value, strict=False)
+    except ValueError:
+        return False
+    return True
+
+
 class Config:
     """
     配置管理类
@@ -31,10 +81,14 @@ class Config:
     属性：
         app: 应用配置（host, port, debug, secret_key）
         login: 登录配置（enabled, users）
-        generator: 生成器配置（max_count, batch_size, file_size_limit）
+        generator: 生成器配置（max_count, batch_size, file_size_limit, 内存预算, 准入控制）
         database: 数据库配置（path, csv_path）
-        download: 下载配置（dir, expire_hours）
+        download: 下载配置（dir, expire_hours, quota_mb, reap_interval, result_cache）
         logging: 日志配置（level, file）
+        metrics: 运行指标配置（enabled, token, allowed_ips）
+        profiling: 请求剖析配置（enabled, always, allowed_users, dir, max_profiles）
+        server: 生产服务器配置（backend, workers, threads, keepalive, timeout）
+        paths: 派生路径（首次访问时解析并缓存）
     """
     
     def __init__(self, config_path: str = 'config.yaml'):
@@ -52,34 +106,220 @@ class Config:
         """
         self._config: Dict[str, Any] = {}
         self._config_path = config_path
-        self._load_config()
-        # 计算项目根目录：config.py所在目录的父目录
+        self._paths: Optional[ResolvedPaths] = None
+        self._reload_listeners: List[Callable[['Config'], None]] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._watcher_stop = threading.Event()
+        # 计算项目根目录：config.py所在目录
         self.base_dir = Path(__file__).parent
+        self._load_config()
+        self._config_mtime = self._get_config_mtime()
     
     def _load_config(self) -> None:
         """
         加载配置文件
         
         私有方法，用于从YAML文件加载配置信息。
-        如果配置文件不存在或加载失败，使用默认配置。
+        如果配置文件不存在或加载失败，使用默认配置；
+        个别配置项无效时只把这些配置项恢复为默认值，其余用户配置（如登录开关和密钥）保持有效。
+        """
+        try:
+            new_config = self._read_config()
+        except Exception as e:
+            print(f"警告：加载配置文件失败，使用默认配置。错误：{e}")
+            new_config = self._get_default_config()
+            self._apply_env_overrides(new_config)
+        self._validate_config(new_config, defaults=self._get_default_config())
+        self._config = new_config
+    
+    def _read_config(self) -> Dict[str, Any]:
+        """
+        读取配置文件
+        
+        私有方法，读取YAML文件并与默认配置合并，再应用环境变量覆盖。
+        
+        返回：
+            Dict[str, Any]: 新的完整配置字典
         """
         default_config = self._get_default_config()
         
         if os.path.exists(self._config_path):
-            try:
-                with open(self._config_path, 'r', encoding='utf-8') as f:
-                    user_config = yaml.safe_load(f) or {}
-                # 合并用户配置和默认配置
-                self._config = self._merge_config(default_config, user_config)
-            except Exception as e:
-                print(f"警告：加载配置文件失败，使用默认配置。错误：{e}")
-                self._config = default_config
+            with open(self._config_path, 'r', encoding='utf-8') as f:
+                # 优先使用C实现的解析器，未编译libyaml时回退到纯Python实现
+                loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+                user_config = yaml.load(f, Loader=loader) or {}
+            if not isinstance(user_config, dict):
+                raise ValueError("配置文件顶层必须是键值映射")
+            # 合并用户配置和默认配置
+            new_config = self._merge_config(default_config, user_config)
         else:
             print(f"警告：配置文件 {self._config_path} 不存在，使用默认配置。")
-            self._config = default_config
+            new_config = default_config
         
         # 应用环境变量覆盖
-        self._apply_env_overrides()
+        self._apply_env_overrides(new_config)
+        return new_config
+    
+    def _validate_config(self, config_dict: Dict[str, Any], defaults: Dict[str, Any] = None) -> None:
+        """
+        校验配置
+        
+        私有方法，检查运行期间可能被修改的数值配置是否有效。
+        整数配置项写成整数值的小数（如 5000000.0）时就地转换为整数。
+        
+        参数：
+            config_dict: 待校验的配置字典
+            defaults: 默认配置；给出时无效的配置项就地恢复为默认值并打印警告，不抛出异常
+        
+        异常：
+            ValueError: 配置项无效（未给出 defaults 时）
+        """
+        def reject(section: str, key: str, value: Any) -> None:
+            if defaults is None:
+                raise ValueError(f"配置项 {section}.{key} 无效：{value!r}")
+            print(f"警告：配置项 {section}.{key} 无效：{value!r}，使用默认值 {defaults[section][key]!r}")
+            config_dict[section][key] = defaults[section][key]
+        
+        checks = [
+            ('app', 'port', int, 1),
+            ('generator', 'max_count', int, 1),
+            ('generator', 'batch_size', int, 1),
+            ('generator', 'file_size_limit', (int, float), 0.001),
+            ('generator', 'request_memory_mb', (int, float), 1),
+            ('generator', 'global_memory_mb', (int, float), 1),
+            ('generator', 'memory_queue_timeout', (int, float), 0),
+            ('generator', 'max_concurrent_jobs', int, 1),
+            ('generator', 'max_queued_jobs', int, 0),
+            ('generator', 'max_queued_per_user', int, 0),
+            ('generator', 'admission_timeout', (int, float), 0),
+            ('generator', 'page_max_limit', int, 1),
+            ('generator', 'max_shards', int, 2),
+            ('download', 'expire_hours', (int, float), 0),
+            ('download', 'quota_mb', (int, float), 0),
+            ('download', 'reap_interval', (int, float), 0),
+            ('app', 'config_reload_interval', (int, float), 0),
+            ('logging', 'debug_sample_rate', (int, float), 0),
+            ('profiling', 'max_profiles', int, 1),
+            ('server', 'workers', int, 0),
+            ('server', 'threads', int, 1),
+            ('server', 'keepalive', (int, float), 0),
+            ('server', 'timeout', (int, float), 1),
+        ]
+        for section in sorted({check[0] for check in checks} | {'download', 'metrics'}):
+            if not isinstance(config_dict.get(section), dict):
+                if defaults is None:
+                    raise ValueError(f"配置项 {section} 必须是键值映射")
+                print(f"警告：配置项 {section} 必须是键值映射，使用默认值")
+                config_dict[section] = dict(defaults[section])
+        for section, key, expected_type, minimum in checks:
+            values = config_dict[section]
+            value = values.get(key)
+            if expected_type is int and isinstance(value, float) and value.is_integer():
+                value = values[key] = int(value)
+            if isinstance(value, bool) or not isinstance(value, expected_type) or value < minimum:
+                reject(section, key, value)
+        compression = config_dict['download'].get('archive_compression')
+        if compression not in ('stored', 'deflated'):
+            reject('download', 'archive_compression', compression)
+        token = config_dict['metrics'].get('token', '')
+        if not isinstance(token, str):
+            reject('metrics', 'token', token)
+        allowed_ips = config_dict['metrics'].get('allowed_ips', [])
+        if not isinstance(allowed_ips, list) or not all(_is_ip_network(item) for item in allowed_ips):
+            reject('metrics', 'allowed_ips', allowed_ips)
+    
+    def reload(self) -> bool:
+        """
+        重新加载配置
+        
+        重新读取配置文件和环境变量，校验通过后整体替换当前配置，
+        并清空派生路径缓存，下次访问路径时重新解析。
+        校验失败时保留当前配置。
+        
+        返回：
+            bool: 重新加载成功返回True，否则返回False
+        """
+        try:
+            new_config = self._read_config()
+            self._validate_config(new_config)
+        except Exception as e:
+            print(f"警告：重新加载配置失败，继续使用当前配置。错误：{e}")
+            return False
+        
+        # 整体替换引用，读取方要么看到旧配置，要么看到新配置
+        self._config = new_config
+        self._paths = None
+        for listener in list(self._reload_listeners):
+            try:
+                listener(self)
+            except Exception as e:
+                print(f"警告：配置重新加载回调执行失败。错误：{e}")
+        return True
+    
+    def add_reload_listener(self, listener: Callable[['Config'], None]) -> None:
+        """
+        注册配置重新加载回调
+        
+        参数：
+            listener: 回调函数，参数为Config实例
+        """
+        self._reload_listeners.append(listener)
+    
+    def _get_config_mtime(self) -> Optional[int]:
+        """获取配置文件的修改时间（纳秒），文件不存在时返回None"""
+        try:
+            return os.stat(self._config_path).st_mtime_ns
+        except OSError:
+            return None
+    
+    def check_for_changes(self) -> bool:
+        """
+        检查配置文件是否变化，变化时重新加载
+        
+        返回：
+            bool: 检测到变化并重新加载成功返回True，否则返回False
+        """
+        mtime = self._get_config_mtime()
+        if mtime == self._config_mtime:
+            return False
+        self._config_mtime = mtime
+        return self.reload()
+    
+    def start_watcher(self, interval: float = None) -> bool:
+        """
+        启动配置文件监视线程
+        
+        后台线程按固定间隔检查配置文件修改时间，变化后自动重新加载。
+        重复调用不会启动多个线程。
+        
+        参数：
+            interval: 检查间隔（秒），默认读取 app.config_reload_interval
+        
+        返回：
+            bool: 监视线程已运行返回True；间隔为0（禁用）时返回False
+        """
+        if interval is None:
+            interval = self.app.get('config_reload_interval', 0)
+        if not interval or interval <= 0:
+            return False
+        if self._watcher is not None and self._watcher.is_alive():
+            return True
+        
+        stop_event = self._watcher_stop = threading.Event()
+        
+        def watch() -> None:
+            while not stop_event.wait(interval):
+                self.check_for_changes()
+        
+        self._config_mtime = self._get_config_mtime()
+        self._watcher = threading.Thread(target=watch, name='config-watcher', daemon=True)
+        self._watcher.start()
+        return True
+    
+    def stop_watcher(self) -> None:
+        """停止配置文件监视线程"""
+        self._watcher_stop.set()
+        self._watcher = None
     
     def _get_default_config(self) -> Dict[str, Any]:
         """
@@ -95,6 +335,8 @@ class Config:
                 'host': '0.0.0.0',
                 'port': 5000,
                 'debug': False,
+                'lazy_init': False,
+                'config_reload_interval': 0,
                 'secret_key': 'phone-generator-secret-key-change-in-production'
             },
             'login': {
@@ -109,19 +351,58 @@ class Config:
             'generator': {
                 'max_count': 10000000,
                 'batch_size': 500,
-                'file_size_limit': 20
+                'file_size_limit': 20,
+                'request_memory_mb': 64,
+                'global_memory_mb': 512,
+                'memory_queue_timeout': 30,
+                'max_concurrent_jobs': 2,
+                'max_queued_jobs': 16,
+                'max_queued_per_user': 2,
+                'admission_timeout': 60,
+                'page_max_limit': 10000,
+                'max_shards': 64
             },
             'database': {
                 'path': 'data/phone_location.db',
-                'csv_path': 'data/phone_location.csv'
+                'csv_path': 'data/phone_location.csv',
+                'snapshot_path': 'data/phone_location.snap',
+                'exclusion_dir': 'data/exclusions'
             },
             'download': {
                 'dir': 'downloads',
-                'expire_hours': 24
+                'expire_hours': 24,
+                'quota_mb': 0,
+                'reap_interval': 300,
+                'result_cache': True,
+                'archive_compression': 'stored'
             },
             'logging': {
                 'level': 'INFO',
-                'file': 'logs/app.log'
+                'file': 'logs/app.log',
+                'debug_sample_rate': 1.0
+            },
+            'metrics': {
+                'enabled': False,
+                'token': '',
+                'allowed_ips': []
+            },
+            'assets': {
+                'enabled': True,
+                'dir': 'static_build'
+            },
+            'profiling': {
+                'enabled': False,
+                'always': False,
+                'allowed_users': [],
+                'dir': 'profiles',
+                'max_profiles': 50
+            },
+            'server': {
+                'backend': 'auto',
+                'workers': 0,
+                'threads': 4,
+                'keepalive': 5,
+                'timeout': 300
             }
         }
     
@@ -147,33 +428,41 @@ class Config:
                 result[key] = value
         return result
     
-    def _apply_env_overrides(self) -> None:
+    def _apply_env_overrides(self, config_dict: Dict[str, Any]) -> None:
         """
         应用环境变量覆盖
         
-        检查环境变量是否设置了覆盖值，
+        检查环境变量是否设置了覆盖值，并写入给定的配置字典。
         目前支持以下环境变量：
         - APP_PORT: 应用端口
         - LOGIN_ENABLED: 是否启用登录
         - DEBUG_MODE: 调试模式
+        - LAZY_INIT: 延迟初始化模式
+        
+        下载目录覆盖 DOWNLOAD_DIR 在解析派生路径时处理，见 _resolve_paths()。
         """
         # 应用端口覆盖
         app_port = os.environ.get('APP_PORT')
         if app_port:
             try:
-                self._config['app']['port'] = int(app_port)
+                config_dict['app']['port'] = int(app_port)
             except ValueError:
                 print(f"警告：环境变量APP_PORT值无效，使用默认端口。")
         
         # 登录开关覆盖
         login_enabled = os.environ.get('LOGIN_ENABLED')
         if login_enabled:
-            self._config['login']['enabled'] = login_enabled.lower() in ('true', '1', 'yes')
+            config_dict['login']['enabled'] = login_enabled.lower() in ('true', '1', 'yes')
         
         # 调试模式覆盖
         debug_mode = os.environ.get('DEBUG_MODE')
         if debug_mode:
-            self._config['app']['debug'] = debug_mode.lower() in ('true', '1', 'yes')
+            config_dict['app']['debug'] = debug_mode.lower() in ('true', '1', 'yes')
+        
+        # 延迟初始化模式覆盖
+        lazy_init = os.environ.get('LAZY_INIT')
+        if lazy_init:
+            config_dict['app']['lazy_init'] = lazy_init.lower() in ('true', '1', 'yes')
     
     def get(self, key: str, default: Any = None) -> Any:
         """
@@ -318,6 +607,73 @@ class Config:
         """
         return self.login.get('enabled', False)
     
+    @property
+    def paths(self) -> 'ResolvedPaths':
+        """
+        派生路径属性
+        
+        首次访问时解析所有派生路径并创建所需目录，之后直接返回缓存结果。
+        配置或环境变量变化后调用 reload() 刷新。
+        
+        返回：
+            ResolvedPaths: 不可变的派生路径集合
+        """
+        paths = self._paths
+        if paths is None:
+            paths = self._paths = self._resolve_paths()
+        return paths
+    
+    def _resolve_paths(self) -> 'ResolvedPaths':
+        """
+        解析派生路径
+        
+        私有方法，计算数据库、CSV、快照、下载目录和日志文件的绝对路径，
+        并确保下载目录和日志目录存在。
+        
+        返回：
+            ResolvedPaths: 不可变的派生路径集合
+        """
+        base_dir = self.base_dir
+        database_path = base_dir / self.database.get('path', 'data/phone_location.db')
+        csv_path = base_dir / self.database.get('csv_path', 'data/phone_location.csv')
+        snapshot_path = base_dir / self.database.get('snapshot_path', 'data/phone_location.snap')
+        
+        # 使用 /tmp 目录的条件：Linux 平台 + vercel_tmp: true
+        if self.use_tmp_dir():
+            # /tmp 目录通常已存在且可写，下载目录由应用启动时创建
+            download_path = Path('/tmp/downloads')
+            log_path = Path('/tmp/logs/app.log')
+            asset_path = Path('/tmp/assets')
+            exclusion_path = Path('/tmp/exclusions')
+        else:
+            # 非 /tmp 情况：使用项目目录
+            download_path = base_dir / self.download.get('dir', 'downloads')
+            log_path = base_dir / self.logging.get('file', 'logs/app.log')
+            asset_path = base_dir / self.get('assets.dir', 'static_build')
+            exclusion_path = base_dir / self.database.get('exclusion_dir', 'data/exclusions')
+        
+        # 环境变量 DOWNLOAD_DIR 优先于以上规则
+        download_dir_env = os.environ.get('DOWNLOAD_DIR')
+        if download_dir_env:
+            download_path = base_dir / download_dir_env
+        
+        # 确保下载目录存在
+        if download_path != Path('/tmp/downloads'):
+            download_path.mkdir(parents=True, exist_ok=True)
+        
+        # 确保日志目录存在
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        return ResolvedPaths(
+            database_path=str(database_path),
+            csv_path=str(csv_path),
+            snapshot_path=str(snapshot_path),
+            download_dir=str(download_path),
+            log_file=str(log_path),
+            asset_dir=str(asset_path),
+            exclusion_dir=str(exclusion_path)
+        )
+    
     def get_database_path(self) -> str:
         """
         获取数据库文件路径
@@ -325,9 +681,7 @@ class Config:
         返回：
             str: 数据库文件的绝对路径，根据操作系统自动转换路径格式
         """
-        base_dir = self.base_dir
-        db_path = self.database.get('path', 'data/phone_location.db')
-        return str(base_dir / db_path)
+        return self.paths.database_path
     
     def get_csv_path(self) -> str:
         """
@@ -336,9 +690,16 @@ class Config:
         返回：
             str: CSV文件的绝对路径，根据操作系统自动转换路径格式
         """
-        base_dir = self.base_dir
-        csv_path = self.database.get('csv_path', 'data/phone_location.csv')
-        return str(base_dir / csv_path)
+        return self.paths.csv_path
+    
+    def get_snapshot_path(self) -> str:
+        """
+        获取二进制快照文件路径
+        
+        返回：
+            str: 快照文件的绝对路径，根据操作系统自动转换路径格式
+        """
+        return self.paths.snapshot_path
     
     def get_download_dir(self) -> str:
         """
@@ -349,21 +710,29 @@ class Config:
             use_tmp_dir(): true → /tmp/downloads
             use_tmp_dir(): false → 项目目录/downloads
         """
-        # 使用 /tmp 目录的条件：Linux 平台 + vercel_tmp: true
-        if self.use_tmp_dir():
-            download_path = Path('/tmp/downloads')
-            # /tmp 目录通常已存在且可写，直接返回
-            return str(download_path)
+        return self.paths.download_dir
+    
+    def get_asset_dir(self) -> str:
+        """
+        获取静态资源构建输出目录
 
-        # 非 /tmp 情况：使用项目目录
-        base_dir = self.base_dir
-        download_dir = self.download.get('dir', 'downloads')
-        download_path = base_dir / download_dir
+        返回：
+            str: 输出目录的绝对路径
+            use_tmp_dir(): true → /tmp/assets
+            use_tmp_dir(): false → 项目目录/static_build
+        """
+        return self.paths.asset_dir
+    
+    def get_exclusion_dir(self) -> str:
+        """
+        获取排除名单目录
 
-        # 确保下载目录存在
-        if not download_path.exists():
-            download_path.mkdir(parents=True, exist_ok=True)
-        return str(download_path)
+        返回：
+            str: 名单目录的绝对路径
+            use_tmp_dir(): true → /tmp/exclusions
+            use_tmp_dir(): false → 项目目录/data/exclusions
+        """
+        return self.paths.exclusion_dir
     
     def get_log_file(self) -> str:
         """
@@ -374,25 +743,7 @@ class Config:
             use_tmp_dir(): true → /tmp/logs/app.log
             use_tmp_dir(): false → 项目目录/logs/app.log
         """
-        # 使用 /tmp 目录的条件：Linux 平台 + vercel_tmp: true
-        if self.use_tmp_dir():
-            log_path = Path('/tmp/logs/app.log')
-            # 确保 /tmp/logs 目录存在
-            log_dir = log_path.parent
-            if not log_dir.exists():
-                log_dir.mkdir(parents=True, exist_ok=True)
-            return str(log_path)
-
-        # 非 /tmp 情况：使用项目目录
-        base_dir = self.base_dir
-        log_file = self.logging.get('file', 'logs/app.log')
-        log_path = base_dir / log_file
-
-        # 确保日志目录存在
-        log_dir = log_path.parent
-        if not log_dir.exists():
-            log_dir.mkdir(parents=True, exist_ok=True)
-        return str(log_path)
+        return self.paths.log_file
         
     def is_vercel_tmp_enabled(self) -> bool:
         """
@@ -411,8 +762,7 @@ class Config:
         返回：
             bool: Linux 平台返回 True，否则返回 False
         """
-        import platform
-        return platform.system().lower() == 'linux'
+        return _platform_system() == 'linux'
 
     def use_tmp_dir(self) -> bool:
         """
@@ -458,6 +808,7 @@ if __name__ == '__main__':
     print(f"\n数据库配置：")
     print(f"  数据库路径: {config.get_database_path()}")
     print(f"  CSV路径: {config.get_csv_path()}")
+    print(f"  快照路径: {config.get_snapshot_path()}")
     
     print(f"\n下载配置：")
     print(f"  下载目录: {config.get_download_dir()}")
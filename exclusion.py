@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+号码排除名单模块
+
+本模块负责保存和查询排除名单（如已联系过的号码），生成号码时跳过名单中的号码。
+
+存储格式（小端序，版本 1）：
+    文件头（32字节）：
+        magic     8s   固定为 b'PEXCLUDE'
+        version   I    格式版本号
+        reserved  I    保留
+        count     Q    号码数量
+    号码列：
+        uint64 × N     11位号码，升序排列且不重复
+
+名单以 mmap 方式映射，多个工作进程共享操作系统页缓存。
+号码升序排列后，同一区域（前7位）的号码在数组中连续，
+生成时每个区域只做一次二分查找取出该区域被排除的后4位，不逐个号码查询。
+
+上传时分批排序写入临时文件，再多路归并去重，内存占用与名单大小无关。
+
+作者：Phone Number Generator
+版本：1.0.0
+"""
+
+import os
+import re
+import sys
+import mmap
+import time
+import heapq
+import struct
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# 名单文件标识和格式版本
+EXCLUSION_MAGIC = b'PEXCLUDE'
+EXCLUSION_VERSION = 1
+
+# 文件头结构，填充到32字节
+_HEADER = struct.Struct('<8sIIQ')
+_HEADER_SIZE = 32
+
+# 名单文件扩展名
+EXCLUSION_EXTENSION = '.excl'
+
+# 上传时每批排序的号码数量（每批约8MB）
+RUN_SIZE = 1000000
+
+# 名单名称：字母、数字、下划线和连字符
+_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+_NUMBER_PATTERN = re.compile(rb'^\s*(?:\+?86)?(1\d{10})\s*$')
+
+
+def is_valid_name(name: str) -> bool:
+    """检查名单名称是否有效"""
+    return bool(_NAME_PATTERN.match(name or ''))
+
+
+def parse_numbers(lines: Iterable[bytes], stats: Dict[str, int] = None) -> Iterator[int]:
+    """
+    从文本行中解析号码
+
+    每行一个号码，CSV文件取第一列；允许带 +86/86 前缀。
+    无法解析的行（如标题行）会被跳过并计数。
+
+    参数：
+        lines: 文本行（bytes）
+        stats: 统计信息，解析后写入 invalid（跳过的行数）
+
+    返回：
+        Iterator[int]: 号码
+    """
+    invalid = 0
+    for line in lines:
+        field = line.split(b',', 1)[0]
+        match = _NUMBER_PATTERN.match(field)
+        if match:
+            yield int(match.group(1))
+        elif field.strip():
+            invalid += 1
+    if stats is not None:
+        stats['invalid'] = invalid
+
+
+def _write_run(values: List[int], directory: str) -> str:
+    """排序一批号码并写入临时文件，返回文件路径"""
+    values.sort()
+    run = array('Q', values)
+    if sys.byteorder != 'little':
+        run.byteswap()
+    fd, path = tempfile.mkstemp(suffix='.run', dir=directory)
+    with os.fdopen(fd, 'wb') as f:
+        run.tofile(f)
+    return path
+
+
+def _read_run(path: str, block: int = 65536) -> Iterator[int]:
+    """按块读取临时文件中的号码"""
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(block * 8)
+            if not data:
+                return
+            values = array('Q')
+            values.frombytes(data)
+            if sys.byteorder != 'little':
+                values.byteswap()
+            yield from values
+
+
+def write_exclusion_file(numbers: Iterable[int], path: str) -> int:
+    """
+    写入排除名单文件
+
+    参数：
+        numbers: 号码（任意顺序，可重复）
+        path: 名单文件路径
+
+    返回：
+        int: 写入的号码数量（去重后）
+
+    说明：
+        先写入临时文件再原子替换，正在映射旧文件的进程不受影响。
+    """
+    directory = os.path.dirname(path)
+    runs: List[str] = []
+    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    try:
+        batch: List[int] = []
+        for number in numbers:
+            batch.append(number)
+            if len(batch) >= RUN_SIZE:
+                runs.append(_write_run(batch, directory))
+                batch = []
+        if batch or not runs:
+            runs.append(_write_run(batch, directory))
+
+        count = 0
+        with open(tmp_path, 'wb') as f:
+            f.write(b'\0' * _HEADER_SIZE)
+            out = array('Q')
+            last = None
+            for number in heapq.merge(*(_read_run(run) for run in runs)):
+                if number == last:
+                    continue
+                last = number
+                out.append(number)
+                if len(out) >= 65536:
+                    count += len(out)
+                    if sys.byteorder != 'little':
+                        out.byteswap()
+                    out.tofile(f)
+                    out = array('Q')
+            count += len(out)
+            if sys.byteorder != 'little':
+                out.byteswap()
+            out.tofile(f)
+            f.seek(0)
+            f.write(_HEADER.pack(EXCLUSION_MAGIC, EXCLUSION_VERSION, 0, count))
+        os.replace(tmp_path, path)
+        return count
+    finally:
+        for run in runs:
+            try:
+                os.remove(run)
+            except OSError:
+                pass
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class ExclusionList:
+    """
+    只读的排除名单
+
+    以 mmap 方式映射名单文件，号码列按升序排列。
+
+    属性：
+        path: 名单文件路径
+        count: 号码数量
+        version: 名单版本（文件大小和修改时间），重新上传后变化
+        numbers: 号码列（memoryview，uint64）
+    """
+
+    def __init__(self, path: str):
+        """
+        映射名单文件
+
+        参数：
+            path: 名单文件路径
+
+        异常：
+            ValueError: 文件格式无效或平台不支持直接映射
+            OSError: 文件无法打开
+        """
+        if sys.byteorder != 'little' or array('Q').itemsize != 8:
+            raise ValueError("当前平台不支持直接映射排除名单")
+
+        self.path = path
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            self.version = f"{st.st_size}-{st.st_mtime_ns}"
+            if st.st_size < _HEADER_SIZE:
+                raise ValueError(f"排除名单文件已损坏：{path}")
+            magic, version, _, count = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != EXCLUSION_MAGIC or version != EXCLUSION_VERSION:
+                raise ValueError(f"排除名单文件版本不匹配：{path}")
+            if st.st_size != _HEADER_SIZE + count * 8:
+                raise ValueError(f"排除名单文件已损坏：{path}")
+            # 空文件无法映射，空名单使用空数组
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if count else None
+
+        self.count = count
+        if self._mmap is not None:
+            self.numbers = memoryview(self._mmap)[_HEADER_SIZE:].cast('Q')
+        else:
+            self.numbers = memoryview(array('Q'))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, number: int) -> bool:
+        index = bisect_left(self.numbers, number)
+        return index < self.count and self.numbers[index] == number
+
+    def excluded_tails(self, area: int) -> List[int]:
+        """
+        获取一个区域（前7位）中被排除的后4位
+
+        参数：
+            area: 前7位号码（号段 + 区域码）
+
+        返回：
+            List[int]: 升序排列的后4位（0-9999）
+        """
+        low = area * 10000
+        numbers = self.numbers
+        index = bisect_left(numbers, low)
+        tails = []
+        high = low + 10000
+        while index < self.count:
+            number = numbers[index]
+            if number >= high:
+                break
+            tails.append(number - low)
+            index += 1
+        return tails
+
+    def close(self) -> None:
+        """解除内存映射"""
+        self.numbers.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
+
+
+class ExclusionStore:
+    """
+    排除名单存储
+
+    每个名单保存为目录下的一个文件，打开的名单按文件版本缓存，
+    其他进程重新上传后自动重新映射。
+    """
+
+    def __init__(self, directory: str):
+        """
+        初始化名单存储
+
+        参数：
+            directory: 名单目录
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._open: Dict[str, ExclusionList] = {}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name + EXCLUSION_EXTENSION)
+
+    def exists(self, name: str) -> bool:
+        """检查名单是否存在"""
+        return is_valid_name(name) and os.path.isfile(self._path(name))
+
+    def get(self, name: str) -> Optional[ExclusionList]:
+        """
+        获取名单
+
+        参数：
+            name: 名单名称
+
+        返回：
+            ExclusionList: 名单，不存在时返回None
+        """
+        if not is_valid_name(name):
+            return None
+        path = self._path(name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        version = f"{st.st_size}-{st.st_mtime_ns}"
+        with self._lock:
+            current = self._open.get(name)
+            if current is not None and current.version == version:
+                return current
+            # 旧名单可能仍被正在生成的任务引用，交由垃圾回收解除映射
+            current = ExclusionList(path)
+            self._open[name] = current
+            return current
+
+    def save(self, name: str, lines: Iterable[bytes]) -> Dict[str, Any]:
+        """
+        保存（替换）名单
+
+        参数：
+            name: 名单名称
+            lines: 文本行，每行一个号码
+
+        返回：
+            Dict: 名单信息（name, count, invalid）
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        stats: Dict[str, int] = {}
+        count = write_exclusion_file(parse_numbers(lines, stats), self._path(name))
+        return {'name': name, 'count': count, 'invalid': stats.get('invalid', 0)}
+
+    def delete(self, name: str) -> bool:
+        """
+        删除名单
+
+        参数：
+            name: 名单名称
+
+        返回：
+            bool: 删除成功返回True，不存在返回False
+        """
+        if not is_valid_name(name):
+            return False
+        with self._lock:
+            self._open.pop(name, None)
+        try:
+            os.remove(self._path(name))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def list(self) -> List[Dict[str, Any]]:
+        """
+        列出所有名单
+
+        返回：
+            List[Dict]: 名单信息（name, count, size, updated），按名称排序
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        result = []
+        for entry in sorted(os.scandir(self.directory), key=lambda item: item.name):
+            if not entry.name.endswith(EXCLUSION_EXTENSION):
+                continue
+            st = entry.stat()
+            result.append({
+                'name': entry.name[:-len(EXCLUSION_EXTENSION)],
+                'count': max(0, (st.st_size - _HEADER_SIZE) // 8),
+                'size': st.st_size,
+                'updated': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(st.st_mtime))
+            })
+        return result
@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+"""
+生成文件索引与后台清理模块
+
+本模块负责记录下载目录中生成的文件，并在后台定期清理，
+替代手动调用 /api/cleanup 时逐个扫描目录的方式。
+
+功能说明：
+- GeneratedFileIndex: 内存中的文件索引（大小、创建时间、最后访问时间），
+  按最后访问时间排序，启动时扫描一次目录，之后由写入和下载操作维护
+- FileReaper: 后台清理线程，按计划删除超过过期时间的文件，
+  并在文件总大小超过配额时按最近最少使用（LRU）顺序淘汰
+
+说明：
+    多进程部署时每个工作进程维护各自的索引，每次清理前按共享的清单同步，
+    其他进程生成、访问和删除的文件都计入，过期时间和配额按下载目录中的全部文件计算。
+
+作者：Phone Number Generator
+版本：1.0.0
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class FileEntry:
+    """索引中的文件记录（shared 表示已记录在共享清单中，pending 表示所属任务尚未完成）"""
+
+    __slots__ = ('name', 'size', 'created', 'accessed', 'shared', 'pending')
+
+    def __init__(self, name: str, size: int, created: float, accessed: float, shared: bool = False,
+                 pending: bool = False):
+        self.name = name
+        self.size = size
+        self.created = created
+        self.accessed = accessed
+        self.shared = shared
+        self.pending = pending
+
+
+class GeneratedFileIndex:
+    """
+    生成文件索引
+
+    使用有序字典按最后访问时间排列文件，最久未访问的在前，
+    新增和访问操作均为O(1)。
+    """
+
+    def __init__(self):
+        """
+        初始化文件索引
+        """
+        self._entries: 'OrderedDict[str, FileEntry]' = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    @property
+    def total_bytes(self) -> int:
+        """索引中文件的总大小（字节）"""
+        return self._total_bytes
+
+    def scan(self, directory: str, known: Optional[Dict[str, Tuple[float, float]]] = None) -> int:
+        """
+        扫描目录建立索引（仅在启动时调用一次）
+
+        只记录目录下的文件，忽略子目录（如剖析文件目录）和以点开头的文件（如清单）。
+
+        参数：
+            directory: 下载目录
+            known: 已知文件的 {文件名: (创建时间, 最后访问时间)}，优先于文件系统时间
+
+        返回：
+            int: 索引的文件数量
+        """
+        if not os.path.isdir(directory):
+            return 0
+        known = known or {}
+        found = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and not entry.name.startswith('.'):
+                st = entry.stat()
+                created, accessed = known.get(entry.name, (st.st_mtime, max(st.st_atime, st.st_mtime)))
+                found.append(FileEntry(entry.name, st.st_size, created, accessed, entry.name in known))
+        found.sort(key=lambda item: item.accessed)
+        with self._lock:
+            for item in found:
+                self._put(item)
+        return len(found)
+
+    def sync(self, records: Iterable[Dict[str, Any]]) -> None:
+        """
+        按共享清单同步索引
+
+        清单中的文件加入索引或更新大小、创建时间、最后访问时间和任务是否完成；
+        曾记录在清单中、现已不在清单中的文件（已被其他进程删除）移出索引；
+        未记录到清单的文件（如启动时扫描到的旧文件、刚写完尚未记录的文件）保持不变。
+
+        参数：
+            records: 清单中的文件记录（name, size, created, accessed，以及可选的 pending）
+        """
+        with self._lock:
+            seen = set()
+            for record in records:
+                name = record['name']
+                seen.add(name)
+                item = self._entries.get(name)
+                if item is None:
+                    item = FileEntry(name, record['size'], record['created'], record['accessed'], True,
+                                     bool(record.get('pending')))
+                    self._entries[name] = item
+                    self._total_bytes += item.size
+                    continue
+                self._total_bytes += record['size'] - item.size
+                item.size = record['size']
+                item.created = record['created']
+                item.accessed = max(item.accessed, record['accessed'])
+                item.shared = True
+                item.pending = bool(record.get('pending'))
+            for name, item in list(self._entries.items()):
+                if item.shared and name not in seen:
+                    del self._entries[name]
+                    self._total_bytes -= item.size
+            # 其他进程的访问会改变顺序，按最后访问时间重新排列
+            ordered = sorted(self._entries.values(), key=lambda entry: entry.accessed)
+            self._entries = OrderedDict((entry.name, entry) for entry in ordered)
+
+    def clear(self) -> None:
+        """清空索引"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def _put(self, item: FileEntry) -> None:
+        """加入或替换记录（调用方需持有锁）"""
+        old = self._entries.pop(item.name, None)
+        if old is not None:
+            self._total_bytes -= old.size
+        self._entries[item.name] = item
+        self._total_bytes += item.size
+
+    def add(self, name: str, size: int, pending: bool = False) -> None:
+        """
+        记录新生成的文件
+
+        参数：
+            name: 文件名
+            size: 文件大小（字节）
+            pending: 所属任务是否尚未完成，完成后调用 release()
+        """
+        now = time.time()
+        with self._lock:
+            self._put(FileEntry(name, size, now, now, pending=pending))
+
+    def release(self, names: Iterable[str]) -> None:
+        """
+        所属任务已完成，文件可以正常清理
+
+        参数：
+            names: 文件名
+        """
+        with self._lock:
+            for name in names:
+                item = self._entries.get(name)
+                if item is not None:
+                    item.pending = False
+
+    def touch(self, name: str) -> bool:
+        """
+        记录文件被访问
+
+        参数：
+            name: 文件名
+
+        返回：
+            bool: 文件在索引中返回True
+        """
+        with self._lock:
+            item = self._entries.get(name)
+            if item is None:
+                return False
+            item.accessed = time.time()
+            self._entries.move_to_end(name)
+            return True
+
+    def remove(self, name: str) -> Optional[FileEntry]:
+        """
+        从索引中移除文件
+
+        参数：
+            name: 文件名
+
+        返回：
+            FileEntry: 被移除的记录，不存在时返回None
+        """
+        with self._lock:
+            item = self._entries.pop(name, None)
+            if item is not None:
+                self._total_bytes -= item.size
+            return item
+
+    def select_expired(self, cutoff: float, pending_cutoff: Optional[float] = None) -> List[FileEntry]:
+        """
+        获取创建时间早于 cutoff 的文件
+
+        所属任务尚未完成的文件只在创建时间早于 pending_cutoff 时才算过期
+        （任务所在进程被终止后不会再完成），未给出时不算过期。
+
+        参数：
+            cutoff: 时间戳
+            pending_cutoff: 未完成任务的文件的时间戳
+
+        返回：
+            List[FileEntry]: 过期文件
+        """
+        with self._lock:
+            return [
+                item for item in self._entries.values()
+                if item.created < cutoff
+                and (not item.pending or (pending_cutoff is not None and item.created < pending_cutoff))
+            ]
+
+    def select_lru(self, quota_bytes: int) -> List[FileEntry]:
+        """
+        获取需要淘汰的文件，使剩余文件总大小不超过配额
+
+        所属任务尚未完成的文件不会被淘汰（但计入总大小），任务完成后才参与淘汰。
+
+        参数：
+            quota_bytes: 配额（字节）
+
+        返回：
+            List[FileEntry]: 按最后访问时间从早到晚排列的待淘汰文件
+        """
+        with self._lock:
+            excess = self._total_bytes - quota_bytes
+            victims = []
+            for item in self._entries.values():
+                if excess <= 0:
+                    break
+                if item.pending:
+                    continue
+                victims.append(item)
+                excess -= item.size
+            return victims
+
+
+class FileReaper:
+    """
+    后台文件清理器
+
+    定期删除过期文件，并按LRU淘汰超出配额的文件，不删除尚未完成的任务的文件。
+    未完成的任务的文件超过两倍过期时间后视为任务已中断，按过期删除。
+    参数每次清理时从回调读取，支持热重载；每次清理前调用 refresh 回调同步索引。
+    """
+
+    def __init__(self, index: GeneratedFileIndex,
+                 directory_getter: Callable[[], str],
+                 expire_hours_getter: Callable[[], float],
+                 quota_bytes_getter: Callable[[], int],
+                 on_reclaim: Optional[Callable[[str, int, int], None]] = None,
+                 on_remove: Optional[Callable[[str], None]] = None,
+                 refresh: Optional[Callable[[], None]] = None):
+        """
+        初始化清理器
+
+        参数：
+            index: 文件索引
+            directory_getter: 返回下载目录的回调
+            expire_hours_getter: 返回过期时间（小时）的回调
+            quota_bytes_getter: 返回配额（字节）的回调，0表示不限制
+            on_reclaim: 清理后的回调，参数为 (原因, 文件数, 字节数)
+            on_remove: 每个文件移出索引后的回调，参数为文件名
+            refresh: 每次清理前同步索引的回调（如按共享清单调用 index.sync()）
+        """
+        self.index = index
+        self._directory_getter = directory_getter
+        self._expire_hours_getter = expire_hours_getter
+        self._quota_bytes_getter = quota_bytes_getter
+        self._on_reclaim = on_reclaim
+        self._on_remove = on_remove
+        self._refresh = refresh
+        self._run_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event: Optional[threading.Event] = None
+
+    def _delete(self, items: List[FileEntry], reason: str) -> Tuple[int, int]:
+        """删除文件并移出索引，返回 (文件数, 字节数)"""
+        directory = self._directory_getter()
+        files = 0
+        reclaimed = 0
+        for item in items:
+            try:
+                os.remove(os.path.join(directory, item.name))
+            except FileNotFoundError:
+                # 已被外部删除，只移出索引
+                self.index.remove(item.name)
+                if self._on_remove is not None:
+                    self._on_remove(item.name)
+                continue
+            except OSError as e:
+                logging.warning(f"删除文件失败：{item.name}，{str(e)}")
+                continue
+            if self.index.remove(item.name) is not None:
+                files += 1
+                reclaimed += item.size
+            if self._on_remove is not None:
+                self._on_remove(item.name)
+        if files and self._on_reclaim is not None:
+            self._on_reclaim(reason, files, reclaimed)
+        return files, reclaimed
+
+    def run_once(self) -> Dict[str, int]:
+        """
+        执行一次清理
+
+        返回：
+            Dict[str, int]: 删除的文件数和回收的字节数
+        """
+        with self._run_lock:
+            if self._refresh is not None:
+                self._refresh()
+            expire_seconds = self._expire_hours_getter() * 3600
+            cutoff = time.time() - expire_seconds
+            expired_files, expired_bytes = self._delete(
+                self.index.select_expired(cutoff, cutoff - expire_seconds), 'expired'
+            )
+
+            quota_files = quota_bytes = 0
+            quota = self._quota_bytes_getter()
+            if quota > 0:
+                quota_files, quota_bytes = self._delete(self.index.select_lru(quota), 'quota')
+
+        result = {
+            'files': expired_files + quota_files,
+            'bytes': expired_bytes + quota_bytes,
+        }
+        if result['files']:
+            logging.info(f"清理生成文件：过期 {expired_files} 个，超出配额 {quota_files} 个，"
+                         f"回收 {result['bytes']} 字节")
+        return result
+
+    def start(self, interval: float) -> bool:
+        """
+        启动后台清理线程
+
+        参数：
+            interval: 清理间隔（秒），小于等于0时不启动
+
+        返回：
+            bool: 是否启动了线程
+        """
+        if interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return False
+        stop_event = threading.Event()
+
+        def run():
+            while not stop_event.wait(interval):
+                try:
+                    self.run_once()
+                except Exception as e:
+                    logging.error(f"清理生成文件失败：{str(e)}")
+
+        self._stop_event = stop_event
+        self._thread = threading.Thread(target=run, name='file-reaper', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        """停止后台清理线程"""
+        if self._stop_event is not None:
+            self._stop_event.set()
+        self._thread = None
+        self._stop_event = None
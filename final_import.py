@@ -10,6 +10,8 @@ CSV数据导入SQLite数据库脚本
 - 自动检测是否需要导入（数据库已存在且有数据则跳过）
 - 批量插入数据库，提高导入效率
 - 创建索引优化查询性能
+- 导出可内存映射的二进制快照，供应用启动时直接加载
+- 生成号段可用性索引（每个城市可用的号段、区域码数量和运营商）
 - 提供便捷函数 import_csv_to_database() 供其他模块调用
 
 使用方法（命令行）：
@@ -31,7 +33,16 @@ import os
 import sys
 import argparse
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
+
+from location_snapshot import LocationSnapshot, source_stamp, write_snapshot
+
+
+# 号段可用性索引表：每个 (省份, 城市, 号段, 运营商) 的区域码数量
+PREFIX_INDEX_TABLE = 'prefix_index'
+
+# 导入信息表：记录数据库导入时CSV文件的版本戳（大小和修改时间）
+IMPORT_META_TABLE = 'import_meta'
 
 
 def detect_encoding(file_path: str) -> str:
@@ -47,12 +58,21 @@ def detect_encoding(file_path: str) -> str:
     返回：
         str: 检测到的编码名称
     """
-    import chardet
-    
     try:
         with open(file_path, 'rb') as f:
             raw_data = f.read(10000)
         
+        # 大多数数据文件为UTF-8编码，能直接解码时无需导入chardet
+        # 采样末尾可能截断多字节字符，忽略最后3个字节内的解码错误
+        try:
+            raw_data.decode('utf-8')
+            return 'utf-8'
+        except UnicodeDecodeError as e:
+            if e.start >= len(raw_data) - 3 and e.reason == 'unexpected end of data':
+                return 'utf-8'
+        
+        import chardet
+        
         result = chardet.detect(raw_data)
         encoding = result.get('encoding', 'utf-8')
         confidence = result.get('confidence', 0)
@@ -86,16 +106,19 @@ class DataImporter:
         cursor: 数据库游标
     """
     
-    def __init__(self, csv_file: str = 'phone_location.csv', db_file: str = 'phone_location.db'):
+    def __init__(self, csv_file: str = 'phone_location.csv', db_file: str = 'phone_location.db',
+                 snapshot_file: str = 'phone_location.snap'):
         """
         初始化数据导入类
         
         参数：
             csv_file: CSV文件路径
             db_file: 数据库文件路径
+            snapshot_file: 二进制快照文件路径
         """
         self.csv_file = csv_file
         self.db_file = db_file
+        self.snapshot_file = snapshot_file
         
         script_dir = Path(__file__).parent
         print(f"脚本所在目录：{script_dir}")
@@ -109,6 +132,7 @@ class DataImporter:
         # 将CSV和数据库文件放在data目录下
         self.csv_path = data_dir / csv_file
         self.db_path = data_dir / db_file
+        self.snapshot_path = data_dir / snapshot_file
         
         self.conn = None
         self.cursor = None
@@ -121,6 +145,10 @@ class DataImporter:
         """获取数据库文件的完整路径"""
         return str(self.db_path)
     
+    def get_snapshot_path(self) -> str:
+        """获取快照文件的完整路径"""
+        return str(self.snapshot_path)
+    
     def check_csv_exists(self) -> bool:
         """检查CSV文件是否存在"""
         return self.csv_path.exists()
@@ -219,9 +247,17 @@ class DataImporter:
         
         if not force and self.check_db_exists():
             record_count = self.get_db_record_count()
+            if record_count > 0 and self.get_db_source_stamp() != source_stamp(str(self.csv_path)):
+                # 数据库不是由当前CSV文件导入的（CSV已变化，或旧版本导入时未记录版本戳）
+                print(f"✓ CSV文件已变化，重新导入（数据库现有 {record_count} 条记录）")
+                return self.import_data(force=True)
             if record_count > 0:
                 print(f"✓ 数据库已存在，包含 {record_count} 条记录，跳过导入")
                 print("  如需重新导入，请使用 --force 参数")
+                if not self.check_snapshot_fresh():
+                    self.export_snapshot()
+                if not self.check_prefix_index():
+                    self.build_prefix_index()
                 return True
         
         if not self.connect_database():
@@ -249,6 +285,8 @@ class DataImporter:
         """读取CSV文件并导入数据"""
         insert_count = 0
         skipped_count = 0
+        # 读取前记录版本戳，导入期间CSV被修改时下次启动会重新导入
+        stamp = source_stamp(str(self.csv_path))
         
         try:
             encoding = detect_encoding(self.csv_path)
@@ -283,6 +321,7 @@ class DataImporter:
                     self._batch_insert(data_batch)
                     print(f"  已导入 {insert_count} 条数据")
             
+            self._record_source_stamp(stamp)
             self.conn.commit()
             print(f"\n✓ 数据导入完成：共导入 {insert_count} 条，跳过 {skipped_count} 条")
             
@@ -290,6 +329,8 @@ class DataImporter:
             print(f"✓ 数据库中总共有 {final_count} 条记录")
             
             self.close_database()
+            self.build_prefix_index()
+            self.export_snapshot()
             return True
             
         except Exception as e:
@@ -307,6 +348,133 @@ class DataImporter:
         '''
         self.cursor.executemany(insert_sql, data_batch)
     
+    def _record_source_stamp(self, stamp: Tuple[int, int]) -> None:
+        """在当前事务中记录导入的CSV文件版本戳"""
+        self.cursor.execute(f'CREATE TABLE IF NOT EXISTS {IMPORT_META_TABLE} (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        self.cursor.executemany(
+            f'INSERT OR REPLACE INTO {IMPORT_META_TABLE} VALUES (?, ?)',
+            [('csv_size', stamp[0]), ('csv_mtime', stamp[1])]
+        )
+    
+    def get_db_source_stamp(self) -> Optional[Tuple[int, int]]:
+        """
+        获取数据库导入时CSV文件的版本戳
+        
+        返回：
+            Optional[Tuple[int, int]]: (文件大小, 修改时间纳秒)，未记录时返回None
+        """
+        if not self.check_db_exists():
+            return None
+        try:
+            conn = sqlite3.connect(str(self.db_path))
+            try:
+                values = dict(conn.execute(f'SELECT key, value FROM {IMPORT_META_TABLE}').fetchall())
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return None
+        if 'csv_size' not in values or 'csv_mtime' not in values:
+            return None
+        return values['csv_size'], values['csv_mtime']
+    
+    def check_snapshot_fresh(self) -> bool:
+        """检查快照文件是否存在且与CSV文件一致"""
+        if not self.snapshot_path.exists():
+            return False
+        try:
+            snapshot = LocationSnapshot(str(self.snapshot_path))
+        except (OSError, ValueError):
+            return False
+        try:
+            return snapshot.is_fresh_for(str(self.csv_path))
+        finally:
+            snapshot.close()
+    
+    def export_snapshot(self) -> bool:
+        """
+        从数据库导出二进制快照
+        
+        快照记录数据库导入时的CSV版本戳，而不是当前CSV文件的版本戳，
+        数据库不是由当前CSV导入时快照不会被当作最新。
+        快照导出失败不影响数据库导入结果，应用会回退到SQLite查询。
+        
+        返回：
+            bool: 导出成功返回True，失败返回False
+        """
+        try:
+            conn = sqlite3.connect(str(self.db_path))
+            try:
+                rows = conn.execute(
+                    'SELECT prefix, suffix, province, city, operator FROM phone_location'
+                )
+                count = write_snapshot(rows, str(self.snapshot_path),
+                                       stamp=self.get_db_source_stamp() or (0, 0))
+            finally:
+                conn.close()
+            print(f"✓ 已导出二进制快照：{self.snapshot_path}（{count} 条记录）")
+            return True
+        except Exception as e:
+            print(f"✗ 导出二进制快照失败：{e}")
+            return False
+    
+    def check_prefix_index(self) -> bool:
+        """检查号段可用性索引是否存在"""
+        if not self.check_db_exists():
+            return False
+        try:
+            conn = sqlite3.connect(str(self.db_path))
+            try:
+                row = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                    (PREFIX_INDEX_TABLE,)
+                ).fetchone()
+                return row is not None
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return False
+    
+    def build_prefix_index(self) -> bool:
+        """
+        生成号段可用性索引
+        
+        按 (省份, 城市, 号段, 运营商) 统计去重后的区域码数量，
+        应用据此提示每个城市可用的号段和预计结果数量，无需查询明细数据。
+        索引生成失败不影响数据库导入结果，应用会回退到明细数据统计。
+        
+        返回：
+            bool: 生成成功返回True，失败返回False
+        """
+        try:
+            conn = sqlite3.connect(str(self.db_path))
+            try:
+                with conn:
+                    conn.execute(f'DROP TABLE IF EXISTS {PREFIX_INDEX_TABLE}')
+                    conn.execute(f'''
+                    CREATE TABLE {PREFIX_INDEX_TABLE} (
+                        province TEXT NOT NULL,
+                        city TEXT NOT NULL,
+                        prefix TEXT NOT NULL,
+                        operator INTEGER NOT NULL,
+                        suffix_count INTEGER NOT NULL,
+                        PRIMARY KEY (province, city, prefix, operator)
+                    ) WITHOUT ROWID
+                    ''')
+                    conn.execute(f'''
+                    INSERT INTO {PREFIX_INDEX_TABLE}
+                    SELECT province, city, prefix, operator, COUNT(DISTINCT suffix)
+                    FROM phone_location
+                    GROUP BY province, city, prefix, operator
+                    ''')
+                count = conn.execute(f'SELECT COUNT(*) FROM {PREFIX_INDEX_TABLE}').fetchone()[0]
+            finally:
+                conn.close()
+            print(f"✓ 已生成号段可用性索引（{count} 条记录）")
+            return True
+        except Exception as e:
+            print(f"✗ 生成号段可用性索引失败：{e}")
+            return False
+    
     def check_status(self) -> Dict[str, Any]:
         """检查数据状态"""
         return {
@@ -314,7 +482,10 @@ class DataImporter:
             'db_exists': self.check_db_exists(),
             'db_record_count': self.get_db_record_count(),
             'csv_path': self.get_csv_path(),
-            'db_path': self.get_db_path()
+            'db_path': self.get_db_path(),
+            'snapshot_path': self.get_snapshot_path(),
+            'snapshot_fresh': self.check_snapshot_fresh(),
+            'prefix_index': self.check_prefix_index()
         }
 
 
@@ -396,6 +567,11 @@ def main():
         print(f"  路径：{status['db_path']}")
         print(f"  存在：{'是' if status['db_exists'] else '否'}")
         print(f"  记录数：{status['db_record_count']} 条")
+        print(f"\n快照文件：")
+        print(f"  路径：{status['snapshot_path']}")
+        print(f"  可用：{'是' if status['snapshot_fresh'] else '否'}")
+        print(f"\n号段可用性索引：")
+        print(f"  存在：{'是' if status['prefix_index'] else '否'}")
         print("=" * 60)
         return 0
     
@@ -0,0 +1,398 @@
+# -*- coding: utf-8 -*-
+"""
+号码归属地二进制快照模块
+
+本模块负责将phone_location表导出为可内存映射（mmap）的二进制快照文件，
+并在应用启动时以只读方式映射该文件，供查询直接使用。
+多个工作进程映射同一个文件时，数据页由操作系统页缓存共享，
+启动时无需再读取CSV或统计数据库记录。
+
+文件格式（小端序，版本 1）：
+    文件头（64字节）：
+        magic          8s   固定为 b'PLOCSNAP'
+        version        I    格式版本号
+        record_count   I    记录数量
+        source_size    Q    生成快照时CSV文件的大小
+        source_mtime   q    生成快照时CSV文件的修改时间（纳秒）
+        keys_offset    Q    号段键列的偏移
+        regions_offset Q    区域编号列的偏移
+        ops_offset     Q    运营商列的偏移
+        strtab_offset  Q    区域字符串表的偏移
+    定宽列（按 prefix + suffix 升序排列）：
+        keys           uint32 × N   前7位号码（prefix * 10000 + suffix）
+        regions        uint16 × N   区域编号，指向字符串表
+        operators      uint8  × N   运营商类型
+    区域字符串表：
+        UTF-8文本，每行一个区域，格式为“省份\\t城市”
+
+作者：Phone Number Generator
+版本：1.0.0
+"""
+
+import os
+import sys
+import mmap
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+# 快照文件标识和格式版本
+SNAPSHOT_MAGIC = b'PLOCSNAP'
+SNAPSHOT_VERSION = 1
+
+# 文件头结构，填充到64字节
+_HEADER = struct.Struct('<8sIIQqQQQQ')
+_HEADER_SIZE = 64
+
+# 列对齐字节数
+_ALIGN = 8
+
+
+def _align(offset: int) -> int:
+    """将偏移量向上对齐到 _ALIGN 字节"""
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _native_layout_ok() -> bool:
+    """
+    检查当前平台能否直接映射快照列
+
+    memoryview.cast 使用本机字节序和类型宽度，
+    仅在小端序且 I/H 类型宽度为 4/2 字节时可直接使用。
+    """
+    return (sys.byteorder == 'little'
+            and array('I').itemsize == 4
+            and array('H').itemsize == 2)
+
+
+def source_stamp(source_path: str) -> Tuple[int, int]:
+    """
+    获取数据源文件的版本戳
+
+    参数：
+        source_path: CSV文件路径
+
+    返回：
+        Tuple[int, int]: (文件大小, 修改时间纳秒)，文件不存在时返回 (0, 0)
+    """
+    try:
+        st = os.stat(source_path)
+    except OSError:
+        return 0, 0
+    return st.st_size, st.st_mtime_ns
+
+
+def write_snapshot(rows: Iterable[Sequence[Any]], snapshot_path: str,
+                   source_path: str = None, stamp: Tuple[int, int] = None) -> int:
+    """
+    写入二进制快照文件
+
+    参数：
+        rows: 记录迭代器，每条记录为 (prefix, suffix, province, city, operator)
+        snapshot_path: 快照文件路径
+        source_path: 数据源CSV路径，用于记录版本戳
+        stamp: 数据源版本戳 (文件大小, 修改时间纳秒)，给出时优先于 source_path
+
+    返回：
+        int: 写入的记录数量
+
+    说明：
+        先写入临时文件再原子替换，正在映射旧文件的进程不受影响。
+        号段或区域码不是数字的记录会被跳过。
+    """
+    records = []
+    region_ids: Dict[Tuple[str, str], int] = {}
+    for prefix, suffix, province, city, operator in rows:
+        prefix = str(prefix).strip()
+        suffix = str(suffix).strip()
+        if not (prefix.isdigit() and suffix.isdigit()):
+            continue
+        region = (str(province), str(city))
+        region_id = region_ids.setdefault(region, len(region_ids))
+        records.append((int(prefix) * 10000 + int(suffix), region_id, int(operator)))
+
+    if len(region_ids) > 0xFFFF:
+        raise ValueError(f"区域数量过多（{len(region_ids)}），超出快照格式上限")
+
+    records.sort()
+    count = len(records)
+
+    keys = array('I', (r[0] for r in records))
+    regions = array('H', (r[1] for r in records))
+    operators = array('B', (r[2] for r in records))
+    if sys.byteorder != 'little':
+        keys.byteswap()
+        regions.byteswap()
+
+    strtab = '\n'.join(f"{p}\t{c}" for p, c in region_ids).encode('utf-8')
+
+    keys_offset = _HEADER_SIZE
+    regions_offset = _align(keys_offset + 4 * count)
+    ops_offset = _align(regions_offset + 2 * count)
+    strtab_offset = _align(ops_offset + count)
+
+    if stamp is None:
+        stamp = source_stamp(source_path) if source_path else (0, 0)
+    source_size, source_mtime = stamp
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, count,
+                          source_size, source_mtime,
+                          keys_offset, regions_offset, ops_offset, strtab_offset)
+
+    tmp_path = f"{snapshot_path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(header.ljust(_HEADER_SIZE, b'\0'))
+        for offset, payload in ((keys_offset, keys.tobytes()),
+                                (regions_offset, regions.tobytes()),
+                                (ops_offset, operators.tobytes()),
+                                (strtab_offset, strtab)):
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(payload)
+    os.replace(tmp_path, snapshot_path)
+    return count
+
+
+class LocationSnapshot:
+    """
+    只读的归属地快照
+
+    以 mmap 方式映射快照文件，按列提供零拷贝访问。
+    号段键列已排序，按号段查询时使用二分查找定位范围。
+
+    属性：
+        path: 快照文件路径
+        record_count: 记录数量
+        source_size: 生成时数据源文件大小
+        source_mtime: 生成时数据源文件修改时间（纳秒）
+        keys: 前7位号码列（memoryview，uint32）
+        regions: 区域编号列（memoryview，uint16）
+        operators: 运营商列（memoryview，uint8）
+        region_names: 区域列表，元素为 (省份, 城市)
+    """
+
+    def __init__(self, path: str):
+        """
+        映射快照文件
+
+        参数：
+            path: 快照文件路径
+
+        异常：
+            ValueError: 文件格式无效、版本不匹配或平台不支持直接映射
+            OSError: 文件无法打开
+        """
+        if not _native_layout_ok():
+            raise ValueError("当前平台不支持直接映射快照文件")
+
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < _HEADER_SIZE:
+            self.close()
+            raise ValueError(f"快照文件已损坏：{path}")
+
+        (magic, version, count, self.source_size, self.source_mtime,
+         keys_offset, regions_offset, ops_offset, strtab_offset) = _HEADER.unpack_from(self._mmap, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            self.close()
+            raise ValueError(f"快照文件版本不匹配：{path}")
+
+        self.record_count = count
+        buf = memoryview(self._mmap)
+        self.keys = buf[keys_offset:keys_offset + 4 * count].cast('I')
+        self.regions = buf[regions_offset:regions_offset + 2 * count].cast('H')
+        self.operators = buf[ops_offset:ops_offset + count]
+
+        strtab = bytes(buf[strtab_offset:]).decode('utf-8')
+        self.region_names: List[Tuple[str, str]] = [
+            tuple(line.split('\t', 1)) for line in strtab.split('\n') if line
+        ]
+        self._region_lookup = {name: idx for idx, name in enumerate(self.region_names)}
+
+    def close(self) -> None:
+        """解除内存映射"""
+        for name in ('keys', 'regions', 'operators'):
+            view = self.__dict__.pop(name, None)
+            if view is not None:
+                view.release()
+        try:
+            self._mmap.close()
+        except (AttributeError, BufferError):
+            pass
+
+    def is_fresh_for(self, source_path: str) -> bool:
+        """
+        检查快照是否与数据源一致
+
+        参数：
+            source_path: CSV文件路径
+
+        返回：
+            bool: 数据源未变化返回True；数据源不存在时视为一致
+        """
+        size, mtime = source_stamp(source_path)
+        if size == 0 and mtime == 0:
+            return True
+        return size == self.source_size and mtime == self.source_mtime
+
+    def region_id(self, province: str, city: str) -> Optional[int]:
+        """获取区域编号，不存在时返回None"""
+        return self._region_lookup.get((province, city))
+
+    def prefix_range(self, prefix: int) -> Tuple[int, int]:
+        """
+        获取指定号段在键列中的下标范围
+
+        参数：
+            prefix: 3位号段（整数）
+
+        返回：
+            Tuple[int, int]: [start, end) 下标范围
+        """
+        low = prefix * 10000
+        start = bisect_left(self.keys, low)
+        end = bisect_right(self.keys, low + 9999, start)
+        return start, end
+
+    def query(self, prefix: str, province: str, city: str,
+              operators: List[int] = None) -> List[Dict[str, Any]]:
+        """
+        查询符合条件的归属地记录
+
+        返回结果与 DatabaseManager.query_phone_locations 一致，
+        并按区域码升序排列。
+
+        参数：
+            prefix: 手机号前3位号段
+            province: 省份
+            city: 城市
+            operators: 运营商列表
+
+        返回：
+            List[Dict]: 归属地记录列表
+        """
+        if not prefix.isdigit():
+            return []
+        region = self.region_id(province, city)
+        if region is None:
+            return []
+
+        allowed_ops = set(operators) if operators else None
+        start, end = self.prefix_range(int(prefix))
+        keys, regions, ops = self.keys, self.regions, self.operators
+
+        results = []
+        for i in range(start, end):
+            if regions[i] != region:
+                continue
+            operator = ops[i]
+            if allowed_ops is not None and operator not in allowed_ops:
+                continue
+            results.append({
+                'prefix': prefix,
+                'suffix': str(keys[i] % 10000).zfill(4),
+                'province': province,
+                'city': city,
+                'operator': operator
+            })
+        return results
+
+    def lookup(self, areas: Iterable[int]) -> Dict[int, Tuple[str, str, int]]:
+        """
+        批量反查前7位号码的归属地
+
+        先将待查号码去重并升序排列，再沿键列依次二分查找，
+        每次查找的下界从上一个命中位置开始，整批只扫描一遍键列。
+
+        参数：
+            areas: 前7位号码（整数）
+
+        返回：
+            Dict[int, Tuple[str, str, int]]: {前7位号码: (省份, 城市, 运营商)}，未找到的不包含
+        """
+        keys, regions, ops, names = self.keys, self.regions, self.operators, self.region_names
+        count = self.record_count
+        found: Dict[int, Tuple[str, str, int]] = {}
+        index = 0
+        for area in sorted(set(areas)):
+            index = bisect_left(keys, area, index)
+            if index >= count:
+                break
+            if keys[index] == area:
+                province, city = names[regions[index]]
+                found[area] = (province, city, ops[index])
+        return found
+
+    def select_areas(self, matches: Callable[[str, str, int, str], bool],
+                     prefixes: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        按判断函数筛选区域（前7位）
+
+        沿已排序的键列扫描一遍，结果天然有序；每个号段内相同的 (区域, 运营商)
+        只调用一次判断函数。
+
+        参数：
+            matches: 判断函数，参数为 (省份, 城市, 运营商, 号段)
+            prefixes: 只扫描这些号段，None表示全部号段
+
+        返回：
+            List[str]: 命中的7位区域（升序，已去重）
+        """
+        keys, regions, ops, names = self.keys, self.regions, self.operators, self.region_names
+        if prefixes is not None:
+            ranges = [self.prefix_range(int(prefix)) for prefix in sorted(prefixes)]
+        else:
+            ranges = []
+            start = 0
+            while start < self.record_count:
+                end = bisect_right(keys, keys[start] // 10000 * 10000 + 9999, start)
+                ranges.append((start, end))
+                start = end
+
+        result: List[str] = []
+        last = -1
+        for start, end in ranges:
+            if start >= end:
+                continue
+            prefix = str(keys[start] // 10000)
+            decisions: Dict[int, bool] = {}
+            for i in range(start, end):
+                code = regions[i] << 8 | ops[i]
+                hit = decisions.get(code)
+                if hit is None:
+                    province, city = names[regions[i]]
+                    hit = decisions[code] = matches(province, city, ops[i], prefix)
+                if hit and keys[i] != last:
+                    last = keys[i]
+                    result.append(str(last))
+        return result
+
+    def region_prefixes(self) -> Dict[Tuple[str, str], List[str]]:
+        """
+        获取每个区域包含的号段
+
+        按号段逐段定位键列范围，每段只统计一次区域编号集合。
+
+        返回：
+            Dict[Tuple[str, str], List[str]]: {(省份, 城市): 已排序的号段列表}
+        """
+        result: Dict[Tuple[str, str], List[str]] = {}
+        keys, regions = self.keys, self.regions
+        start = 0
+        while start < self.record_count:
+            prefix = keys[start] // 10000
+            end = bisect_right(keys, prefix * 10000 + 9999, start)
+            for region in set(regions[start:end]):
+                result.setdefault(self.region_names[region], []).append(str(prefix))
+            start = end
+        return result
+
+    def provinces(self) -> List[str]:
+        """获取所有省份（已排序）"""
+        return sorted({p for p, _ in self.region_names})
+
+    def cities(self, province: str) -> List[str]:
+        """获取指定省份的城市（已排序）"""
+        return sorted({c for p, c in self.region_names if p == province})
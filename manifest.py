@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+生成文件清单模块
+
+本模块使用SQLite记录每次生成任务及其产出的文件，
+下载、结果缓存和后台清理都通过清单查找文件，不需要扫描下载目录。
+
+表结构：
+- jobs: 生成任务（任务ID、缓存键、请求参数、号码数量、文件总大小、创建时间）
+- files: 生成文件（文件名、所属任务、分片序号、大小、号码数量、SHA-256、创建时间、最后访问时间、分组键）
+  分片序号为0表示完整文件，大于0表示拆分后的分片；按运营商、号段等分组导出时分组键为该组的名称
+
+说明：
+    清单文件保存在下载目录下（.manifest.db），与生成文件一一对应，
+    多进程部署时各工作进程共享同一个清单。
+    SQLite连接不能跨 fork() 使用：派生子进程时丢弃复制过来的连接，子进程首次访问时重新连接。
+
+作者：Phone Number Generator
+版本：1.0.0
+"""
+
+import os
+import json
+import time
+import sqlite3
+import weakref
+import threading
+from typing import Any, Dict, List, Optional
+
+
+# 清单文件名（以点开头，不会被文件索引当作生成文件）
+MANIFEST_FILENAME = '.manifest.db'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    cache_key TEXT,
+    params TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    total_size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_cache_key ON jobs(cache_key);
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    part INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    shard TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_files_job_id ON files(job_id);
+"""
+
+
+# 已打开的清单，派生子进程时逐个丢弃连接
+_instances: 'weakref.WeakSet[FileManifest]' = weakref.WeakSet()
+
+# 从父进程复制过来的连接：子进程中既不能使用也不能关闭
+# （关闭时会尝试检查点并删除WAL文件，破坏父进程和其他进程正在使用的清单），保留引用避免被回收时关闭
+_inherited_connections: List[sqlite3.Connection] = []
+
+
+def _after_fork_in_child() -> None:
+    """子进程中丢弃全部清单的连接和锁（派生时可能有其他线程正持有锁）"""
+    for manifest in list(_instances):
+        manifest._detach()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class FileManifest:
+    """
+    生成文件清单
+
+    所有操作共用一个连接并加锁，查询按主键或索引进行。
+    连接在首次使用时打开，派生的子进程使用自己的连接。
+    """
+
+    def __init__(self, path: str):
+        """
+        打开（或创建）清单
+
+        参数：
+            path: 清单数据库路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = self._open()
+        _instances.add(self)
+
+    def _open(self) -> sqlite3.Connection:
+        """打开连接并创建表结构"""
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(_SCHEMA)
+        # 旧版本创建的清单没有 shard 列和 completed 列（旧任务均视为已完成）
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(files)')}
+        if 'shard' not in columns:
+            conn.execute("ALTER TABLE files ADD COLUMN shard TEXT NOT NULL DEFAULT ''")
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+        if 'completed' not in columns:
+            conn.execute('ALTER TABLE jobs ADD COLUMN completed INTEGER NOT NULL DEFAULT 1')
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """当前进程的连接，派生后首次使用时重新打开（调用方需持有锁）"""
+        if self._db is None:
+            self._db = self._open()
+        return self._db
+
+    def _detach(self) -> None:
+        """丢弃从父进程复制的连接和锁，下次使用时重新连接（仅在派生的子进程中调用）"""
+        if self._db is not None:
+            _inherited_connections.append(self._db)
+            self._db = None
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        """关闭清单"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def create_job(self, job_id: str, params: Dict[str, Any], count: int) -> None:
+        """
+        创建生成任务记录
+        任务开始时创建，文件写完一个记录一个，全部完成后调用 complete_job()。
+        完成前任务的文件在 list_files() 中标记为 pending，清理时不会被淘汰。
+
+        参数：
+            job_id: 任务ID
+            params: 请求参数
+            count: 号码数量
+        """
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO jobs (job_id, cache_key, params, count, total_size, created, completed) '
+                'VALUES (?, NULL, ?, ?, 0, ?, 0)',
+                (job_id, json.dumps(params, ensure_ascii=False, sort_keys=True), count, time.time())
+            )
+
+    def add_file(self, job_id: str, item: Dict[str, Any]) -> None:
+        """
+        记录任务的一个文件，记录后即可下载
+
+        参数：
+            job_id: 任务ID
+            item: 文件信息，包含 name, part, size, count, sha256，以及可选的 shard
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO files (name, job_id, part, size, count, sha256, created, accessed, shard) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (item['name'], job_id, item['part'], item['size'], item['count'],
+                 item['sha256'], now, now, item.get('shard', ''))
+            )
+
+    def complete_job(self, job_id: str, cache_key: Optional[str] = None) -> None:
+        """
+        标记任务完成，汇总文件总大小并设置结果缓存键
+        未完成的任务不会作为缓存结果。任务失败时也应调用（cache_key 为None），
+        使已写入的文件可以正常清理。
+
+        参数：
+            job_id: 任务ID
+            cache_key: 结果缓存键，不参与缓存时为None
+        """
+        with self._lock:
+            self._conn.execute(
+                'UPDATE jobs SET cache_key = ?, completed = 1, total_size = '
+                '(SELECT COALESCE(SUM(size), 0) FROM files WHERE job_id = ?) WHERE job_id = ?',
+                (cache_key, job_id, job_id)
+            )
+
+    def get_file(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        按文件名查找文件
+
+        参数：
+            name: 文件名
+
+        返回：
+            Dict: 文件记录，不存在时返回None
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM files WHERE name = ?', (name,)).fetchone()
+        return dict(row) if row else None
+
+    def touch_file(self, name: str) -> None:
+        """
+        更新文件最后访问时间
+
+        参数：
+            name: 文件名
+        """
+        with self._lock:
+            self._conn.execute('UPDATE files SET accessed = ? WHERE name = ?', (time.time(), name))
+
+    def remove_file(self, name: str) -> None:
+        """
+        删除文件记录
+        任务缺少文件后不再作为缓存结果，文件全部删除后同时删除任务记录
+
+        参数：
+            name: 文件名
+        """
+        with self._lock:
+            with self._conn:
+                self._conn.execute('BEGIN')
+                row = self._conn.execute('SELECT job_id FROM files WHERE name = ?', (name,)).fetchone()
+                if row is None:
+                    return
+                self._conn.execute('DELETE FROM files WHERE name = ?', (name,))
+                self._conn.execute('UPDATE jobs SET cache_key = NULL WHERE job_id = ?', (row['job_id'],))
+                self._conn.execute(
+                    'DELETE FROM jobs WHERE job_id = ? AND NOT EXISTS '
+                    '(SELECT 1 FROM files WHERE job_id = ?)',
+                    (row['job_id'], row['job_id'])
+                )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取任务及其可下载的文件
+
+        任务被拆分时只返回分片，否则返回完整文件。
+
+        参数：
+            job_id: 任务ID
+
+        返回：
+            Dict: 任务记录（含 files 列表，按分片序号排列），不存在时返回None
+        """
+        with self._lock:
+            job = self._conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+            if job is None:
+                return None
+            rows = self._conn.execute(
+                'SELECT * FROM files WHERE job_id = ? ORDER BY part', (job_id,)
+            ).fetchall()
+        result = dict(job)
+        result['params'] = json.loads(result['params'])
+        parts = [dict(row) for row in rows if row['part'] > 0]
+        result['files'] = parts or [dict(row) for row in rows if row['part'] == 0]
+        return result
+
+    def find_cached_job(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        查找缓存键相同的最近一次任务
+
+        参数：
+            cache_key: 结果缓存键
+
+        返回：
+            Dict: 任务记录（同 get_job），不存在时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT job_id FROM jobs WHERE cache_key = ? ORDER BY created DESC LIMIT 1',
+                (cache_key,)
+            ).fetchone()
+        return self.get_job(row['job_id']) if row else None
+
+    def list_files(self) -> List[Dict[str, Any]]:
+        """
+        列出所有文件（启动时用于建立文件索引，清理前用于同步索引）
+
+        返回：
+            List[Dict]: 文件记录（name, size, created, accessed, pending），
+                pending 表示所属任务尚未完成
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT files.name, files.size, files.created, files.accessed, '
+                'COALESCE(jobs.completed, 1) = 0 AS pending '
+                'FROM files LEFT JOIN jobs ON jobs.job_id = files.job_id'
+            ).fetchall()
+        return [dict(row) for row in rows]
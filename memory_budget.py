@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+内存预算模块
+
+本模块负责限制号码生成占用的内存，避免多个大批量生成任务同时运行导致内存耗尽。
+
+功能说明：
+- MemoryBudget: 进程级内存预算，生成任务开始前申请额度，结束后归还；
+  可用额度不足最低要求时排队等待，超时后拒绝
+- 申请到的额度决定生成分块大小，额度越少分块越小
+- RssTracker: 记录任务执行期间进程常驻内存（RSS）的峰值
+
+说明：
+    额度按估算的号码字符串内存占用计算，不是精确的内存统计。
+    多进程部署时每个工作进程各自拥有一份预算。
+
+作者：Phone Number Generator
+版本：1.0.0
+"""
+
+import os
+import sys
+import time
+import threading
+from typing import Callable, Optional
+
+
+# 每个号码在内存中的估算占用（字节）
+# 11位字符串对象约60字节 + 列表指针8字节 + 写入缓冲约12字节，取整留余量
+BYTES_PER_NUMBER = 96
+
+# 最小分块大小：至少容纳一个区域码的全部号码（后4位 0000-9999）
+MIN_CHUNK_NUMBERS = 10000
+
+
+class MemoryBudgetExceeded(Exception):
+    """内存预算不足且等待超时"""
+
+
+class MemoryBudget:
+    """
+    进程级内存预算
+
+    使用条件变量管理已分配额度，额度上限每次申请时从回调读取，支持热重载。
+    """
+
+    def __init__(self, limit_getter: Callable[[], int]):
+        """
+        初始化内存预算
+
+        参数：
+            limit_getter: 返回当前预算上限（字节）的回调
+        """
+        self._limit_getter = limit_getter
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        """预算上限（字节）"""
+        return self._limit_getter()
+
+    @property
+    def in_use(self) -> int:
+        """已分配额度（字节）"""
+        return self._in_use
+
+    def acquire(self, desired: int, minimum: int, timeout: float) -> int:
+        """
+        申请额度
+
+        可用额度不少于 desired 时分配 desired；
+        介于 minimum 和 desired 之间时分配全部可用额度；
+        少于 minimum 时排队等待，直到其他任务归还额度或超时。
+
+        参数：
+            desired: 期望额度（字节）
+            minimum: 最低额度（字节）
+            timeout: 最长等待时间（秒）
+
+        返回：
+            int: 实际分配的额度（字节）
+
+        异常：
+            MemoryBudgetExceeded: 最低额度超过预算上限，或等待超时
+        """
+        minimum = min(minimum, desired)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                limit = self.limit
+                if minimum > limit:
+                    raise MemoryBudgetExceeded(
+                        f"任务所需内存 {minimum / (1024 * 1024):.1f} MB 超过预算上限 {limit / (1024 * 1024):.1f} MB"
+                    )
+                available = limit - self._in_use
+                if available >= minimum:
+                    granted = min(desired, available)
+                    self._in_use += granted
+                    return granted
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise MemoryBudgetExceeded("内存预算已用尽，请稍后重试")
+                self._cond.wait(remaining)
+
+    def release(self, amount: int) -> None:
+        """
+        归还额度
+
+        参数：
+            amount: 归还的额度（字节）
+        """
+        with self._cond:
+            self._in_use = max(0, self._in_use - amount)
+            self._cond.notify_all()
+
+
+def current_rss_bytes() -> Optional[int]:
+    """
+    获取当前进程的常驻内存（字节）
+
+    Linux上读取 /proc/self/statm，其他平台返回进程历史峰值，不支持时返回None。
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError, IndexError):
+        pass
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 单位为字节，Linux 单位为KB
+        return rss if sys.platform == 'darwin' else rss * 1024
+    except ImportError:
+        return None
+
+
+class RssTracker:
+    """
+    常驻内存峰值记录器
+
+    在任务执行过程中多次调用 sample()，记录观察到的最大RSS。
+    该值为整个进程的RSS，并发任务会相互影响。
+    """
+
+    def __init__(self):
+        self.peak = current_rss_bytes() or 0
+
+    def sample(self) -> None:
+        """采样一次当前RSS"""
+        rss = current_rss_bytes()
+        if rss and rss > self.peak:
+            self.peak = rss
+
+    @property
+    def peak_mb(self) -> float:
+        """峰值RSS（MB，保留1位小数）"""
+        return round(self.peak / (1024 * 1024), 1)
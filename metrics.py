@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+运行指标模块
+
+本模块提供计数器和直方图两类指标，以及用于计时的阶段跨度（span），
+并按Prometheus文本格式输出，供 /metrics 接口使用。
+
+功能说明：
+- Counter: 单调递增计数器，如生成号码总数、写入字节总数
+- Histogram: 直方图，如请求耗时、各阶段耗时、数据库查询耗时
+- Gauge: 仪表，输出时读取当前值，如下载目录占用空间
+- 支持标签（label），如 stage="generate"
+- 指标开关由 config.yaml 的 metrics.enabled 控制，关闭时记录操作直接返回
+
+说明：
+    多进程部署时每个工作进程独立统计，/metrics 返回处理该请求的进程的指标。
+
+作者：Phone Number Generator
+版本：1.0.0
+"""
+
+import time
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from config import config
+
+
+# 默认直方图分桶（秒），覆盖毫秒级查询到分钟级大批量生成
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: str = '') -> str:
+    """格式化标签为 {k="v",...}"""
+    parts = [f'{k}="{_escape(v)}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(value: str) -> str:
+    """转义标签值中的特殊字符"""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    """格式化数值，整数不带小数点"""
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class MetricsRegistry:
+    """
+    指标注册表
+
+    保存所有已注册的指标，负责输出Prometheus文本格式。
+
+    属性：
+        enabled: 是否启用指标统计
+    """
+
+    def __init__(self):
+        """
+        初始化注册表
+        """
+        self._metrics: List['_Metric'] = []
+        self._lock = threading.Lock()
+        self.enabled = bool(config.get('metrics.enabled', False))
+        config.add_reload_listener(self._on_config_reload)
+
+    def _on_config_reload(self, cfg) -> None:
+        """配置重新加载后同步开关"""
+        self.enabled = bool(cfg.get('metrics.enabled', False))
+
+    def register(self, metric: '_Metric') -> '_Metric':
+        """注册指标"""
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        输出所有指标
+
+        返回：
+            str: Prometheus文本格式（version 0.0.4）
+        """
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics)
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# 全局注册表
+registry = MetricsRegistry()
+
+
+class _Metric:
+    """指标基类"""
+
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}",
+                f"# TYPE {self.name} {self.metric_type}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """
+    计数器
+
+    单调递增，用于统计总量。
+    """
+
+    metric_type = 'counter'
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[Tuple[Tuple[str, str], ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """
+        增加计数
+
+        参数：
+            amount: 增加量
+            labels: 标签
+        """
+        if not registry.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """
+    仪表
+
+    表示可增可减的当前值，输出时调用回调读取，不需要在业务代码中维护。
+    """
+
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, value_getter: Callable[[], float]):
+        super().__init__(name, documentation)
+        self._value_getter = value_getter
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        try:
+            value = self._value_getter()
+        except Exception:
+            return lines
+        lines.append(f"{self.name} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """
+    直方图
+
+    统计观测值的分布，输出累计分桶计数、总和和次数。
+    """
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets))
+        # 每组标签对应 [各分桶计数..., 总和, 次数]
+        self._series: Dict[Tuple[Tuple[str, str], ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        记录观测值
+
+        参数：
+            value: 观测值
+            labels: 标签
+        """
+        if not registry.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def time(self, **labels: str) -> 'Span':
+        """
+        返回计时跨度，退出时记录耗时
+
+        示例：
+            >>> with stage_seconds.time(stage='generate'):
+            ...     generate()
+        """
+        if not registry.enabled:
+            return _NULL_SPAN
+        return Span(self, labels)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(labels, le)} {cumulative}")
+            count = series[-1]
+            inf_le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(labels, inf_le)} {_format_value(count)}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {_format_value(count)}")
+        return lines
+
+
+class Span:
+    """
+    计时跨度
+
+    作为上下文管理器使用，退出时将耗时记录到直方图。
+    """
+
+    __slots__ = ('_histogram', '_labels', '_start')
+
+    def __init__(self, histogram: Optional[Histogram], labels: Dict[str, str]):
+        self._histogram = histogram
+        self._labels = labels
+        self._start = 0.0
+
+    def __enter__(self) -> 'Span':
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._histogram.observe(time.perf_counter() - self._start, **self._labels)
+
+
+class _NullSpan:
+    """指标关闭时使用的空跨度，不做任何操作"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+号码模式筛选模块
+
+本模块负责把号码模式编译为位图，生成号码时按位图筛选，不逐个号码匹配。
+
+模式语法（空格和连字符会被忽略）：
+- 数字 0-9：该位必须是这个数字
+- * 或 ?：该位可以是任意数字
+- [...]：数字类，如 [0-5]、[13579]；以 ^ 开头表示排除，如 [^4]
+- 大写字母 A-Z：重复数字变量，同一字母表示相同数字，不同字母表示不同数字，
+  如 AABB、ABAB、AAAA
+模式长度（按位计算）：
+- 4位：匹配后4位，如 **88、AABB
+- 8位：匹配区域码和后4位，如 0000**88
+- 11位：匹配完整号码，如 1380000**88
+字母变量只在号段、区域码、后4位各段内部生效，同一字母不能出现在两段中。
+
+排除数字（如 "4"）作用于区域码和后4位，即号码后8位都不包含这些数字。
+
+编译结果：
+- 后4位位图（0000-9999 共10000位），生成时用 itertools.compress 一次筛出允许的后4位，
+  每个区域码直接拼接，与不加条件的生成开销相同
+- 区域码位图，查询出区域码后一次过滤
+- 号段位图，号段与模式不符时结果为空
+
+作者：Phone Number Generator
+版本：1.0.0
+"""
+
+import string
+from functools import lru_cache
+from itertools import compress, product
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+
+# 全部后4位（0000-9999），按位图筛选时使用
+ALL_TAILS = [str(tail).zfill(4) for tail in range(10000)]
+
+# 模式最大长度（字符数，含数字类和分隔符）
+MAX_PATTERN_LENGTH = 64
+
+_DIGITS: FrozenSet[str] = frozenset(string.digits)
+
+# 各段的位数：号段、区域码、后4位
+_SEGMENT_WIDTHS = (3, 4, 4)
+
+
+class PatternError(ValueError):
+    """号码模式语法错误"""
+
+
+def _parse_class(pattern: str, start: int) -> Tuple[FrozenSet[str], int]:
+    """解析数字类 [...]，返回 (允许的数字, 结束位置)"""
+    end = pattern.find(']', start)
+    if end < 0:
+        raise PatternError(f"号码模式中的数字类缺少 ]：{pattern}")
+    body = pattern[start + 1:end]
+    negate = body.startswith('^')
+    if negate:
+        body = body[1:]
+    digits = set()
+    i = 0
+    while i < len(body):
+        ch = body[i]
+        if ch not in _DIGITS:
+            raise PatternError(f"数字类只能包含数字和范围：[{pattern[start + 1:end]}]")
+        if i + 2 < len(body) and body[i + 1] == '-':
+            last = body[i + 2]
+            if last not in _DIGITS or last < ch:
+                raise PatternError(f"数字类范围无效：{ch}-{last}")
+            digits.update(str(d) for d in range(int(ch), int(last) + 1))
+            i += 3
+        else:
+            digits.add(ch)
+            i += 1
+    allowed = _DIGITS - digits if negate else frozenset(digits)
+    # 空数字类和排除全部数字的数字类都不匹配任何号码
+    if not digits or not allowed:
+        raise PatternError(f"数字类不能为空：{pattern[start:end + 1]}")
+    return frozenset(allowed), end + 1
+
+
+def _tokenize(pattern: str) -> List[Tuple[FrozenSet[str], Optional[str]]]:
+    """
+    将模式拆分为逐位的约束
+
+    返回：
+        List[Tuple[FrozenSet[str], Optional[str]]]: 每位的 (允许的数字, 变量字母)
+    """
+    tokens: List[Tuple[FrozenSet[str], Optional[str]]] = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch in ' -':
+            i += 1
+        elif ch in _DIGITS:
+            tokens.append((frozenset(ch), None))
+            i += 1
+        elif ch in '*?':
+            tokens.append((_DIGITS, None))
+            i += 1
+        elif ch == '[':
+            digits, i = _parse_class(pattern, i)
+            tokens.append((digits, None))
+        elif ch in string.ascii_uppercase:
+            tokens.append((_DIGITS, ch))
+            i += 1
+        else:
+            raise PatternError(f"号码模式包含无效字符：{ch}")
+    return tokens
+
+
+def _segment_bitmap(tokens: List[Tuple[FrozenSet[str], Optional[str]]],
+                    excluded: FrozenSet[str] = frozenset()) -> bytes:
+    """
+    编译一段模式为位图
+
+    参数：
+        tokens: 该段逐位的约束
+        excluded: 排除的数字
+
+    返回：
+        bytes: 长度为 10^位数 的位图，允许的值对应字节为1
+    """
+    width = len(tokens)
+    bitmap = bytearray(10 ** width)
+    choices = [sorted(digits - excluded) for digits, _ in tokens]
+    letters = [letter for _, letter in tokens]
+    has_vars = any(letters)
+    for digits in product(*choices):
+        if has_vars:
+            bound: Dict[str, str] = {}
+            ok = True
+            for letter, digit in zip(letters, digits):
+                if letter is None:
+                    continue
+                if bound.setdefault(letter, digit) != digit:
+                    ok = False
+                    break
+            # 不同字母必须对应不同数字
+            if not ok or len(set(bound.values())) != len(bound):
+                continue
+        bitmap[int(''.join(digits))] = 1
+    return bytes(bitmap)
+
+
+class NumberPattern:
+    """
+    编译后的号码筛选条件
+
+    属性：
+        prefix_bitmap: 号段位图（000-999），None表示不限
+        location_bitmap: 区域码位图（0000-9999），None表示不限
+        tail_bitmap: 后4位位图（0000-9999）
+        tails: 允许的后4位（升序）
+    """
+
+    __slots__ = ('prefix_bitmap', 'location_bitmap', 'tail_bitmap', 'tails')
+
+    def __init__(self, prefix_bitmap: Optional[bytes], location_bitmap: Optional[bytes],
+                 tail_bitmap: bytes):
+        self.prefix_bitmap = prefix_bitmap
+        self.location_bitmap = location_bitmap
+        self.tail_bitmap = tail_bitmap
+        self.tails: List[str] = list(compress(ALL_TAILS, tail_bitmap))
+
+    @property
+    def tail_count(self) -> int:
+        """每个区域码允许的后4位数量"""
+        return len(self.tails)
+
+    def allows_prefix(self, prefix: str) -> bool:
+        """
+        检查号段是否符合模式
+
+        参数：
+            prefix: 3位号段
+
+        返回：
+            bool: 符合返回True
+        """
+        if self.prefix_bitmap is None:
+            return True
+        return prefix.isdigit() and len(prefix) == 3 and bool(self.prefix_bitmap[int(prefix)])
+
+    def filter_locations(self, suffixes: Iterable[str]) -> List[str]:
+        """
+        过滤区域码
+
+        参数：
+            suffixes: 区域码列表
+
+        返回：
+            List[str]: 符合模式的区域码，保持原顺序
+        """
+        if self.location_bitmap is None:
+            return list(suffixes)
+        bitmap = self.location_bitmap
+        return [suffix for suffix in suffixes if bitmap[int(suffix)]]
+
+    def filter_areas(self, areas: Iterable[str]) -> List[str]:
+        """
+        过滤7位区域（号段 + 区域码）
+
+        参数：
+            areas: 7位区域列表
+
+        返回：
+            List[str]: 号段和区域码都符合模式的区域，保持原顺序
+        """
+        prefix_bitmap, location_bitmap = self.prefix_bitmap, self.location_bitmap
+        return [area for area in areas
+                if (prefix_bitmap is None or prefix_bitmap[int(area[:3])])
+                and (location_bitmap is None or location_bitmap[int(area[3:])])]
+
+
+@lru_cache(maxsize=256)
+def compile_pattern(pattern: str = None, exclude_digits: str = None,
+                    suffix_4: str = None, suffix_3: str = None) -> NumberPattern:
+    """
+    编译号码筛选条件
+
+    号码模式、排除数字和后3/4位精确匹配同时给出时取交集。
+    相同条件的编译结果会被缓存。
+
+    参数：
+        pattern: 号码模式（4位、8位或11位）
+        exclude_digits: 排除的数字，如 "4"、"47"
+        suffix_4: 后4位（精确匹配）
+        suffix_3: 后3位（精确匹配）
+
+    返回：
+        NumberPattern: 编译后的筛选条件
+
+    异常：
+        PatternError: 模式语法错误
+    """
+    excluded = frozenset(exclude_digits or '')
+    if not excluded <= _DIGITS:
+        raise PatternError("排除数字只能包含0-9")
+    if len(excluded) == len(_DIGITS):
+        raise PatternError("不能排除全部数字")
+
+    segments: List[Optional[List[Tuple[FrozenSet[str], Optional[str]]]]] = [None, None, None]
+    if pattern:
+        if len(pattern) > MAX_PATTERN_LENGTH:
+            raise PatternError(f"号码模式不能超过{MAX_PATTERN_LENGTH}个字符")
+        tokens = _tokenize(pattern)
+        if len(tokens) not in (4, 8, 11):
+            raise PatternError(f"号码模式必须为4位、8位或11位，当前为{len(tokens)}位")
+        # 从后往前依次对应后4位、区域码、号段
+        end = len(tokens)
+        for index in (2, 1, 0):
+            width = _SEGMENT_WIDTHS[index]
+            if end >= width:
+                segments[index] = tokens[end - width:end]
+                end -= width
+        seen: Dict[str, int] = {}
+        for index, segment in enumerate(segments):
+            for _, letter in segment or ():
+                if letter is not None and seen.setdefault(letter, index) != index:
+                    raise PatternError(f"字母变量 {letter} 不能同时用于号段、区域码和后4位中的两段")
+
+    prefix_bitmap = _segment_bitmap(segments[0]) if segments[0] else None
+    location_tokens = segments[1] or ([(_DIGITS, None)] * 4 if excluded else None)
+    location_bitmap = _segment_bitmap(location_tokens, excluded) if location_tokens else None
+    tail_bitmap = _segment_bitmap(segments[2] or [(_DIGITS, None)] * 4, excluded)
+
+    if suffix_4:
+        keep = int(suffix_4)
+        tail_bitmap = bytes(bit if tail == keep else 0 for tail, bit in enumerate(tail_bitmap))
+    elif suffix_3:
+        keep = int(suffix_3)
+        tail_bitmap = bytes(bit if tail % 1000 == keep else 0 for tail, bit in enumerate(tail_bitmap))
+
+    return NumberPattern(prefix_bitmap, location_bitmap, tail_bitmap)
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+请求性能剖析模块
+
+本模块用于在生产环境中按需采集单个请求的CPU剖析数据，
+无需重新部署即可定位耗时较长的查询条件。
+
+每个被剖析的请求会生成两个文件：
+- {名称}.prof: cProfile统计数据，可用 python -m pstats 或 snakeviz 查看
+- {名称}.collapsed: 采样得到的折叠调用栈，每行格式为“栈;帧 次数”，
+  可直接交给 flamegraph.pl 或 speedscope 生成火焰图
+
+作者：Phone Number Generator
+版本：1.0.0
+"""
+
+import os
+import sys
+import time
+import uuid
+import cProfile
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+# 剖析文件扩展名
+PROFILE_EXTENSIONS = ('.prof', '.collapsed')
+
+
+class StackSampler:
+    """
+    调用栈采样器
+
+    后台线程按固定间隔读取目标线程的当前栈帧，统计折叠调用栈出现次数。
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        """
+        初始化采样器
+
+        参数：
+            thread_id: 被采样线程的标识
+            interval: 采样间隔（秒）
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self) -> None:
+        """开始采样"""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止采样并等待线程退出"""
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack = ';'.join(reversed(names))
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def collapsed(self) -> str:
+        """返回折叠调用栈文本"""
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+class RequestProfiler:
+    """
+    单个请求的剖析器
+
+    同时运行cProfile（精确调用统计）和调用栈采样（火焰图）。
+    必须在处理请求的线程中调用 start() 和 stop()。
+    """
+
+    def __init__(self, label: str, sample_interval: float = 0.005):
+        """
+        初始化剖析器
+
+        参数：
+            label: 剖析标签，通常为路由名称
+            sample_interval: 调用栈采样间隔（秒）
+        """
+        self.label = label
+        self.started_at = 0.0
+        self._profile = cProfile.Profile()
+        self._sampler = StackSampler(threading.get_ident(), sample_interval)
+
+    def start(self) -> bool:
+        """
+        开始剖析
+
+        返回：
+            bool: 成功开始返回True；当前线程已有其他剖析工具运行时返回False
+        """
+        self.started_at = time.time()
+        try:
+            self._profile.enable()
+        except ValueError:
+            return False
+        self._sampler.start()
+        return True
+
+    def stop(self, output_dir: str) -> str:
+        """
+        停止剖析并写出文件
+
+        参数：
+            output_dir: 输出目录
+
+        返回：
+            str: 剖析文件名（不含扩展名）
+        """
+        self._profile.disable()
+        self._sampler.stop()
+        os.makedirs(output_dir, exist_ok=True)
+
+        timestamp = datetime.fromtimestamp(self.started_at).strftime('%Y%m%d_%H%M%S')
+        name = f"{timestamp}_{self.label}_{uuid.uuid4().hex[:8]}"
+        self._profile.dump_stats(os.path.join(output_dir, name + '.prof'))
+        with open(os.path.join(output_dir, name + '.collapsed'), 'w', encoding='utf-8') as f:
+            f.write(self._sampler.collapsed())
+        return name
+
+
+def list_profiles(output_dir: str) -> List[Dict[str, Any]]:
+    """
+    列出剖析文件
+
+    参数：
+        output_dir: 剖析文件目录
+
+    返回：
+        List[Dict]: 剖析文件信息，按创建时间倒序
+    """
+    if not os.path.isdir(output_dir):
+        return []
+    profiles = []
+    for entry in os.scandir(output_dir):
+        if entry.is_file() and entry.name.endswith(PROFILE_EXTENSIONS):
+            st = entry.stat()
+            profiles.append({
+                'name': entry.name,
+                'size': st.st_size,
+                'created': datetime.fromtimestamp(st.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+                'mtime': st.st_mtime
+            })
+    profiles.sort(key=lambda item: item['mtime'], reverse=True)
+    for item in profiles:
+        del item['mtime']
+    return profiles
+
+
+def prune_profiles(output_dir: str, max_profiles: int) -> int:
+    """
+    删除旧的剖析文件，只保留最近的 max_profiles 组
+
+    参数：
+        output_dir: 剖析文件目录
+        max_profiles: 保留的剖析组数（每组包含 .prof 和 .collapsed）
+
+    返回：
+        int: 删除的文件数量
+    """
+    profiles = list_profiles(output_dir)
+    keep = max_profiles * len(PROFILE_EXTENSIONS)
+    deleted = 0
+    for item in profiles[keep:]:
+        try:
+            os.remove(os.path.join(output_dir, item['name']))
+            deleted += 1
+        except OSError:
+            pass
+    return deleted
+
+
+def get_profile_dir(download_dir: str, sub_dir: Optional[str] = None) -> str:
+    """获取剖析文件目录（位于下载目录下）"""
+    return os.path.join(download_dir, sub_dir or 'profiles')
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+地区集合运算模块
+
+本模块负责把地区、运营商、号段的集合运算表达式编译为一次查询，
+支持并集、交集和差集，如“广东除深圳外的移动和电信号码”：
+
+    {"difference": [
+        {"province": "广东", "operators": [1, 3]},
+        {"province": "广东", "city": "深圳"}
+    ]}
+
+表达式语法（JSON）：
+- 条件：{"province": ..., "city": ..., "operators": [...], "prefixes": [...]}
+  各字段均可省略（至少给出一个），给出的字段同时满足；填写 city 时必须同时填写 province
+- {"union": [表达式, ...]}：并集
+- {"intersect": [表达式, ...]}：交集
+- {"difference": [表达式, 表达式, ...]}：差集，第一个表达式去掉其余表达式
+
+编译结果：
+- SQL条件：整棵表达式合成一个 WHERE 子句，由SQLite一次查询出全部区域（前7位），
+  结果按号码升序排列
+- 内存判断函数：按 (省份, 城市, 运营商, 号段) 判断记录是否命中，供快照按键列顺序扫描一遍使用
+- 候选号段：表达式能命中的号段集合，扫描快照时只定位这些号段的范围
+
+作者：Phone Number Generator
+版本：1.0.0
+"""
+
+import json
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+
+# 表达式最多包含的节点数（限制生成的SQL长度）
+MAX_NODES = 64
+
+# 表达式最大嵌套深度
+MAX_DEPTH = 8
+
+# 有效的运营商编码
+VALID_OPERATORS = (1, 2, 3, 4, 5)
+
+_LEAF_FIELDS = ('province', 'city', 'operators', 'prefixes')
+_SET_OPERATIONS = ('union', 'intersect', 'difference')
+
+# 判断函数：(省份, 城市, 运营商, 号段) → 是否命中
+Matcher = Callable[[str, str, int, str], bool]
+
+
+class RegionQueryError(ValueError):
+    """集合运算表达式无效"""
+
+
+class RegionQuery:
+    """
+    编译后的集合运算表达式
+
+    属性：
+        text: 规范化的表达式文本（键排序的JSON），相同含义的表达式文本相同，可用作缓存键
+        where: SQL条件（phone_location 表）
+        params: SQL参数
+        prefixes: 可能命中的号段（升序），None表示不限
+    """
+
+    __slots__ = ('text', 'where', 'params', 'prefixes', '_matcher')
+
+    def __init__(self, text: str, where: str, params: Tuple[Any, ...],
+                 prefixes: Optional[FrozenSet[str]], matcher: Matcher):
+        self.text = text
+        self.where = where
+        self.params = params
+        self.prefixes: Optional[List[str]] = sorted(prefixes) if prefixes is not None else None
+        self._matcher = matcher
+
+    def matches(self, province: str, city: str, operator: int, prefix: str) -> bool:
+        """
+        判断一条归属地记录是否命中
+
+        参数：
+            province: 省份
+            city: 城市
+            operator: 运营商
+            prefix: 号段
+
+        返回：
+            bool: 命中返回True
+        """
+        return self._matcher(province, city, operator, prefix)
+
+
+def _normalize(node: Any, depth: int, counter: List[int]) -> Dict[str, Any]:
+    """校验表达式并规范化（去掉首尾空白、列表去重排序）"""
+    counter[0] += 1
+    if counter[0] > MAX_NODES:
+        raise RegionQueryError(f"集合运算表达式最多包含{MAX_NODES}个条件")
+    if depth > MAX_DEPTH:
+        raise RegionQueryError(f"集合运算表达式嵌套不能超过{MAX_DEPTH}层")
+    if not isinstance(node, dict) or not node:
+        raise RegionQueryError("集合运算表达式的每一项必须为非空对象")
+
+    operations = [key for key in node if key in _SET_OPERATIONS]
+    if operations:
+        if len(node) != 1:
+            raise RegionQueryError(f"集合运算 {operations[0]} 不能与其他字段写在同一项中")
+        operation = operations[0]
+        children = node[operation]
+        if not isinstance(children, list) or not children:
+            raise RegionQueryError(f"集合运算 {operation} 必须为非空列表")
+        if operation == 'difference' and len(children) < 2:
+            raise RegionQueryError("差集 difference 至少需要两个表达式")
+        return {operation: [_normalize(child, depth + 1, counter) for child in children]}
+
+    unknown = [key for key in node if key not in _LEAF_FIELDS]
+    if unknown:
+        raise RegionQueryError(f"集合运算表达式包含未知字段：{unknown[0]}")
+
+    leaf: Dict[str, Any] = {}
+    for key in ('province', 'city'):
+        if key in node:
+            value = node[key]
+            if not isinstance(value, str) or not value.strip():
+                raise RegionQueryError(f"{key} 必须为非空字符串")
+            leaf[key] = value.strip()
+    if 'city' in leaf and 'province' not in leaf:
+        raise RegionQueryError("填写 city 时必须同时填写 province")
+
+    if 'operators' in node:
+        operators = node['operators']
+        if not isinstance(operators, list) or not operators:
+            raise RegionQueryError("operators 必须为非空列表")
+        for op in operators:
+            if isinstance(op, bool) or op not in VALID_OPERATORS:
+                raise RegionQueryError(f"无效的运营商类型：{op}")
+        leaf['operators'] = sorted(set(operators))
+
+    if 'prefixes' in node:
+        prefixes = node['prefixes']
+        if not isinstance(prefixes, list) or not prefixes:
+            raise RegionQueryError("prefixes 必须为非空列表")
+        for prefix in prefixes:
+            if not isinstance(prefix, str) or len(prefix) != 3 or not prefix.isdigit():
+                raise RegionQueryError(f"号段必须为3位数字：{prefix}")
+        leaf['prefixes'] = sorted(set(prefixes))
+
+    if not leaf:
+        raise RegionQueryError("条件至少需要 province、operators、prefixes 之一")
+    return leaf
+
+
+def _compile(node: Dict[str, Any]) -> Tuple[str, List[Any], Optional[FrozenSet[str]], Matcher]:
+    """编译规范化后的表达式，返回 (SQL条件, 参数, 候选号段, 判断函数)"""
+    if 'union' in node or 'intersect' in node or 'difference' in node:
+        operation = next(iter(node))
+        parts = [_compile(child) for child in node[operation]]
+        params: List[Any] = [param for part in parts for param in part[1]]
+        matchers = [part[3] for part in parts]
+
+        if operation == 'union':
+            where = '(' + ' OR '.join(part[0] for part in parts) + ')'
+            candidates = [part[2] for part in parts]
+            prefixes = None if any(c is None for c in candidates) else frozenset().union(*candidates)
+            return where, params, prefixes, lambda *record: any(m(*record) for m in matchers)
+
+        if operation == 'intersect':
+            where = '(' + ' AND '.join(part[0] for part in parts) + ')'
+            known = [part[2] for part in parts if part[2] is not None]
+            prefixes = frozenset.intersection(*known) if known else None
+            return where, params, prefixes, lambda *record: all(m(*record) for m in matchers)
+
+        first, rest = matchers[0], matchers[1:]
+        where = '(' + parts[0][0] + ''.join(f' AND NOT {part[0]}' for part in parts[1:]) + ')'
+        return (where, params, parts[0][2],
+                lambda *record: first(*record) and not any(m(*record) for m in rest))
+
+    conditions: List[str] = []
+    params = []
+    province = node.get('province')
+    city = node.get('city')
+    operators = frozenset(node['operators']) if 'operators' in node else None
+    prefixes = frozenset(node['prefixes']) if 'prefixes' in node else None
+    if province is not None:
+        conditions.append('province = ?')
+        params.append(province)
+    if city is not None:
+        conditions.append('city = ?')
+        params.append(city)
+    if operators is not None:
+        conditions.append(f"operator IN ({','.join(['?'] * len(operators))})")
+        params.extend(sorted(operators))
+    if prefixes is not None:
+        conditions.append(f"prefix IN ({','.join(['?'] * len(prefixes))})")
+        params.extend(sorted(prefixes))
+
+    def matcher(record_province: str, record_city: str, operator: int, prefix: str) -> bool:
+        return ((province is None or record_province == province)
+                and (city is None or record_city == city)
+                and (operators is None or operator in operators)
+                and (prefixes is None or prefix in prefixes))
+
+    return '(' + ' AND '.join(conditions) + ')', params, prefixes, matcher
+
+
+def compile_region_query(expression: Any) -> RegionQuery:
+    """
+    编译集合运算表达式
+
+    参数：
+        expression: 表达式（dict，或JSON文本）
+
+    返回：
+        RegionQuery: 编译后的表达式
+
+    异常：
+        RegionQueryError: 表达式无效
+    """
+    if isinstance(expression, str):
+        try:
+            expression = json.loads(expression)
+        except ValueError:
+            raise RegionQueryError("集合运算表达式不是有效的JSON")
+    node = _normalize(expression, 1, [0])
+    where, params, prefixes, matcher = _compile(node)
+    text = json.dumps(node, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return RegionQuery(text, where, tuple(params), prefixes, matcher)
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+生产环境服务器模块
+
+本模块负责以多进程/多线程方式运行Flask应用，替代Flask自带的开发服务器。
+服务器参数从config.yaml的server段读取，可被命令行参数覆盖。
+
+支持的后端（按 backend: auto 时的优先顺序）：
+- gunicorn：多进程 + 线程工作模式，仅支持类Unix系统
+- waitress：单进程多线程，支持Windows
+- werkzeug：未安装以上服务器时的回退方案，单进程多线程
+
+预加载：
+    应用在主进程中创建（gunicorn 始终以 preload_app 方式运行），
+    主进程在派生工作进程之前完成数据库检查并映射二进制快照，
+    工作进程通过写时复制共享这些对象，映射的数据页由页缓存共享。
+
+作者：Phone Number Generator
+版本：1.0.0
+"""
+
+import os
+import logging
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from config import config
+
+
+# 支持的服务器后端
+BACKENDS = ('auto', 'gunicorn', 'waitress', 'werkzeug')
+
+# 各后端不支持的参数，启动时打印警告，不计入启动日志
+# waitress：单进程；空闲的保持连接与其他连接一样由 timeout（channel_timeout）关闭
+# werkzeug：单进程，每个请求一个线程，不支持超时和保持连接
+IGNORED_OPTIONS = {
+    'gunicorn': (),
+    'waitress': ('workers', 'keepalive'),
+    'werkzeug': ('workers', 'threads', 'keepalive', 'timeout'),
+}
+
+# 以秒为单位的参数
+_SECONDS_OPTIONS = ('keepalive', 'timeout')
+
+
+def get_server_options(overrides: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    获取服务器参数
+
+    合并config.yaml中的server段和命令行覆盖值。
+    workers 为0时根据CPU核数自动计算。
+
+    参数：
+        overrides: 覆盖值字典，值为None的项会被忽略
+
+    返回：
+        Dict[str, Any]: 服务器参数
+    """
+    options = {
+        'host': config.app.get('host', '0.0.0.0'),
+        'port': config.app.get('port', 5000),
+        'backend': config.get('server.backend', 'auto'),
+        'workers': config.get('server.workers', 0),
+        'threads': config.get('server.threads', 4),
+        'keepalive': config.get('server.keepalive', 5),
+        'timeout': config.get('server.timeout', 300),
+    }
+    for key, value in (overrides or {}).items():
+        if value is not None:
+            options[key] = value
+
+    if not options['workers'] or options['workers'] <= 0:
+        # 号码生成是CPU密集型任务，工作进程数与CPU核数一致
+        options['workers'] = os.cpu_count() or 1
+    if options['backend'] not in BACKENDS:
+        raise ValueError(f"不支持的服务器后端：{options['backend']}")
+    return options
+
+
+def resolve_backend(backend: str) -> str:
+    """
+    确定实际使用的服务器后端
+
+    参数：
+        backend: 配置的后端名称，auto 表示自动选择
+
+    返回：
+        str: 可用的后端名称
+    """
+    if backend != 'auto':
+        return backend
+    if os.name != 'nt':
+        try:
+            import gunicorn  # noqa: F401
+            return 'gunicorn'
+        except ImportError:
+            pass
+    try:
+        import waitress  # noqa: F401
+        return 'waitress'
+    except ImportError:
+        return 'werkzeug'
+
+
+def _run_gunicorn(app, options: Dict[str, Any], post_fork: Optional[Callable[[], None]]) -> None:
+    """使用gunicorn运行应用"""
+    from gunicorn.app.base import BaseApplication
+
+    class StandaloneApplication(BaseApplication):
+        """将主进程中已创建的Flask应用交给gunicorn运行（工作进程派生后直接使用）"""
+
+        def __init__(self, application, settings: Dict[str, Any]):
+            self.application = application
+            self.settings = settings
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.settings.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    settings = {
+        'bind': f"{options['host']}:{options['port']}",
+        'workers': options['workers'],
+        'threads': options['threads'],
+        'worker_class': 'gthread' if options['threads'] > 1 else 'sync',
+        'keepalive': options['keepalive'],
+        'timeout': options['timeout'],
+        'graceful_timeout': options['timeout'],
+        # 应用对象已在主进程中创建，工作进程不会重新导入
+        'preload_app': True,
+    }
+    if post_fork is not None:
+        settings['post_fork'] = lambda server, worker: post_fork()
+    StandaloneApplication(app, settings).run()
+
+
+def _run_waitress(app, options: Dict[str, Any]) -> None:
+    """使用waitress运行应用"""
+    from waitress import serve as waitress_serve
+    waitress_serve(
+        app,
+        host=options['host'],
+        port=options['port'],
+        threads=options['threads'],
+        channel_timeout=options['timeout'],
+    )
+
+
+def _run_werkzeug(app, options: Dict[str, Any]) -> None:
+    """使用werkzeug多线程服务器运行应用"""
+    from werkzeug.serving import run_simple
+    logging.warning("未安装 gunicorn 或 waitress，使用 werkzeug 多线程服务器运行")
+    run_simple(options['host'], options['port'], app, threaded=True)
+
+
+def _format_options(options: Dict[str, Any], names: Iterable[str]) -> str:
+    """格式化参数，如 workers=4, timeout=300s"""
+    return ', '.join(f"{name}={options[name]}{'s' if name in _SECONDS_OPTIONS else ''}" for name in names)
+
+
+def serve(app, options: Dict[str, Any], post_fork: Optional[Callable[[], None]] = None) -> None:
+    """
+    运行生产环境服务器
+
+    启动日志只列出后端实际使用的参数，后端不支持的参数（见 IGNORED_OPTIONS）打印警告。
+    workers 为1时单进程后端不算忽略。
+
+    参数：
+        app: Flask应用实例
+        options: 服务器参数，见 get_server_options()
+        post_fork: 工作进程派生后在子进程中执行的回调（仅gunicorn）
+    """
+    backend = resolve_backend(options['backend'])
+    names = ('workers', 'threads', 'keepalive', 'timeout')
+    ignored = [name for name in IGNORED_OPTIONS[backend]
+               if not (name == 'workers' and options['workers'] <= 1)]
+    applied = [name for name in names if name not in IGNORED_OPTIONS[backend]]
+    logging.info(f"生产服务器启动：{_format_options(dict(options, backend=backend), ['backend'] + applied)}")
+    if ignored:
+        logging.warning(f"{backend} 不支持以下参数，已忽略：{_format_options(options, ignored)}")
+    if backend == 'gunicorn':
+        _run_gunicorn(app, options, post_fork)
+    elif backend == 'waitress':
+        _run_waitress(app, options)
+    else:
+        _run_werkzeug(app, options)
@@ -5,7 +5,7 @@
  * 可以在所有页面中引入使用。
  * 
  * 功能模块：
- * 1. API请求封装
+ * 1. API请求封装（省市目录接口由页面内嵌的目录在本地响应）
  * 2. 表单验证工具
  * 3. DOM操作工具
  * 4. 格式化工具
@@ -16,6 +16,86 @@
  */
 
 
+/**
+ * 省市目录模块
+ * 页面渲染时嵌入全部省份、城市及可用号段（id为catalogData的JSON脚本），
+ * 选择省份和城市时直接读取，不再请求接口
+ */
+const Catalog = {
+    _data: undefined,
+    
+    /**
+     * 读取页面内嵌的目录
+     * @returns {object|null} 目录 {version, provinces: {省份: {城市: [号段]}}}，页面未嵌入时返回null
+     */
+    load: function() {
+        if (this._data === undefined) {
+            const element = document.getElementById('catalogData');
+            try {
+                this._data = element ? JSON.parse(element.textContent) : null;
+            } catch (error) {
+                console.error('解析省市目录失败：', error);
+                this._data = null;
+            }
+        }
+        return this._data;
+    },
+    
+    /**
+     * 获取省份列表
+     * @returns {Array|null} 省份列表
+     */
+    provinces: function() {
+        const data = this.load();
+        return data ? Object.keys(data.provinces) : null;
+    },
+    
+    /**
+     * 获取省份下的城市列表
+     * @param {string} province - 省份
+     * @returns {Array|null} 城市列表
+     */
+    cities: function(province) {
+        const data = this.load();
+        return data ? Object.keys(data.provinces[province] || {}) : null;
+    },
+    
+    /**
+     * 获取城市可用的号段
+     * @param {string} province - 省份
+     * @param {string} city - 城市
+     * @returns {Array|null} 号段列表
+     */
+    prefixes: function(province, city) {
+        const data = this.load();
+        return data ? ((data.provinces[province] || {})[city] || []) : null;
+    },
+    
+    /**
+     * 在本地响应省市接口请求
+     * @param {string} pathname - 请求路径
+     * @returns {object|null} 与接口相同格式的响应，无法本地响应时返回null
+     */
+    resolve: function(pathname) {
+        const data = this.load();
+        if (!data) {
+            return null;
+        }
+        if (pathname === '/api/provinces') {
+            return { code: 200, data: this.provinces() };
+        }
+        if (pathname === '/api/catalog') {
+            return { code: 200, data: data };
+        }
+        const match = pathname.match(/^\/api\/cities\/([^/]+)$/);
+        if (match) {
+            return { code: 200, data: this.cities(decodeURIComponent(match[1])) };
+        }
+        return null;
+    }
+};
+
+
 /**
  * API请求模块
  * 封装常用的HTTP请求方法
@@ -23,11 +103,17 @@
 const API = {
     /**
      * 发送GET请求
+     * 省市目录相关请求由页面内嵌的目录直接响应
      * @param {string} url - 请求URL
      * @param {object} params - URL参数对象
      * @returns {Promise} 请求Promise
      */
     get: function(url, params = {}) {
+        const local = Catalog.resolve(new URL(url, window.location.origin).pathname);
+        if (local) {
+            return Promise.resolve(local);
+        }
+        
         // 构建URL参数
         const urlObj = new URL(url, window.location.origin);
         Object.keys(params).forEach(key => {
@@ -663,6 +749,7 @@ const Utils = {
 
 // 导出工具到全局
 window.API = API;
+window.Catalog = Catalog;
 window.Validator = Validator;
 window.DOM = DOM;
 window.Format = Format;
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共配置
+
+项目模块位于仓库根目录，测试从根目录导入。
+导入 app 时使用延迟初始化模式，不创建数据库管理器、日志处理器和下载目录。
+"""
+
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+os.environ.setdefault('LAZY_INIT', 'true')
+
+
+class FakeDatabase:
+    """
+    号码归属地数据库的替身，只提供号码生成用到的查询
+
+    locations: 区域码列表，所有区域码属于同一城市
+    operators: 前7位号码（整数）→ 运营商编码，反查归属地时使用
+    """
+
+    def __init__(self, locations, operators=None):
+        self.locations = list(locations)
+        self.operators = dict(operators or {})
+
+    def data_version(self):
+        return 'test'
+
+    def query_phone_locations(self, prefix, province, city, operators=None):
+        return [{'suffix': suffix} for suffix in self.locations]
+
+    def lookup_areas(self, areas):
+        return {area: ('广东', '深圳', self.operators[area]) for area in areas if area in self.operators}
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""生成任务准入控制测试"""
+
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+def make_controller(**overrides):
+    settings = {'max_concurrent_jobs': 1, 'max_queued_jobs': 8, 'max_queued_per_user': 4,
+                'admission_timeout': 5}
+    settings.update(overrides)
+    return AdmissionController(lambda: settings)
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, '等待超时'
+        time.sleep(0.005)
+
+
+class Queue:
+    """在后台线程中排队申请槽位，按获得槽位的顺序记录任务名"""
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.order = []
+        self.errors = []
+        self.threads = []
+
+    def submit(self, name, user, cost):
+        def run():
+            try:
+                with self.controller.admit(user, cost):
+                    self.order.append(name)
+            except AdmissionRejected as e:
+                self.errors.append((name, e))
+
+        queued = self.controller.queued
+        thread = threading.Thread(target=run)
+        thread.start()
+        self.threads.append(thread)
+        # 逐个入队，保证提交顺序确定
+        wait_until(lambda: self.controller.queued == queued + 1)
+
+    def join(self):
+        for thread in self.threads:
+            thread.join(5)
+
+
+def test_admits_immediately_when_slot_free():
+    controller = make_controller(max_concurrent_jobs=2)
+    with controller.admit('a', 100), controller.admit('b', 100):
+        assert controller.running == 2
+        assert controller.queued == 0
+    assert controller.running == 0
+
+
+def test_user_with_many_jobs_does_not_starve_others():
+    controller = make_controller()
+    queue = Queue(controller)
+    with controller.admit('holder', 1):
+        queue.submit('a1', 'a', 100)
+        queue.submit('a2', 'a', 100)
+        queue.submit('a3', 'a', 100)
+        queue.submit('b1', 'b', 100)
+    queue.join()
+    # b1 最后提交，但虚拟完成时间与 a1 相同，排在 a 的后续任务之前
+    assert queue.order == ['a1', 'b1', 'a2', 'a3']
+
+
+def test_small_job_runs_before_earlier_large_job():
+    controller = make_controller()
+    queue = Queue(controller)
+    with controller.admit('holder', 1):
+        queue.submit('large', 'a', 1000000)
+        queue.submit('small', 'b', 10)
+    queue.join()
+    assert queue.order == ['small', 'large']
+
+
+def test_equal_finish_time_keeps_submission_order():
+    controller = make_controller()
+    queue = Queue(controller)
+    with controller.admit('holder', 1):
+        queue.submit('first', 'a', 50)
+        queue.submit('second', 'b', 50)
+        queue.submit('third', 'c', 50)
+    queue.join()
+    assert queue.order == ['first', 'second', 'third']
+
+
+def test_zero_cost_counts_as_one():
+    controller = make_controller()
+    queue = Queue(controller)
+    with controller.admit('holder', 1):
+        queue.submit('two', 'a', 2)
+        queue.submit('zero', 'b', 0)
+    queue.join()
+    assert queue.order == ['zero', 'two']
+
+
+def test_rejects_when_queue_full():
+    controller = make_controller(max_queued_jobs=2)
+    queue = Queue(controller)
+    with controller.admit('holder', 1):
+        queue.submit('a1', 'a', 1)
+        queue.submit('b1', 'b', 1)
+        with pytest.raises(AdmissionRejected, match='队列已满') as excinfo:
+            controller.admit('c', 1)
+        assert excinfo.value.retry_after >= 1
+        assert controller.queued == 2
+    queue.join()
+    assert queue.order == ['a1', 'b1']
+
+
+def test_rejects_when_user_queue_full():
+    controller = make_controller(max_queued_per_user=1)
+    queue = Queue(controller)
+    with controller.admit('holder', 1):
+        queue.submit('a1', 'a', 1)
+        with pytest.raises(AdmissionRejected, match='已有任务在排队'):
+            controller.admit('a', 1)
+        # 其他用户仍可排队
+        queue.submit('b1', 'b', 1)
+    queue.join()
+    assert queue.order == ['a1', 'b1']
+
+
+def test_no_queue_rejects_when_slots_busy():
+    controller = make_controller(max_queued_jobs=0)
+    with controller.admit('holder', 1):
+        with pytest.raises(AdmissionRejected):
+            controller.admit('a', 1)
+    with controller.admit('a', 1):
+        pass
+
+
+def test_rejects_after_timeout_and_leaves_queue():
+    controller = make_controller(admission_timeout=0.05)
+    with controller.admit('holder', 1):
+        with pytest.raises(AdmissionRejected, match='排队超时') as excinfo:
+            controller.admit('a', 1)
+        assert excinfo.value.retry_after >= 1
+        assert controller.queued == 0
+    assert controller.running == 0
+
+
+def test_slot_released_on_error():
+    controller = make_controller()
+    with pytest.raises(RuntimeError):
+        with controller.admit('a', 1):
+            raise RuntimeError
+    assert controller.running == 0
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""配置加载和校验测试"""
+
+import pytest
+
+from config import Config
+
+
+USER_CONFIG = """
+app:
+  secret_key: my-secret
+login:
+  enabled: true
+  users:
+    - username: admin
+      password: admin123
+generator:
+  max_count: {max_count}
+  max_concurrent_jobs: {max_concurrent_jobs}
+"""
+
+
+@pytest.fixture(autouse=True)
+def clear_env(monkeypatch):
+    for name in ('APP_PORT', 'LOGIN_ENABLED', 'DEBUG_MODE', 'LAZY_INIT'):
+        monkeypatch.delenv(name, raising=False)
+
+
+def write_config(tmp_path, max_count='5000000', max_concurrent_jobs='3'):
+    path = tmp_path / 'config.yaml'
+    path.write_text(USER_CONFIG.format(max_count=max_count, max_concurrent_jobs=max_concurrent_jobs),
+                    encoding='utf-8')
+    return path
+
+
+def test_integral_float_is_coerced_to_int(tmp_path):
+    cfg = Config(str(write_config(tmp_path, max_count='5000000.0')))
+    assert cfg.generator['max_count'] == 5000000
+    assert isinstance(cfg.generator['max_count'], int)
+    assert cfg.login['enabled'] is True
+
+
+def test_invalid_key_only_resets_that_key(tmp_path, capsys):
+    cfg = Config(str(write_config(tmp_path, max_count='5000000.5', max_concurrent_jobs='0')))
+    # 无效的配置项恢复为默认值
+    assert cfg.generator['max_count'] == 10000000
+    assert cfg.generator['max_concurrent_jobs'] == 2
+    # 其余用户配置保持有效
+    assert cfg.login['enabled'] is True
+    assert cfg.app['secret_key'] == 'my-secret'
+    assert 'generator.max_count' in capsys.readouterr().out
+
+
+def test_invalid_section_is_reset(tmp_path):
+    path = tmp_path / 'config.yaml'
+    path.write_text("login:\n  enabled: true\ngenerator: 5\n", encoding='utf-8')
+    cfg = Config(str(path))
+    assert cfg.generator['max_count'] == 10000000
+    assert cfg.login['enabled'] is True
+
+
+def test_reload_keeps_current_config_on_invalid_value(tmp_path):
+    path = write_config(tmp_path)
+    cfg = Config(str(path))
+    write_config(tmp_path, max_count='-1')
+    assert cfg.reload() is False
+    assert cfg.generator['max_count'] == 5000000
+
+    write_config(tmp_path, max_count='6000000.0')
+    assert cfg.reload() is True
+    assert cfg.generator['max_count'] == 6000000
+
+
+def test_invalid_metrics_allowed_ips_is_reset(tmp_path, capsys):
+    path = tmp_path / 'config.yaml'
+    path.write_text('metrics:\n  token: 5\n  allowed_ips: ["10.0.0.0/8", "not-an-ip"]\n', encoding='utf-8')
+    cfg = Config(str(path))
+    assert cfg.get('metrics.allowed_ips') == []
+    assert cfg.get('metrics.token') == ''
+    assert 'metrics.allowed_ips' in capsys.readouterr().out
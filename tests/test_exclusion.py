@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""排除名单测试"""
+
+import os
+
+import pytest
+
+import app
+import exclusion
+from app import NumberGenerator
+from conftest import FakeDatabase
+from exclusion import ExclusionList, ExclusionStore, parse_numbers, write_exclusion_file
+from number_pattern import compile_pattern
+
+
+def open_list(tmp_path, numbers):
+    path = str(tmp_path / 'list.excl')
+    write_exclusion_file(numbers, path)
+    return ExclusionList(path)
+
+
+def test_empty_list(tmp_path):
+    path = tmp_path / 'empty.excl'
+    assert write_exclusion_file([], str(path)) == 0
+    assert path.stat().st_size == 32
+    items = ExclusionList(str(path))
+    assert len(items) == 0
+    assert items.excluded_tails(1380000) == []
+    assert 13800000000 not in items
+    items.close()
+
+
+def test_numbers_sorted_and_deduplicated(tmp_path):
+    items = open_list(tmp_path, [13800000005, 13800000001, 13800000005, 13900000000])
+    assert len(items) == 3
+    assert list(items.numbers) == [13800000001, 13800000005, 13900000000]
+    assert 13800000005 in items and 13800000002 not in items
+    items.close()
+
+
+def test_merge_across_runs(tmp_path, monkeypatch):
+    monkeypatch.setattr(exclusion, 'RUN_SIZE', 3)
+    numbers = [13800000000 + value for value in (9, 1, 5, 1, 7, 3, 9, 0, 5, 2)]
+    items = open_list(tmp_path, numbers)
+    assert list(items.numbers) == sorted(set(numbers))
+    items.close()
+    # 临时文件已清理
+    assert sorted(os.listdir(tmp_path)) == ['list.excl']
+
+
+def test_excluded_tails_stays_within_area(tmp_path):
+    items = open_list(tmp_path, [13799999999, 13800000000, 13800009999, 13800010000])
+    assert items.excluded_tails(1380000) == [0, 9999]
+    assert items.excluded_tails(1380001) == [0]
+    assert items.excluded_tails(1379999) == [9999]
+    assert items.excluded_tails(1390000) == []
+    items.close()
+
+
+def test_parse_numbers_skips_invalid_lines():
+    stats = {}
+    lines = [b'number,name\n', b'13800000001,a\n', b'+8613800000002\n', b'8613800000003\r\n',
+             b'\n', b'12345\n', b'  13800000004  \n']
+    assert list(parse_numbers(lines, stats)) == [13800000001, 13800000002, 13800000003, 13800000004]
+    assert stats == {'invalid': 2}
+
+
+@pytest.mark.parametrize('content', [b'', b'PEXCLUDE', b'XEXCLUDE' + b'\0' * 24])
+def test_corrupted_file_is_rejected(tmp_path, content):
+    path = tmp_path / 'bad.excl'
+    path.write_bytes(content)
+    with pytest.raises(ValueError):
+        ExclusionList(str(path))
+
+
+def test_truncated_file_is_rejected(tmp_path):
+    path = tmp_path / 'list.excl'
+    write_exclusion_file([13800000001, 13800000002], str(path))
+    path.write_bytes(path.read_bytes()[:-8])
+    with pytest.raises(ValueError, match='已损坏'):
+        ExclusionList(str(path))
+
+
+def test_store_save_get_and_delete(tmp_path):
+    store = ExclusionStore(str(tmp_path / 'lists'))
+    assert store.list() == []
+    info = store.save('called', [b'13800000001\n', b'bad\n', b'13800000001\n'])
+    assert info == {'name': 'called', 'count': 1, 'invalid': 1}
+    first = store.get('called')
+    assert store.get('called') is first
+    # 重新上传后版本变化，重新映射
+    store.save('called', [b'13800000001\n', b'13800000002\n'])
+    assert len(store.get('called')) == 2
+    assert [item['name'] for item in store.list()] == ['called']
+    assert store.delete('called')
+    assert store.get('called') is None
+    assert not store.delete('called')
+
+
+@pytest.mark.parametrize('name', ['', '../etc', 'a b', 'x' * 65])
+def test_store_rejects_invalid_names(tmp_path, name):
+    store = ExclusionStore(str(tmp_path))
+    assert store.get(name) is None
+    assert not store.exists(name)
+    assert not store.delete(name)
+
+
+def test_excluded_positions_empty_list(tmp_path):
+    items = open_list(tmp_path, [])
+    generator = NumberGenerator()
+    assert generator.excluded_positions('138', ['0000'], items) == {}
+    assert generator.excluded_positions('138', ['0000'], None) == {}
+    items.close()
+
+
+def test_excluded_positions_maps_tails_to_pattern_positions(tmp_path):
+    items = open_list(tmp_path, [13800001288, 13800001289, 13800010088, 13900000088])
+    generator = NumberGenerator()
+    assert generator.excluded_positions('138', ['0000', '0001'], items) == {0: [1288, 1289], 1: [88]}
+    # 模式 **88 的后4位列表为 0088, 0188, ...，1288 的序号为 12；1289 不在列表中
+    pattern = compile_pattern('**88')
+    assert generator.excluded_positions('138', ['0000', '0001', '0002'], items, pattern=pattern) == \
+        {0: [12], 1: [0]}
+    assert generator.count_numbers(['0000', '0001', '0002'], pattern=pattern,
+                                   excluded={0: [12], 1: [0]}) == 298
+    items.close()
+
+
+@pytest.fixture
+def resolve(tmp_path, monkeypatch):
+    """按固定查询条件调用 resolve_excluded，统计查询排除名单的次数"""
+    database = FakeDatabase(['0000', '0001'])
+    monkeypatch.setattr(app, 'db_manager', database)
+    generator = NumberGenerator()
+    calls = []
+    excluded_positions = generator.excluded_positions
+
+    def count_calls(*args, **kwargs):
+        calls.append(args)
+        return excluded_positions(*args, **kwargs)
+
+    monkeypatch.setattr(generator, 'excluded_positions', count_calls)
+    store = ExclusionStore(str(tmp_path))
+    query = app.parse_number_query({'prefix': '138', 'province': '广东', 'city': '深圳'})
+
+    def run(name='called', suffix_4=''):
+        current = query._replace(suffix_4=suffix_4)
+        return generator.resolve_excluded(current, generator.resolve_location_suffixes(current), store.get(name))
+
+    return database, store, calls, run
+
+
+def test_resolve_excluded_is_cached(resolve):
+    database, store, calls, run = resolve
+    store.save('called', [b'13800000001\n', b'13800010002\n'])
+    assert run() == ({0: [1], 1: [2]}, 19998)
+    assert run() == ({0: [1], 1: [2]}, 19998)
+    assert len(calls) == 1
+    # 后4位条件不同时分别缓存
+    assert run(suffix_4='0001') == ({0: [0]}, 1)
+    assert len(calls) == 2
+
+
+def test_resolve_excluded_without_list(resolve):
+    database, store, calls, run = resolve
+    assert run(name='missing') == ({}, 20000)
+    assert calls == []
+
+
+def test_resolve_excluded_invalidated_by_new_list_or_data(resolve, monkeypatch):
+    database, store, calls, run = resolve
+    store.save('called', [b'13800000001\n'])
+    assert run()[1] == 19999
+    store.save('called', [b'13800000001\n', b'13800000002\n'])
+    assert run()[1] == 19998
+    monkeypatch.setattr(database, 'data_version', lambda: 'reimported')
+    assert run()[1] == 19998
+    assert len(calls) == 3
+
+
+def test_resolve_excluded_caps_cached_positions(resolve, monkeypatch):
+    database, store, calls, run = resolve
+    monkeypatch.setattr(app, 'EXCLUSION_CACHE_POSITIONS', 2)
+    store.save('called', [b'13800000001\n', b'13800000002\n', b'13800000003\n'])
+    store.save('small', [b'13800000001\n'])
+    # 超过上限的结果不缓存
+    run()
+    run()
+    assert len(calls) == 2
+    run('small')
+    run('small')
+    assert len(calls) == 3
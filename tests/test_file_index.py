@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""生成文件索引和后台清理测试"""
+
+import time
+
+import pytest
+
+from file_index import FileReaper, GeneratedFileIndex
+from manifest import FileManifest
+
+
+class Worker:
+    """模拟一个工作进程：各自的索引和清理器，共享下载目录和清单"""
+
+    def __init__(self, directory, manifest_path, quota_bytes):
+        self.directory = directory
+        self.manifest = FileManifest(str(manifest_path))
+        self.index = GeneratedFileIndex()
+        self.reaper = FileReaper(
+            self.index,
+            lambda: str(directory),
+            lambda: 24,
+            lambda: quota_bytes,
+            on_remove=self.manifest.remove_file,
+            refresh=lambda: self.index.sync(self.manifest.list_files())
+        )
+
+    def write(self, name, size, job_id=None):
+        """写入一个文件；给出 job_id 时文件属于该任务且任务尚未完成，否则写完即完成"""
+        (self.directory / name).write_bytes(b'0' * size)
+        self.index.add(name, size, pending=job_id is not None)
+        if job_id is None:
+            self.manifest.create_job(name, {}, 1)
+        elif self.manifest.get_job(job_id) is None:
+            self.manifest.create_job(job_id, {}, 1)
+        self.manifest.add_file(job_id or name, {'name': name, 'part': 0, 'size': size, 'count': 1, 'sha256': ''})
+        if job_id is None:
+            self.manifest.complete_job(name)
+
+    def finish(self, job_id):
+        self.manifest.complete_job(job_id)
+        self.index.release(item['name'] for item in self.manifest.get_job(job_id)['files'])
+
+
+@pytest.fixture
+def workers(tmp_path):
+    items = [Worker(tmp_path, tmp_path / '.manifest.db', 500) for _ in range(2)]
+    yield items
+    for item in items:
+        item.manifest.close()
+
+
+def test_quota_counts_files_of_all_workers(tmp_path, workers):
+    first, second = workers
+    first.write('a.txt', 300)
+    time.sleep(0.01)
+    second.write('b.txt', 300)
+    # 每个进程各自只有300字节，但目录中共600字节，超出500字节的配额
+    result = first.reaper.run_once()
+    assert result == {'files': 1, 'bytes': 300}
+    assert not (tmp_path / 'a.txt').exists()
+    assert (tmp_path / 'b.txt').exists()
+    assert first.index.total_bytes == 300
+
+
+def test_sync_drops_files_deleted_by_other_worker(tmp_path, workers):
+    first, second = workers
+    first.write('a.txt', 300)
+    time.sleep(0.01)
+    second.write('b.txt', 300)
+    first.reaper.run_once()
+    # 第二个进程同步后不再计入已被第一个进程删除的文件
+    assert second.reaper.run_once() == {'files': 0, 'bytes': 0}
+    assert 'a.txt' not in second.index
+    assert second.index.total_bytes == 300
+
+
+def test_sync_uses_shared_access_time(tmp_path, workers):
+    first, second = workers
+    first.write('a.txt', 200)
+    time.sleep(0.01)
+    first.write('b.txt', 200)
+    time.sleep(0.01)
+    # 另一个进程下载了 a.txt，a.txt 变为最近访问
+    second.manifest.touch_file('a.txt')
+    first.write('c.txt', 200)
+    first.reaper.run_once()
+    assert (tmp_path / 'a.txt').exists()
+    assert not (tmp_path / 'b.txt').exists()
+
+
+def test_sync_keeps_unrecorded_files(tmp_path):
+    index = GeneratedFileIndex()
+    index.add('local.txt', 100)
+    index.sync([{'name': 'shared.txt', 'size': 50, 'created': 1.0, 'accessed': 1.0}])
+    assert 'local.txt' in index and 'shared.txt' in index
+    assert index.total_bytes == 150
+    index.sync([])
+    assert 'local.txt' in index and 'shared.txt' not in index
+    assert index.total_bytes == 100
+
+
+def test_quota_skips_files_of_running_job(tmp_path, workers):
+    first, second = workers
+    first.write('part_1_a.txt', 300, job_id='job')
+    time.sleep(0.01)
+    first.write('part_2_a.txt', 300, job_id='job')
+    # 任务未完成，分片虽超出配额也不淘汰，本进程和其他进程都是如此
+    assert first.reaper.run_once() == {'files': 0, 'bytes': 0}
+    assert second.reaper.run_once() == {'files': 0, 'bytes': 0}
+    assert (tmp_path / 'part_1_a.txt').exists()
+    assert second.index.total_bytes == 600
+    first.finish('job')
+    assert first.reaper.run_once() == {'files': 1, 'bytes': 300}
+    assert not (tmp_path / 'part_1_a.txt').exists()
+
+
+def test_quota_evicts_completed_files_before_running_job(tmp_path, workers):
+    first, second = workers
+    first.write('old.txt', 200)
+    time.sleep(0.01)
+    second.write('part_1_a.txt', 400, job_id='job')
+    # 正在写入的分片计入总大小，淘汰已完成的旧文件
+    assert first.reaper.run_once() == {'files': 1, 'bytes': 200}
+    assert not (tmp_path / 'old.txt').exists()
+    assert (tmp_path / 'part_1_a.txt').exists()
+
+
+def test_expired_skips_running_job_until_abandoned():
+    index = GeneratedFileIndex()
+    index.sync([
+        {'name': 'done.txt', 'size': 1, 'created': 10.0, 'accessed': 10.0},
+        {'name': 'running.txt', 'size': 1, 'created': 10.0, 'accessed': 10.0, 'pending': 1},
+    ])
+    assert [item.name for item in index.select_expired(20.0)] == ['done.txt']
+    assert [item.name for item in index.select_expired(20.0, 5.0)] == ['done.txt']
+    assert [item.name for item in index.select_expired(20.0, 15.0)] == ['done.txt', 'running.txt']
+
+
+def test_manifest_lists_pending_files(tmp_path):
+    manifest = FileManifest(str(tmp_path / '.manifest.db'))
+    manifest.create_job('job', {}, 1)
+    manifest.add_file('job', {'name': 'a.txt', 'part': 0, 'size': 1, 'count': 1, 'sha256': ''})
+    assert [row['pending'] for row in manifest.list_files()] == [1]
+    manifest.complete_job('job')
+    assert [row['pending'] for row in manifest.list_files()] == [0]
+    manifest.close()
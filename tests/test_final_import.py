@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""数据导入和快照版本戳测试"""
+
+import os
+import sqlite3
+
+import pytest
+
+from final_import import DataImporter, IMPORT_META_TABLE
+from location_snapshot import LocationSnapshot
+
+
+HEADER = 'prefix,suffix,province,city,operator\n'
+
+
+@pytest.fixture
+def importer(tmp_path):
+    item = DataImporter()
+    item.csv_path = tmp_path / 'phone_location.csv'
+    item.db_path = tmp_path / 'phone_location.db'
+    item.snapshot_path = tmp_path / 'phone_location.snap'
+    return item
+
+
+def write_csv(path, rows, mtime_ns):
+    path.write_text(HEADER + ''.join(f"{','.join(row)}\n" for row in rows), encoding='utf-8')
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def snapshot_provinces(importer):
+    snapshot = LocationSnapshot(str(importer.snapshot_path))
+    try:
+        return snapshot.provinces()
+    finally:
+        snapshot.close()
+
+
+def test_changed_csv_is_reimported(importer):
+    write_csv(importer.csv_path, [('138', '0000', '广东', '深圳', '1')], 1_000_000_000_000_000_000)
+    assert importer.import_data()
+    assert importer.check_snapshot_fresh()
+    assert snapshot_provinces(importer) == ['广东']
+
+    write_csv(importer.csv_path, [('138', '0000', '广东', '深圳', '1'),
+                                  ('139', '0000', '湖北', '武汉', '2')], 1_000_000_001_000_000_000)
+    assert not importer.check_snapshot_fresh()
+    assert importer.import_data()
+    assert importer.get_db_record_count() == 2
+    assert importer.check_snapshot_fresh()
+    assert sorted(snapshot_provinces(importer)) == ['广东', '湖北']
+
+
+def test_unchanged_csv_skips_import(importer, capsys):
+    write_csv(importer.csv_path, [('138', '0000', '广东', '深圳', '1')], 1_000_000_000_000_000_000)
+    assert importer.import_data()
+    capsys.readouterr()
+    assert importer.import_data()
+    assert '跳过导入' in capsys.readouterr().out
+    assert importer.get_db_record_count() == 1
+
+
+def test_stale_snapshot_is_not_stamped_fresh(importer):
+    write_csv(importer.csv_path, [('138', '0000', '广东', '深圳', '1')], 1_000_000_000_000_000_000)
+    assert importer.import_data()
+    write_csv(importer.csv_path, [('139', '0000', '湖北', '武汉', '2')], 1_000_000_001_000_000_000)
+    # 只重新导出快照（数据库仍是旧数据）时，快照不能被当作与新CSV一致
+    assert importer.export_snapshot()
+    assert not importer.check_snapshot_fresh()
+
+
+def test_database_without_stamp_is_reimported(importer):
+    write_csv(importer.csv_path, [('138', '0000', '广东', '深圳', '1')], 1_000_000_000_000_000_000)
+    assert importer.import_data()
+    conn = sqlite3.connect(str(importer.db_path))
+    conn.execute(f'DROP TABLE {IMPORT_META_TABLE}')
+    conn.commit()
+    conn.close()
+    assert importer.get_db_source_stamp() is None
+
+    assert importer.import_data()
+    assert importer.get_db_record_count() == 1
+    assert importer.get_db_source_stamp() is not None
+    assert importer.check_snapshot_fresh()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""生成进度接口测试"""
+
+import json
+import threading
+import time
+
+import pytest
+
+import app
+from conftest import FakeDatabase
+from memory_budget import MemoryBudget
+
+
+MB = 1024 * 1024
+
+QUERY = 'prefix=138&province=广东&city=深圳'
+
+
+@pytest.fixture
+def stream_env(tmp_path, monkeypatch):
+    """替身数据库、临时下载目录和独立的内存预算；每块号码拆成小块慢速生成"""
+    monkeypatch.setattr(app.config, 'get_download_dir', lambda: str(tmp_path))
+    monkeypatch.setitem(app.config.login, 'enabled', False)
+    monkeypatch.setitem(app.config.download, 'result_cache', False)
+    monkeypatch.setitem(app.config.download, 'reap_interval', 0)
+    monkeypatch.setattr(app, 'db_manager', FakeDatabase([f'{index:04d}' for index in range(20)]))
+    generator = app.NumberGenerator()
+    monkeypatch.setattr(app, 'number_generator', generator)
+    budget = MemoryBudget(lambda: 64 * MB)
+    monkeypatch.setattr(app, 'generation_budget', budget)
+    manager = app.FileManager()
+    monkeypatch.setattr(app, 'file_manager', manager)
+
+    chunks_generated = []
+    iter_number_chunks = generator.iter_number_chunks
+
+    def slow_chunks(*args, **kwargs):
+        for chunk in iter_number_chunks(*args, **kwargs):
+            for start in range(0, len(chunk), 1000):
+                time.sleep(0.005)
+                chunks_generated.append(start)
+                yield chunk[start:start + 1000]
+
+    monkeypatch.setattr(generator, 'iter_number_chunks', slow_chunks)
+    yield budget, manager, chunks_generated
+    manager.reaper.stop()
+    manager.manifest.close()
+
+
+def read_event(lines):
+    """读取下一个事件，返回 (事件名, 数据)"""
+    event = None
+    for line in lines:
+        line = line.decode('utf-8') if isinstance(line, bytes) else line
+        if line.startswith('event: '):
+            event = line[len('event: '):].strip()
+        elif line.startswith('data: ') and event is not None:
+            return event, json.loads(line[len('data: '):])
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_closing_stream_stops_job(stream_env):
+    budget, manager, chunks_generated = stream_env
+    response = app.app.test_client().get(f'/api/generate/stream?{QUERY}', buffered=False)
+    lines = (line for chunk in response.response for line in chunk.splitlines())
+    event, started = read_event(lines)
+    assert event == 'started' and started['count'] == 200000
+    # 客户端断开：服务器关闭响应，生成在当前一块写完后停止并释放内存预算
+    response.close()
+    assert wait_until(lambda: budget.in_use == 0)
+    assert len(chunks_generated) < 200
+    job = manager.manifest.get_job(started['job_id'])
+    assert job['completed'] == 1 and job['cache_key'] is None
+    assert wait_until(lambda: not any(thread.name == 'generate-stream' for thread in threading.enumerate()))
+
+
+def test_stream_runs_to_completion(stream_env):
+    budget, _, _ = stream_env
+    response = app.app.test_client().get(f'/api/generate/stream?{QUERY}&suffix_4=0000')
+    events = [line for line in response.get_data(as_text=True).splitlines() if line.startswith('event: ')]
+    assert events[0] == 'event: started' and events[-1] == 'event: done'
+    assert budget.in_use == 0
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+延迟初始化模式测试
+
+在独立的子进程中导入 app，检查：
+1. 延迟初始化模式下导入时不创建全局单例、不配置日志、不创建下载目录、不启动后台线程，
+   不加载只在个别接口或后台任务中使用的模块
+2. 导入 app 的总耗时（python -X importtime，含 Flask 及其依赖）不超过预算，取多次测量的最小值以减少波动
+"""
+
+import os
+import subprocess
+import sys
+
+from conftest import ROOT_DIR
+
+
+# 延迟初始化模式下导入 app 的总耗时预算（毫秒），与 benchmarks/run_benchmarks.py 的示例预算一致，
+# 较慢的机器上可用环境变量 IMPORT_BUDGET_MS 调整。
+# 目前约为 260 ms，其中 Flask 及其依赖约 180 ms、读取配置（yaml）约 20 ms，这部分延迟初始化无法减少；
+# 导入时加载数据、读取数据库或在模块顶层引入较重的依赖都会超出预算
+IMPORT_BUDGET_MS = int(os.environ.get('IMPORT_BUDGET_MS', 400))
+
+# 测量次数，取最小值
+IMPORT_RUNS = 5
+
+# 延迟初始化模式下导入 app 时不应加载的模块（在使用处导入）
+DEFERRED_MODULES = ('location_snapshot', 'assets', 'file_index', 'manifest', 'number_pattern',
+                    'region_query', 'exclusion', 'profiling', 'sqlite3', 'cProfile', 'gzip', 'mmap')
+
+
+def run_python(code: str, tmp_path, *args: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, LAZY_INIT='true', DOWNLOAD_DIR=str(tmp_path / 'downloads'))
+    env['PYTHONPATH'] = ROOT_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    return subprocess.run([sys.executable, *args, '-c', code], cwd=ROOT_DIR, env=env,
+                          capture_output=True, text=True, timeout=120)
+
+
+def app_import_ms(stderr: str) -> float:
+    """解析 -X importtime 的输出，返回导入 app 的累计耗时（毫秒，含其全部依赖）"""
+    for line in stderr.splitlines():
+        if line.startswith('import time:'):
+            _, cumulative_us, name = line[len('import time:'):].split('|')
+            if name.strip() == 'app':
+                return int(cumulative_us) / 1000
+    raise AssertionError('未找到 app 的导入耗时')
+
+
+def test_lazy_import_creates_nothing(tmp_path):
+    code = f'DEFERRED_MODULES = {DEFERRED_MODULES!r}\n' + '''
+import sys
+import threading
+import app
+lazy = {name: value for name, value in vars(app).items() if isinstance(value, app.LazyInstance)}
+for name in ('db_manager', 'number_generator', 'file_manager'):
+    assert name in lazy, name
+created = [name for name, value in lazy.items() if value._instance is not None]
+assert not created, created
+assert not app._logging_ready and not app._log_handlers
+assert threading.active_count() == 1, threading.enumerate()
+loaded = [name for name in DEFERRED_MODULES if name in sys.modules]
+assert not loaded, loaded
+print('ok')
+'''
+    result = run_python(code, tmp_path)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == 'ok'
+    assert not (tmp_path / 'downloads').exists()
+
+
+def test_lazy_import_time_budget(tmp_path):
+    timings = []
+    for _ in range(IMPORT_RUNS):
+        result = run_python('import app', tmp_path, '-X', 'importtime')
+        assert result.returncode == 0, result.stderr
+        timings.append(app_import_ms(result.stderr))
+    assert min(timings) <= IMPORT_BUDGET_MS, f"导入耗时超出预算：{timings} ms > {IMPORT_BUDGET_MS} ms"
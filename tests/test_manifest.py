@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""生成文件清单测试"""
+
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from manifest import FileManifest
+
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason='需要 fork()')
+
+FILES_PER_PROCESS = 200
+
+
+def write_files(manifest, tag):
+    for index in range(FILES_PER_PROCESS):
+        name = f'{tag}_{index}.txt'
+        manifest.create_job(name, {'tag': tag}, 1)
+        manifest.add_file(name, {'name': name, 'part': 0, 'size': 10, 'count': 1, 'sha256': ''})
+        manifest.complete_job(name)
+        manifest.touch_file(name)
+
+
+def fork_and_run(target):
+    """在子进程中运行 target，返回子进程ID；子进程以 target 是否成功作为退出码"""
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            target()
+            code = 0
+        finally:
+            os._exit(code)
+    return pid
+
+
+def wait_success(pid):
+    _, status = os.waitpid(pid, 0)
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+
+
+def test_parent_and_child_write_after_fork(tmp_path):
+    path = str(tmp_path / '.manifest.db')
+    manifest = FileManifest(path)
+    write_files(manifest, 'before')
+
+    pid = fork_and_run(lambda: write_files(manifest, 'child'))
+    write_files(manifest, 'parent')
+    wait_success(pid)
+
+    names = {row['name'] for row in manifest.list_files()}
+    assert len(names) == 3 * FILES_PER_PROCESS
+    assert {'before_0.txt', 'child_199.txt', 'parent_199.txt'} <= names
+    manifest.close()
+
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+    finally:
+        conn.close()
+
+
+def test_child_uses_its_own_connection(tmp_path):
+    manifest = FileManifest(str(tmp_path / '.manifest.db'))
+    parent_conn = manifest._conn
+
+    def check():
+        assert manifest._conn is not parent_conn
+        write_files(manifest, 'child')
+
+    wait_success(fork_and_run(check))
+    assert manifest._conn is parent_conn
+    assert len(manifest.list_files()) == FILES_PER_PROCESS
+    manifest.close()
+
+
+def test_fork_while_lock_is_held(tmp_path):
+    manifest = FileManifest(str(tmp_path / '.manifest.db'))
+    held = threading.Event()
+    done = threading.Event()
+
+    def hold_lock():
+        # 模拟派生时后台清理线程正在访问清单
+        with manifest._lock:
+            held.set()
+            done.wait(5)
+
+    thread = threading.Thread(target=hold_lock)
+    thread.start()
+    held.wait(5)
+    try:
+        pid = fork_and_run(lambda: write_files(manifest, 'child'))
+        wait_success(pid)
+    finally:
+        done.set()
+        thread.join()
+    assert len(manifest.list_files()) == FILES_PER_PROCESS
+    manifest.close()
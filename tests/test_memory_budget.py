@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""内存预算和按预算分块测试"""
+
+import threading
+
+import pytest
+
+import app
+from conftest import FakeDatabase
+from memory_budget import BYTES_PER_NUMBER, MIN_CHUNK_NUMBERS, MemoryBudget, MemoryBudgetExceeded
+
+
+MB = 1024 * 1024
+
+REQUEST = {'prefix': '138', 'province': '广东', 'city': '深圳'}
+
+
+def test_acquire_grants_desired_when_available():
+    budget = MemoryBudget(lambda: 100)
+    assert budget.acquire(desired=40, minimum=10, timeout=0) == 40
+    assert budget.in_use == 40
+
+
+def test_acquire_grants_remaining_between_minimum_and_desired():
+    budget = MemoryBudget(lambda: 100)
+    budget.acquire(desired=70, minimum=10, timeout=0)
+    assert budget.acquire(desired=50, minimum=20, timeout=0) == 30
+    assert budget.in_use == 100
+
+
+def test_minimum_above_limit_fails_immediately():
+    budget = MemoryBudget(lambda: 100)
+    with pytest.raises(MemoryBudgetExceeded, match='超过预算上限'):
+        budget.acquire(desired=200, minimum=150, timeout=60)
+    assert budget.in_use == 0
+
+
+def test_minimum_is_capped_by_desired():
+    # 期望额度低于最低额度（小任务）时只需期望额度
+    budget = MemoryBudget(lambda: 100)
+    assert budget.acquire(desired=5, minimum=150, timeout=0) == 5
+
+
+def test_waits_for_release_then_times_out():
+    budget = MemoryBudget(lambda: 100)
+    budget.acquire(desired=100, minimum=100, timeout=0)
+    with pytest.raises(MemoryBudgetExceeded, match='已用尽'):
+        budget.acquire(desired=50, minimum=50, timeout=0.05)
+
+    timer = threading.Timer(0.05, budget.release, args=(60,))
+    timer.start()
+    assert budget.acquire(desired=50, minimum=50, timeout=5) == 50
+    timer.join()
+    assert budget.in_use == 90
+
+
+def test_release_never_goes_negative():
+    budget = MemoryBudget(lambda: 100)
+    budget.release(10)
+    assert budget.in_use == 0
+
+
+@pytest.fixture
+def generate_env(tmp_path, monkeypatch):
+    """号码生成环境：替身数据库、临时下载目录和独立的内存预算"""
+    download_dir = tmp_path / 'downloads'
+    monkeypatch.setattr(app.config, 'get_download_dir', lambda: str(download_dir))
+    monkeypatch.setitem(app.config.download, 'result_cache', False)
+    monkeypatch.setitem(app.config.download, 'reap_interval', 0)
+    monkeypatch.setitem(app.config.generator, 'request_memory_mb', 4)
+    monkeypatch.setitem(app.config.generator, 'memory_queue_timeout', 0)
+    monkeypatch.setattr(app, 'db_manager', FakeDatabase([f'{index:04d}' for index in range(20)]))
+    generator = app.NumberGenerator()
+    monkeypatch.setattr(app, 'number_generator', generator)
+    budget = MemoryBudget(lambda: 8 * MB)
+    monkeypatch.setattr(app, 'generation_budget', budget)
+    manager = app.FileManager()
+    monkeypatch.setattr(app, 'file_manager', manager)
+
+    chunk_sizes = []
+    iter_number_chunks = generator.iter_number_chunks
+
+    def record_chunk_size(*args, **kwargs):
+        chunk_sizes.append(args[4])
+        return iter_number_chunks(*args, **kwargs)
+
+    monkeypatch.setattr(generator, 'iter_number_chunks', record_chunk_size)
+    yield budget, chunk_sizes
+    manager.reaper.stop()
+    manager.manifest.close()
+
+
+def test_chunk_size_follows_granted_budget(generate_env):
+    budget, chunk_sizes = generate_env
+    result = app.run_generate_job(dict(REQUEST), 'user')
+    assert result['count'] == 200000
+    # 请求预算 4 MB，扣除一个区域码的余量
+    assert chunk_sizes == [4 * MB // BYTES_PER_NUMBER - MIN_CHUNK_NUMBERS]
+    assert budget.in_use == 0
+
+
+def test_chunk_size_shrinks_when_budget_is_short(generate_env):
+    budget, chunk_sizes = generate_env
+    held = budget.acquire(desired=7 * MB, minimum=0, timeout=0)
+    app.run_generate_job(dict(REQUEST), 'user')
+    # 只剩 1 MB，分块缩小但不低于最小分块
+    assert chunk_sizes == [max(MIN_CHUNK_NUMBERS, MB // BYTES_PER_NUMBER - MIN_CHUNK_NUMBERS)]
+    assert budget.in_use == held
+
+
+def test_exhausted_budget_returns_503(generate_env):
+    budget, chunk_sizes = generate_env
+    budget.acquire(desired=8 * MB, minimum=0, timeout=0)
+    with pytest.raises(app.GenerateError) as excinfo:
+        app.run_generate_job(dict(REQUEST), 'user')
+    assert excinfo.value.code == 503
+    assert 'Retry-After' in excinfo.value.headers
+    assert chunk_sizes == []
+
+
+def test_budget_below_minimum_chunk_returns_503(generate_env, monkeypatch):
+    monkeypatch.setattr(app, 'generation_budget', MemoryBudget(lambda: MIN_CHUNK_NUMBERS * BYTES_PER_NUMBER - 1))
+    with pytest.raises(app.GenerateError) as excinfo:
+        app.run_generate_job(dict(REQUEST), 'user')
+    assert excinfo.value.code == 503
+    assert '超过预算上限' in excinfo.value.message
+
+
+def test_large_sample_fits_in_budget(generate_env, monkeypatch):
+    budget, _ = generate_env
+    # 抽样数量不占用额外预算：接近候选总数的抽样也按普通分块申请
+    monkeypatch.setattr(app, 'generation_budget', MemoryBudget(lambda: 2 * MB))
+    result = app.run_generate_job(dict(REQUEST, sample=199999, seed=1), 'user')
+    assert result['count'] == 199999
+
+
+def test_budget_released_on_error(generate_env, monkeypatch):
+    budget, _ = generate_env
+
+    def fail(*args, **kwargs):
+        raise OSError('磁盘已满')
+
+    monkeypatch.setattr(app.number_generator, 'write_number_parts', fail)
+    with pytest.raises(OSError):
+        app.run_generate_job(dict(REQUEST), 'user')
+    assert budget.in_use == 0
+    assert app.generation_admission.running == 0
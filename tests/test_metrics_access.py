@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""运行指标接口权限测试"""
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    """启用运行指标，返回按给定配置创建测试客户端的函数"""
+    monkeypatch.setattr(app.metrics_registry, 'enabled', True)
+
+    def configure(login_enabled=False, token='', allowed_ips=()):
+        monkeypatch.setitem(app.config.login, 'enabled', login_enabled)
+        monkeypatch.setitem(app.config._config, 'metrics', dict(
+            app.config._config['metrics'], enabled=True, token=token, allowed_ips=list(allowed_ips)
+        ))
+        return app.app.test_client()
+    return configure
+
+
+def test_denied_without_any_credentials(metrics):
+    assert metrics().get('/metrics').status_code == 403
+
+
+def test_token(metrics):
+    client = metrics(token='secret')
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    assert client.get('/metrics').status_code == 403
+
+
+def test_allowed_ips(metrics):
+    client = metrics(allowed_ips=['10.0.0.0/8', '::1'])
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '10.1.2.3'}).status_code == 200
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '::1'}).status_code == 200
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '192.168.1.1'}).status_code == 403
+
+
+def test_logged_in_user(metrics):
+    client = metrics(login_enabled=True)
+    assert client.get('/metrics').status_code == 403
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+    assert client.get('/metrics').status_code == 200
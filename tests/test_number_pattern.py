@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""号码模式编译测试"""
+
+import pytest
+
+from number_pattern import PatternError, compile_pattern
+
+
+def tails(pattern=None, **kwargs):
+    return compile_pattern(pattern, **kwargs).tails
+
+
+def test_no_pattern_allows_everything():
+    compiled = compile_pattern()
+    assert compiled.tail_count == 10000
+    assert compiled.prefix_bitmap is None and compiled.location_bitmap is None
+
+
+def test_wildcards_and_literals():
+    assert tails('**88') == [f'{head:02d}88' for head in range(100)]
+    assert tails('12?4') == [f'12{digit}4' for digit in range(10)]
+    assert tails('1-2 3 4') == ['1234']
+
+
+def test_digit_classes():
+    assert tails('[0-2]000') == ['0000', '1000', '2000']
+    assert tails('[13579]999')[:2] == ['1999', '3999']
+    assert tails('[^4]444') == [f'{digit}444' for digit in range(10) if digit != 4]
+    assert tails('[0-23]000') == ['0000', '1000', '2000', '3000']
+
+
+@pytest.mark.parametrize('pattern', ['[]000', '[^]000', '[^0-9]000', '[^0123456789]000'])
+def test_empty_class_is_rejected(pattern):
+    with pytest.raises(PatternError, match='不能为空'):
+        compile_pattern(pattern)
+
+
+@pytest.mark.parametrize('pattern', ['[5-3]000', '[a]000', '[0-5000', '0x00', 'aabb'])
+def test_invalid_syntax(pattern):
+    with pytest.raises(PatternError):
+        compile_pattern(pattern)
+
+
+@pytest.mark.parametrize('pattern', ['888', '88888', '1380000888', '*' * 12, '*' * 65])
+def test_invalid_length(pattern):
+    with pytest.raises(PatternError):
+        compile_pattern(pattern)
+
+
+def test_letter_variables_within_segment():
+    assert tails('AABB') == [f'{a}{a}{b}{b}' for a in range(10) for b in range(10) if a != b]
+    assert tails('ABAB')[:3] == ['0101', '0202', '0303']
+    assert tails('AAAA') == [str(digit) * 4 for digit in range(10)]
+    assert compile_pattern('ABCD').tail_count == 10 * 9 * 8 * 7
+    assert tails('A*A8')[:2] == ['0008', '0108']
+
+
+def test_same_letter_in_different_segments_is_rejected():
+    with pytest.raises(PatternError, match='字母变量 A'):
+        compile_pattern('AA**AA**')
+    with pytest.raises(PatternError, match='字母变量 B'):
+        compile_pattern('1B8****B***')
+
+
+def test_letters_reused_independently_per_segment():
+    # 区域码用 A，后4位用 B：两段各自约束，不要求不同段的数字不同
+    compiled = compile_pattern('AAAABBBB')
+    assert compiled.filter_locations(['1111', '1112', '0000']) == ['1111', '0000']
+    assert compiled.tails == [str(digit) * 4 for digit in range(10)]
+
+
+def test_eight_digit_pattern_filters_locations():
+    compiled = compile_pattern('0[01]**8888')
+    assert compiled.prefix_bitmap is None
+    assert compiled.filter_locations(['0000', '0100', '0200', '1000']) == ['0000', '0100']
+    assert compiled.tails == ['8888']
+
+
+def test_eleven_digit_pattern_checks_prefix():
+    compiled = compile_pattern('13[89]****AAAA')
+    assert compiled.allows_prefix('138') and compiled.allows_prefix('139')
+    assert not compiled.allows_prefix('137')
+    assert compiled.filter_areas(['1380000', '1370000']) == ['1380000']
+
+
+def test_exclude_digits_applies_to_location_and_tail():
+    compiled = compile_pattern(exclude_digits='4')
+    assert compiled.tail_count == 9 ** 4
+    assert all('4' not in tail for tail in compiled.tails)
+    assert compiled.filter_locations(['0004', '0005']) == ['0005']
+
+
+def test_exclude_digits_can_empty_a_pattern():
+    assert tails('[4]000', exclude_digits='4') == []
+
+
+@pytest.mark.parametrize('exclude_digits', ['0123456789', 'a'])
+def test_invalid_exclude_digits(exclude_digits):
+    with pytest.raises(PatternError):
+        compile_pattern(exclude_digits=exclude_digits)
+
+
+def test_exact_suffix_intersects_pattern():
+    assert tails('**88', suffix_4='1288') == ['1288']
+    assert tails('**88', suffix_4='1289') == []
+    assert tails('AA**', suffix_3='188') == ['1188']
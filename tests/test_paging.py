@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""游标分页测试"""
+
+import pytest
+
+import app
+from app import NumberGenerator
+from conftest import FakeDatabase
+from exclusion import ExclusionStore
+
+
+LOCATIONS = ['0000', '0001', '0005']
+
+
+@pytest.fixture
+def generator():
+    return NumberGenerator()
+
+
+def all_pages(generator, location_suffixes, limit, **kwargs):
+    """从第一页开始逐页请求，返回各页号码"""
+    pages = []
+    cursor = None
+    while True:
+        numbers, cursor = generator.page_numbers('138', location_suffixes, cursor, limit, **kwargs)
+        pages.append(numbers)
+        if cursor is None:
+            return pages
+        assert cursor == numbers[-1]
+        assert len(pages) <= 100000
+
+
+def expected_numbers(generator, location_suffixes, **kwargs):
+    return [number for chunk in generator.iter_number_chunks('138', location_suffixes, **kwargs)
+            for number in chunk]
+
+
+@pytest.mark.parametrize('limit', [7, 3000, 9999, 10000, 10001, 30000, 50000])
+def test_pages_cover_all_numbers_once(generator, limit):
+    pages = all_pages(generator, LOCATIONS, limit)
+    assert [number for page in pages for number in page] == expected_numbers(generator, LOCATIONS)
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+def test_page_ending_at_segment_boundary(generator):
+    numbers, cursor = generator.page_numbers('138', LOCATIONS, None, 10000)
+    assert numbers[-1] == '13800009999'
+    assert cursor == '13800009999'
+    # 游标为区域码最后一个号码时，下一页从下一个区域码开始
+    numbers, cursor = generator.page_numbers('138', LOCATIONS, cursor, 10000)
+    assert numbers[0] == '13800010000'
+    assert numbers[-1] == '13800019999'
+
+
+def test_last_page_ending_at_boundary_has_no_cursor(generator):
+    numbers, cursor = generator.page_numbers('138', LOCATIONS, '13800019999', 10000)
+    assert numbers[0] == '13800050000' and numbers[-1] == '13800059999'
+    assert cursor is None
+
+
+def test_cursor_at_last_number_returns_empty_page(generator):
+    assert generator.page_numbers('138', LOCATIONS, '13800059999', 10) == ([], None)
+
+
+def test_cursor_in_missing_location_continues_with_next(generator):
+    # 区域码 0003 不在列表中（如数据已更新），从下一个区域码 0005 开始
+    numbers, _ = generator.page_numbers('138', LOCATIONS, '13800031234', 3)
+    assert numbers == ['13800050000', '13800050001', '13800050002']
+
+
+def test_cursor_after_all_locations(generator):
+    assert generator.page_numbers('138', LOCATIONS, '13899999999', 10) == ([], None)
+
+
+def test_pages_with_suffix(generator):
+    pages = all_pages(generator, LOCATIONS, 1, suffix_4='8888')
+    assert pages == [['13800008888'], ['13800018888'], ['13800058888']]
+
+
+def test_pages_skip_excluded(generator):
+    # 区域码 0000 排除全部后4位，区域码 0001 排除后4位序号 0-9997
+    excluded = {0: list(range(10000)), 1: list(range(9998))}
+    numbers, cursor = generator.page_numbers('138', LOCATIONS, None, 2, excluded=excluded)
+    assert (numbers, cursor) == (['13800019998', '13800019999'], '13800019999')
+    numbers, _ = generator.page_numbers('138', LOCATIONS, cursor, 2, excluded=excluded)
+    assert numbers == ['13800050000', '13800050001']
+    pages = all_pages(generator, LOCATIONS, 3000, excluded=excluded)
+    assert [number for page in pages for number in page] == \
+        expected_numbers(generator, LOCATIONS, excluded=excluded)
+
+
+def test_no_cursor_when_remaining_locations_fully_excluded(generator):
+    excluded = {1: list(range(10000)), 2: list(range(10000))}
+    numbers, cursor = generator.page_numbers('138', LOCATIONS, None, 10000, excluded=excluded)
+    assert len(numbers) == 10000
+    assert cursor is None
+
+
+@pytest.fixture
+def numbers_api(tmp_path, monkeypatch):
+    """分页接口环境：替身数据库、临时排除名单目录，统计查询排除名单的次数"""
+    monkeypatch.setitem(app.config.login, 'enabled', False)
+    monkeypatch.setattr(app, 'db_manager', FakeDatabase(LOCATIONS))
+    generator = NumberGenerator()
+    monkeypatch.setattr(app, 'number_generator', generator)
+    store = ExclusionStore(str(tmp_path / 'exclusions'))
+    monkeypatch.setattr(app, 'exclusion_store', store)
+    store.save('called', [b'13800000000\n', b'13800000001\n', b'13800019999\n'])
+
+    calls = []
+    excluded_positions = generator.excluded_positions
+
+    def count_calls(*args, **kwargs):
+        calls.append(args)
+        return excluded_positions(*args, **kwargs)
+
+    monkeypatch.setattr(generator, 'excluded_positions', count_calls)
+    client = app.app.test_client()
+
+    def get_page(cursor=None, limit=5000):
+        args = {'prefix': '138', 'province': '广东', 'city': '深圳', 'exclude_list': 'called', 'limit': limit}
+        if cursor:
+            args['cursor'] = cursor
+        response = client.get('/api/numbers', query_string=args)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return response.get_json()['data']
+
+    return store, calls, get_page
+
+
+def test_pages_reuse_excluded_positions(numbers_api):
+    store, calls, get_page = numbers_api
+    pages = []
+    cursor = None
+    while True:
+        page = get_page(cursor)
+        pages.append(page)
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert all(page['count'] == 30000 - 3 for page in pages)
+    numbers = [number for page in pages for number in page['numbers']]
+    assert len(numbers) == 30000 - 3
+    assert numbers[0] == '13800000002'
+    assert '13800019999' not in numbers
+    # 只在第一页查询一次排除名单
+    assert len(pages) == 6 and len(calls) == 1
+
+
+def test_reuploaded_exclusion_list_is_requeried(numbers_api):
+    store, calls, get_page = numbers_api
+    assert get_page()['count'] == 30000 - 3
+    store.save('called', [b'13800000000\n'])
+    assert get_page()['count'] == 30000 - 1
+    assert len(calls) == 2
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""剖析功能权限测试"""
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def profiling(monkeypatch, tmp_path):
+    """启用剖析，剖析文件写到临时下载目录"""
+    monkeypatch.setattr(app.config, 'get_download_dir', lambda: str(tmp_path))
+
+    def configure(login_enabled, allowed_users=()):
+        monkeypatch.setitem(app.config.login, 'enabled', login_enabled)
+        monkeypatch.setitem(app.config._config, 'profiling', dict(
+            app.config._config['profiling'], enabled=True, always=False, allowed_users=list(allowed_users)
+        ))
+        return app.app.test_client()
+    return configure
+
+
+def log_in(client, username):
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+        session['username'] = username
+
+
+def test_login_disabled_denies_everyone(profiling):
+    client = profiling(login_enabled=False)
+    assert client.get('/api/admin/profiles').status_code == 403
+    assert 'X-Profile-Id' not in client.get('/login', headers={'X-Profile': '1'}).headers
+
+
+def test_login_enabled_allows_logged_in_users(profiling):
+    client = profiling(login_enabled=True)
+    assert client.get('/api/admin/profiles').status_code == 302
+    log_in(client, 'alice')
+    assert client.get('/api/admin/profiles').status_code == 200
+    assert 'X-Profile-Id' in client.get('/login', headers={'X-Profile': '1'}).headers
+
+
+def test_allowed_users_limit_access(profiling):
+    client = profiling(login_enabled=True, allowed_users=['admin'])
+    log_in(client, 'alice')
+    assert client.get('/api/admin/profiles').status_code == 403
+    log_in(client, 'admin')
+    assert client.get('/api/admin/profiles').status_code == 200
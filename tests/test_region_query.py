@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""地区集合运算测试"""
+
+import sqlite3
+
+import pytest
+
+from location_snapshot import LocationSnapshot, write_snapshot
+from region_query import MAX_DEPTH, MAX_NODES, RegionQueryError, compile_region_query
+
+
+# (prefix, suffix, province, city, operator)
+ROWS = sorted(
+    (prefix, f'{index:04d}', province, city, operator)
+    for prefix, operator in (('134', 1), ('138', 1), ('130', 2), ('133', 3))
+    for index, (province, city) in enumerate([('广东', '深圳'), ('广东', '广州'), ('广东', '珠海'),
+                                              ('湖北', '武汉'), ('湖北', '宜昌')])
+)
+
+
+@pytest.fixture(scope='module')
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE phone_location (prefix TEXT NOT NULL, suffix TEXT NOT NULL, '
+                 'province TEXT NOT NULL, city TEXT NOT NULL, operator INTEGER NOT NULL)')
+    conn.executemany('INSERT INTO phone_location VALUES (?, ?, ?, ?, ?)', ROWS)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(scope='module')
+def snapshot(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('snapshot') / 'phone_location.snap')
+    write_snapshot(ROWS, path, stamp=(0, 0))
+    snapshot = LocationSnapshot(path)
+    yield snapshot
+    snapshot.close()
+
+
+def expected_areas(predicate):
+    return sorted({prefix + suffix for prefix, suffix, province, city, operator in ROWS
+                   if predicate(province, city, operator, prefix)})
+
+
+def sql_areas(conn, query):
+    rows = conn.execute(f'SELECT DISTINCT prefix || suffix AS area FROM phone_location '
+                        f'WHERE {query.where} ORDER BY area', query.params)
+    return [row[0] for row in rows]
+
+
+def check(conn, snapshot, expression, predicate):
+    """SQL条件、内存判断函数和快照扫描的结果都与预期一致，候选号段包含全部命中的号段"""
+    query = compile_region_query(expression)
+    expected = expected_areas(predicate)
+    assert sql_areas(conn, query) == expected
+    assert expected_areas(query.matches) == expected
+    assert snapshot.select_areas(query.matches, query.prefixes) == expected
+    if query.prefixes is not None:
+        assert {area[:3] for area in expected} <= set(query.prefixes)
+    return query
+
+
+def test_leaf(conn, snapshot):
+    check(conn, snapshot, {'province': '广东', 'operators': [1, 3]},
+          lambda p, c, o, x: p == '广东' and o in (1, 3))
+
+
+def test_union_and_intersect(conn, snapshot):
+    check(conn, snapshot, {'union': [{'province': '湖北', 'city': '武汉'}, {'prefixes': ['130']}]},
+          lambda p, c, o, x: c == '武汉' or x == '130')
+    query = check(conn, snapshot, {'intersect': [{'prefixes': ['130', '133']}, {'prefixes': ['133', '138']},
+                                                 {'province': '广东'}]},
+                  lambda p, c, o, x: x == '133' and p == '广东')
+    assert query.prefixes == ['133']
+
+
+def test_difference(conn, snapshot):
+    query = check(conn, snapshot, {'difference': [{'province': '广东', 'operators': [1, 3]},
+                                                  {'province': '广东', 'city': '深圳'}]},
+                  lambda p, c, o, x: p == '广东' and o in (1, 3) and c != '深圳')
+    assert query.prefixes is None
+
+
+def test_nested_difference_on_left(conn, snapshot):
+    # (广东 - 深圳) - 移动
+    check(conn, snapshot, {'difference': [
+        {'difference': [{'province': '广东'}, {'province': '广东', 'city': '深圳'}]},
+        {'operators': [1]}
+    ]}, lambda p, c, o, x: p == '广东' and c != '深圳' and o != 1)
+
+
+def test_nested_difference_on_right(conn, snapshot):
+    # 广东 - (移动 - 134号段)：去掉的是除134外的移动号段，134仍保留
+    check(conn, snapshot, {'difference': [
+        {'province': '广东'},
+        {'difference': [{'operators': [1]}, {'prefixes': ['134']}]}
+    ]}, lambda p, c, o, x: p == '广东' and not (o == 1 and x != '134'))
+
+
+def test_difference_inside_union_and_intersect(conn, snapshot):
+    check(conn, snapshot, {'union': [
+        {'difference': [{'prefixes': ['138']}, {'province': '湖北'}]},
+        {'intersect': [{'province': '湖北', 'city': '宜昌'},
+                       {'difference': [{'operators': [2, 3]}, {'prefixes': ['133']}]}]}
+    ]}, lambda p, c, o, x: (x == '138' and p != '湖北') or (c == '宜昌' and o == 2))
+
+
+def test_difference_removing_everything(conn, snapshot):
+    query = check(conn, snapshot, {'difference': [{'prefixes': ['138']}, {'operators': [1]}]},
+                  lambda p, c, o, x: False)
+    assert query.prefixes == ['138']
+
+
+def test_text_is_normalized():
+    first = compile_region_query({'province': ' 广东 ', 'operators': [3, 1, 3]})
+    second = compile_region_query('{"operators": [1, 3], "province": "广东"}')
+    assert first.text == second.text
+
+
+@pytest.mark.parametrize('expression, message', [
+    ('not json', '有效的JSON'),
+    ([], '非空对象'),
+    ({}, '非空对象'),
+    ({'union': []}, '非空列表'),
+    ({'difference': [{'province': '广东'}]}, '至少需要两个'),
+    ({'union': [{'province': '广东'}], 'province': '广东'}, '不能与其他字段'),
+    ({'city': '深圳'}, '必须同时填写 province'),
+    ({'province': ''}, '非空字符串'),
+    ({'operators': [9]}, '无效的运营商'),
+    ({'operators': [True]}, '无效的运营商'),
+    ({'prefixes': ['13']}, '3位数字'),
+    ({'county': 'x'}, '未知字段'),
+])
+def test_invalid_expression(expression, message):
+    with pytest.raises(RegionQueryError, match=message):
+        compile_region_query(expression)
+
+
+def test_limits():
+    deep = {'province': '广东'}
+    for _ in range(MAX_DEPTH):
+        deep = {'union': [deep]}
+    with pytest.raises(RegionQueryError, match='嵌套'):
+        compile_region_query(deep)
+    with pytest.raises(RegionQueryError, match='最多包含'):
+        compile_region_query({'union': [{'province': '广东'}] * MAX_NODES})
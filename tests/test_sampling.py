@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""随机抽样测试"""
+
+import itertools
+from collections import Counter
+
+import pytest
+
+from app import NumberGenerator
+
+
+@pytest.fixture
+def generator():
+    return NumberGenerator()
+
+
+@pytest.mark.parametrize('population, sample_size', [
+    (10, 1), (10, 9), (10, 10), (1000, 3), (1000, 500), (10 ** 6, 10 ** 4), (10 ** 10, 1000)
+])
+def test_sample_is_sorted_unique_and_in_range(generator, population, sample_size):
+    for seed in range(5):
+        indices = list(generator.sample_indices(population, sample_size, seed))
+        assert len(indices) == sample_size
+        assert indices == sorted(set(indices))
+        assert 0 <= indices[0] and indices[-1] < population
+
+
+def test_empty_and_full_sample(generator):
+    assert list(generator.sample_indices(100, 0, 1)) == []
+    assert list(generator.sample_indices(0, 0, 1)) == []
+    assert list(generator.sample_indices(50, 50, 1)) == list(range(50))
+
+
+def test_same_seed_same_sample(generator):
+    first = list(generator.sample_indices(10 ** 8, 1000, 42))
+    assert list(generator.sample_indices(10 ** 8, 1000, 42)) == first
+    assert list(generator.sample_indices(10 ** 8, 1000, 43)) != first
+
+
+@pytest.mark.parametrize('population, sample_size', [(8, 2), (12, 3)])
+def test_every_subset_equally_likely(generator, population, sample_size):
+    runs = 20000
+    counts = Counter(tuple(generator.sample_indices(population, sample_size, seed)) for seed in range(runs))
+    subsets = list(itertools.combinations(range(population), sample_size))
+    assert set(counts) == set(subsets)
+    expected = runs / len(subsets)
+    chi2 = sum((counts[subset] - expected) ** 2 / expected for subset in subsets)
+    # 卡方检验：自由度 df 时卡方值远超 df + 5√(2df) 的概率可忽略
+    df = len(subsets) - 1
+    assert chi2 < df + 5 * (2 * df) ** 0.5
+
+
+def test_sample_is_lazy(generator):
+    # 不预先生成全部下标：总体和抽样数量都很大时取前几个也立即返回
+    indices = generator.sample_indices(10 ** 12, 10 ** 9, 7)
+    head = list(itertools.islice(indices, 5))
+    assert head == sorted(set(head))
+
+
+def test_sample_chunks(generator):
+    chunks = list(generator.iter_sample_chunks('138', ['0000', '0001', '0002'], 25000, seed=5,
+                                               chunk_size=10000))
+    assert [len(chunk) for chunk in chunks] == [10000, 10000, 5000]
+    numbers = [number for chunk in chunks for number in chunk]
+    assert numbers == sorted(set(numbers))
+    assert all(number[:7] in ('1380000', '1380001', '1380002') for number in numbers)
+
+
+def test_sample_larger_than_population_returns_all(generator):
+    chunks = list(generator.iter_sample_chunks('138', ['0000'], 20000, seed=1, suffix_3='123'))
+    assert chunks == [['13800000123', '13800001123', '13800002123', '13800003123', '13800004123',
+                       '13800005123', '13800006123', '13800007123', '13800008123', '13800009123']]
+
+
+def test_sample_skips_excluded(generator):
+    # 区域码 0 排除后4位序号 0-9989，只剩 10 个；区域码 1 不排除
+    excluded = {0: list(range(9990))}
+    numbers = [number for chunk in generator.iter_sample_chunks(
+        '138', ['0000', '0001'], 10010, seed=3, excluded=excluded) for number in chunk]
+    assert numbers[:10] == ['1380000%04d' % tail for tail in range(9990, 10000)]
+    assert len(numbers) == 10010 and numbers == sorted(set(numbers))
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""生产环境服务器参数测试"""
+
+import logging
+
+import pytest
+
+import server
+
+
+OPTIONS = {'backend': 'auto', 'host': '127.0.0.1', 'port': 5000,
+           'workers': 4, 'threads': 8, 'keepalive': 5, 'timeout': 300}
+
+
+@pytest.fixture
+def started(monkeypatch):
+    """替换各后端的启动函数，记录实际启动的后端"""
+    calls = []
+    monkeypatch.setattr(server, '_run_gunicorn', lambda app, options, post_fork: calls.append('gunicorn'))
+    monkeypatch.setattr(server, '_run_waitress', lambda app, options: calls.append('waitress'))
+    monkeypatch.setattr(server, '_run_werkzeug', lambda app, options: calls.append('werkzeug'))
+    return calls
+
+
+def messages(caplog, level):
+    return [record.getMessage() for record in caplog.records if record.levelno == level]
+
+
+def test_gunicorn_applies_all_options(started, caplog):
+    with caplog.at_level(logging.INFO):
+        server.serve(None, dict(OPTIONS, backend='gunicorn'))
+    assert started == ['gunicorn']
+    assert messages(caplog, logging.INFO) == \
+        ['生产服务器启动：backend=gunicorn, workers=4, threads=8, keepalive=5s, timeout=300s']
+    assert messages(caplog, logging.WARNING) == []
+
+
+def test_waitress_warns_about_ignored_options(started, caplog):
+    with caplog.at_level(logging.INFO):
+        server.serve(None, dict(OPTIONS, backend='waitress'))
+    assert messages(caplog, logging.INFO) == ['生产服务器启动：backend=waitress, threads=8, timeout=300s']
+    assert messages(caplog, logging.WARNING) == ['waitress 不支持以下参数，已忽略：workers=4, keepalive=5s']
+
+
+def test_single_worker_is_not_reported_as_ignored(started, caplog):
+    with caplog.at_level(logging.INFO):
+        server.serve(None, dict(OPTIONS, backend='werkzeug', workers=1))
+    assert messages(caplog, logging.INFO) == ['生产服务器启动：backend=werkzeug']
+    assert messages(caplog, logging.WARNING) == \
+        ['werkzeug 不支持以下参数，已忽略：threads=8, keepalive=5s, timeout=300s']
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""分组导出测试"""
+
+from collections import Counter
+
+import pytest
+
+import app
+from conftest import FakeDatabase
+
+
+@pytest.fixture
+def generator():
+    return app.NumberGenerator()
+
+
+def numbers_in(areas, tails=range(10000)):
+    return [f'{area}{tail:04d}' for area in areas for tail in tails]
+
+
+def split(numbers, sizes):
+    """按给定大小依次切块，剩余部分作为最后一块"""
+    chunks, start = [], 0
+    for size in sizes:
+        chunks.append(numbers[start:start + size])
+        start += size
+    chunks.append(numbers[start:])
+    return chunks
+
+
+def run(partition, chunks, shard_count):
+    """按块调用分组函数，返回各组号码"""
+    result = [[] for _ in range(shard_count)]
+    for chunk in chunks:
+        parts = partition(chunk)
+        assert len(parts) == shard_count
+        for shard, part in zip(result, parts):
+            shard.extend(part)
+    return result
+
+
+def test_keys_are_zero_padded(generator):
+    assert generator.shard_partitioner('hash', 3, '138', ['0000'])[0] == ['1', '2', '3']
+    assert generator.shard_partitioner('round_robin', 12, '138', ['0000'])[0][:2] == ['01', '02']
+
+
+def test_round_robin_continues_across_chunks(generator):
+    numbers = numbers_in(['1380000'], range(20))
+    _, partition = generator.shard_partitioner('round_robin', 3, '138', ['0000'])
+    shards = run(partition, split(numbers, [4, 0, 7, 1]), 3)
+    assert shards == [numbers[0::3], numbers[1::3], numbers[2::3]]
+
+
+def test_round_robin_single_shard(generator):
+    numbers = numbers_in(['1380000'], range(5))
+    _, partition = generator.shard_partitioner('round_robin', 1, '138', ['0000'])
+    assert run(partition, split(numbers, [2]), 1) == [numbers]
+
+
+def test_hash_is_independent_of_chunking(generator):
+    numbers = numbers_in(['1380000', '1380001'])
+    _, partition = generator.shard_partitioner('hash', 4, '138', ['0000', '0001'])
+    whole = run(partition, [numbers], 4)
+    assert run(partition, split(numbers, [1, 9999, 3333]), 4) == whole
+    # 每个号码恰好分到一组，组内保持升序
+    assert sorted(number for shard in whole for number in shard) == numbers
+    assert all(shard == sorted(shard) for shard in whole)
+    # 连续号码也大致均匀
+    assert all(abs(len(shard) - 5000) < 500 for shard in whole)
+
+
+def test_prefix_groups_regions_across_prefixes(generator):
+    areas = ['1300000', '1340000', '1340001', '1380000']
+    keys, partition = generator.shard_partitioner('prefix', 0, '', areas)
+    assert keys == ['130', '134', '138']
+    numbers = numbers_in(areas, range(0, 10000, 1000))
+    shards = run(partition, split(numbers, [15, 12]), 3)
+    assert [Counter(number[:3] for number in shard) for shard in shards] == \
+        [Counter({'130': 10}), Counter({'134': 20}), Counter({'138': 10})]
+
+
+def test_operator_groups_by_area_lookup(generator, monkeypatch):
+    database = FakeDatabase([], operators={1380000: 1, 1380001: 3, 1380002: 1})
+    monkeypatch.setattr(app, 'db_manager', database)
+    locations = ['0000', '0001', '0002', '0003']
+    keys, partition = generator.shard_partitioner('operator', 0, '138', locations)
+    # 反查不到的区域归入 0 组
+    assert keys == ['0', '1', '3']
+    numbers = numbers_in([f'138{suffix}' for suffix in locations], range(0, 10000, 2500))
+    shards = run(partition, split(numbers, [3, 6]), 3)
+    assert shards == [numbers_in(['1380003'], range(0, 10000, 2500)),
+                      numbers_in(['1380000', '1380002'], range(0, 10000, 2500)),
+                      numbers_in(['1380001'], range(0, 10000, 2500))]
+
+
+def test_empty_chunk(generator):
+    for shard_by, shards in (('hash', 2), ('round_robin', 2), ('prefix', 0)):
+        keys, partition = generator.shard_partitioner(shard_by, shards, '138', ['0000'])
+        assert partition([]) == [[] for _ in keys]
+
+
+def test_write_number_shards(generator, tmp_path, monkeypatch):
+    monkeypatch.setattr(app.config, 'get_download_dir', lambda: str(tmp_path))
+    registered = []
+    monkeypatch.setattr(app, 'file_manager', type('Files', (), {
+        'register_file': staticmethod(lambda name, size, pending=False: registered.append((name, size)))
+    })())
+    numbers = numbers_in(['1380000'], range(10))
+    keys, partition = generator.shard_partitioner('round_robin', 3, '138', ['0000'])
+    written = generator.write_number_shards(split(numbers, [4]), 'out.txt', keys, partition)
+    assert [(item.name, item.part, item.shard, item.count) for item in written] == \
+        [('shard_1_out.txt', 1, '1', 4), ('shard_2_out.txt', 2, '2', 3), ('shard_3_out.txt', 3, '3', 3)]
+    assert (tmp_path / 'shard_2_out.txt').read_text() == ''.join(f'{number}\n' for number in numbers[1::3])
+    assert registered == [(item.name, item.size) for item in written]